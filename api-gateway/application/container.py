@@ -1,6 +1,8 @@
 """Dependency Injection Container for API Gateway"""
 from dependency_injector import containers, providers
 from infrastructure.services.orchestration_service import OrchestrationService
+from infrastructure.services.request_coalescer import RequestCoalescer
+from infrastructure.services.service_clients import ServiceClients
 from infrastructure.config.settings import Settings
 
 
@@ -14,8 +16,22 @@ class Container(containers.DeclarativeContainer):
     settings = providers.Singleton(Settings)
     
     # Infrastructure services
+    service_clients = providers.Singleton(
+        ServiceClients,
+        settings=settings
+    )
+    
+    request_coalescer = providers.Singleton(
+        RequestCoalescer,
+        ttl=settings.provided.coalesce_cache_ttl,
+        max_size=settings.provided.coalesce_cache_max_size,
+        enabled=settings.provided.coalesce_enabled
+    )
+    
     orchestration_service = providers.Singleton(
         OrchestrationService,
-        settings=settings
+        settings=settings,
+        clients=service_clients,
+        coalescer=request_coalescer
     )
 
@@ -1,6 +1,6 @@
 """Orchestration service interface"""
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from ifc_common import Result
 
 
@@ -13,15 +13,19 @@ class IOrchestrationService(ABC):
         service_name: str, 
         endpoint: str, 
         method: str,
-        data: Dict[str, Any] = None
+        data: Dict[str, Any] = None,
+        coalesce: bool = False,
+        coalesce_key: Optional[str] = None
     ) -> Result[Dict[str, Any], str]:
-        """Route request to appropriate microservice"""
+        """Route request to appropriate microservice (identical concurrent calls shared with coalesce)"""
         pass
     
     @abstractmethod
     async def aggregate_responses(
         self,
-        requests: List[Dict[str, Any]]
+        requests: List[Dict[str, Any]],
+        max_concurrency: Optional[int] = None,
+        deadline: Optional[float] = None
     ) -> Result[Dict[str, Any], str]:
         """Aggregate responses from multiple microservices"""
         pass
@@ -16,6 +16,33 @@ class Settings(BaseMicroserviceSettings):
     data_3d_url: str = "http://3d-data-service:5004"
     db_manager_url: str = "http://database-manager-service:5005"
     
+    # Upstream timeouts in seconds (per service, connect timeout separate)
+    ifc_parser_timeout: float = 300.0
+    calculation_engine_timeout: float = 30.0
+    cost_calculator_timeout: float = 120.0
+    data_3d_timeout: float = 30.0
+    db_manager_timeout: float = 30.0
+    http_connect_timeout: float = 5.0
+    
+    # Upstream connection pools (one per service, kept alive between requests)
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0  # idle connections are closed after this many seconds
+    http2: bool = False  # needs the h2 package (httpx[http2])
+    
+    # Upload / download relaying (/api/ifc/parse)
+    proxy_chunk_size: int = 64 * 1024  # largest piece of a relayed response held at once
+    
+    # Coalescing of identical side-effect free calls (same method, endpoint and body)
+    coalesce_enabled: bool = True
+    coalesce_cache_ttl: float = 5.0  # seconds a finished response is reused (0 = only share calls in flight)
+    coalesce_cache_max_size: int = 64 * 1024 * 1024  # bytes of cached responses
+    
+    # /api/gateway/aggregate
+    aggregate_max_concurrency: int = 8  # sub-requests in flight at once
+    aggregate_request_timeout: float = 30.0  # per sub-request unless it sets "timeout"
+    aggregate_deadline: float = 60.0  # whole aggregate; unfinished entries are reported as deadline_exceeded
+    
     # API Gateway
     api_host: str = "0.0.0.0"
     api_port: int = 8000
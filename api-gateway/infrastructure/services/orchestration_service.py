@@ -1,82 +1,184 @@
 """Orchestration service implementation"""
+import asyncio
+import time
 import httpx
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from domain.interfaces.orchestration_service import IOrchestrationService
 from ifc_common import Result
 from infrastructure.config.settings import Settings
+from infrastructure.services.request_coalescer import RequestCoalescer
+from infrastructure.services.service_clients import ServiceClients
 
 
 class OrchestrationService(IOrchestrationService):
     """Orchestration service - routes requests to microservices"""
     
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, clients: ServiceClients = None, coalescer: RequestCoalescer = None):
         self.settings = settings
-        self.service_urls = {
-            "ifc-parser": settings.ifc_parser_url,
-            "calculation-engine": settings.calculation_engine_url,
-            "cost-calculator": settings.cost_calculator_url,
-            "3d-data": settings.data_3d_url,
-            "db-manager": settings.db_manager_url,
-        }
+        self.clients = clients or ServiceClients(settings)
+        self.coalescer = coalescer or RequestCoalescer(enabled=False)
+        self.service_urls = self.clients.service_urls
     
-    async def route_request(
+    def client(self, service_name: str) -> httpx.AsyncClient:
+        """Pooled client of a service (requests use paths relative to the service URL)"""
+        return self.clients.get(service_name)
+    
+    async def _send(
         self,
         service_name: str,
         endpoint: str,
         method: str,
         data: Dict[str, Any] = None
+    ) -> httpx.Response:
+        """One call to a microservice (ValueError for an unsupported method)"""
+        client = self.client(service_name)
+        method = method.upper()
+        if method == "GET":
+            return await client.get(endpoint, params=data)
+        if method == "POST":
+            return await client.post(endpoint, json=data)
+        if method == "PUT":
+            return await client.put(endpoint, json=data)
+        if method == "DELETE":
+            return await client.delete(endpoint)
+        raise ValueError(f"Unsupported method: {method}")
+    
+    async def request(
+        self,
+        service_name: str,
+        endpoint: str,
+        method: str,
+        data: Dict[str, Any] = None,
+        coalesce: bool = False,
+        coalesce_key: Optional[str] = None
+    ) -> httpx.Response:
+        """One call to a microservice
+        
+        With coalesce (only for calls without side effects) identical calls - same
+        method, endpoint and body - in flight at the same time share one upstream
+        call and its response, which is also reused for `coalesce_cache_ttl` seconds.
+        Routes forwarding large bodies pass `coalesce_key` (RequestCoalescer.make_key
+        of the raw body) so `data` is not serialized just to build the key.
+        """
+        if not coalesce:
+            return await self._send(service_name, endpoint, method, data)
+        key = coalesce_key or self.coalescer.make_key(method, f"{service_name}{endpoint}", data)
+        return await self.coalescer.run(key, lambda: self._send(service_name, endpoint, method, data))
+    
+    async def route_request(
+        self,
+        service_name: str,
+        endpoint: str,
+        method: str,
+        data: Dict[str, Any] = None,
+        coalesce: bool = False,
+        coalesce_key: Optional[str] = None
     ) -> Result[Dict[str, Any], str]:
-        """Route request to appropriate microservice"""
+        """Route request to appropriate microservice (see request() for coalesce)"""
         if service_name not in self.service_urls:
             return Result.failure(f"Unknown service: {service_name}")
         
-        base_url = self.service_urls[service_name]
-        url = f"{base_url}{endpoint}"
-        
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                if method.upper() == "GET":
-                    response = await client.get(url, params=data)
-                elif method.upper() == "POST":
-                    response = await client.post(url, json=data)
-                elif method.upper() == "PUT":
-                    response = await client.put(url, json=data)
-                elif method.upper() == "DELETE":
-                    response = await client.delete(url)
-                else:
-                    return Result.failure(f"Unsupported method: {method}")
-                
-                response.raise_for_status()
-                return Result.success(response.json())
+            response = await self.request(service_name, endpoint, method, data, coalesce, coalesce_key)
+            response.raise_for_status()
+            return Result.success(response.json())
         
+        except ValueError as e:
+            return Result.failure(str(e))
         except httpx.HTTPError as e:
             return Result.failure(f"HTTP error: {str(e)}")
         except Exception as e:
             return Result.failure(f"Error routing request: {str(e)}")
     
+    async def _aggregate_entry(
+        self,
+        request: Dict[str, Any],
+        semaphore: asyncio.Semaphore,
+        started: float,
+        entry: Dict[str, Any]
+    ) -> None:
+        """Run one sub-request of an aggregate, filling `entry` (status, timing, data or error)"""
+        async with semaphore:
+            entry["queued_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            sent = time.perf_counter()
+            entry["status"] = "running"
+            timeout = request.get("timeout") or self.settings.aggregate_request_timeout
+            try:
+                if request["service"] not in self.service_urls:
+                    raise LookupError(f"Unknown service: {request['service']}")
+                response = await asyncio.wait_for(
+                    self._send(request["service"], request["endpoint"], request.get("method", "GET"), request.get("data")),
+                    timeout
+                )
+                entry["status_code"] = response.status_code
+                response.raise_for_status()
+                entry["data"] = response.json()
+                entry["status"] = "ok"
+            except asyncio.TimeoutError:
+                entry["status"] = "timeout"
+                entry["error"] = f"No response within {timeout} s"
+            except (LookupError, ValueError) as e:
+                entry["status"] = "error"
+                entry["error"] = str(e)
+            except httpx.HTTPError as e:
+                entry["status"] = "error"
+                entry["error"] = f"HTTP error: {str(e)}"
+            except Exception as e:
+                entry["status"] = "error"
+                entry["error"] = f"Error routing request: {str(e)}"
+            finally:
+                entry["elapsed_ms"] = round((time.perf_counter() - sent) * 1000, 1)
+    
     async def aggregate_responses(
         self,
-        requests: List[Dict[str, Any]]
+        requests: List[Dict[str, Any]],
+        max_concurrency: Optional[int] = None,
+        deadline: Optional[float] = None
     ) -> Result[Dict[str, Any], str]:
-        """Aggregate responses from multiple microservices"""
-        results = {}
-        errors = []
+        """Aggregate responses from multiple microservices
         
-        for request in requests:
-            result = await self.route_request(
-                service_name=request["service"],
-                endpoint=request["endpoint"],
-                method=request.get("method", "GET"),
-                data=request.get("data")
-            )
-            
-            if result.is_success:
-                results[request["service"]] = result.value
-            else:
-                errors.append(f"{request['service']}: {result.error}")
+        Sub-requests run concurrently, at most `max_concurrency` at a time, each
+        limited by its own "timeout" (seconds) and all of them by `deadline`
+        (defaults from Settings). Results are keyed by request index ("0", "1", ...)
+        with status "ok", "error", "timeout", or "deadline_exceeded" for calls still
+        queued or running at the deadline, plus timings. Failed entries never
+        discard successful ones.
+        """
+        max_concurrency = max(1, max_concurrency or self.settings.aggregate_max_concurrency)
+        deadline = deadline or self.settings.aggregate_deadline
+        semaphore = asyncio.Semaphore(max_concurrency)
+        started = time.perf_counter()
         
-        if errors:
-            return Result.failure(f"Some requests failed: {', '.join(errors)}")
+        entries = [
+            {
+                "service": request["service"],
+                "endpoint": request["endpoint"],
+                "method": request.get("method", "GET").upper(),
+                "status": "queued"
+            }
+            for request in requests
+        ]
+        tasks = [
+            asyncio.create_task(self._aggregate_entry(request, semaphore, started, entry))
+            for request, entry in zip(requests, entries)
+        ]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=deadline)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
         
-        return Result.success(results)
-
+        for entry in entries:
+            if entry["status"] in ("queued", "running"):
+                entry["status"] = "deadline_exceeded"
+                entry["error"] = f"Aggregate deadline of {deadline} s exceeded"
+        
+        succeeded = sum(1 for entry in entries if entry["status"] == "ok")
+        return Result.success({
+            "results": {str(index): entry for index, entry in enumerate(entries)},
+            "succeeded": succeeded,
+            "failed": len(entries) - succeeded,
+            "complete": succeeded == len(entries),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
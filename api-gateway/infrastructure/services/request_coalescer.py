@@ -0,0 +1,113 @@
+"""Singleflight coalescing of identical upstream calls"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import time
+import httpx
+
+
+class RequestCoalescer:
+    """Identical concurrent upstream calls share one call and its response
+
+    Calls are identified by a hash of method, service endpoint and body (large
+    bodies should be passed as the raw bytes received, see make_key). The
+    first caller starts the upstream call as its own task; callers with the same
+    key arriving while it runs await that task instead of calling again. A
+    caller going away never cancels the shared call. Exceptions are shared too.
+
+    Finished 2xx responses are kept for `ttl` seconds (0 = no cache), at most
+    `max_size` bytes of bodies in total (least recently used evicted first), so
+    near-simultaneous repeats are served without calling upstream.
+    """
+
+    def __init__(self, ttl: float = 0.0, max_size: int = 0, enabled: bool = True):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.enabled = enabled
+        self.calls = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self._in_flight: Dict[str, "asyncio.Task[httpx.Response]"] = {}
+        self._cache: "OrderedDict[str, Tuple[float, httpx.Response]]" = OrderedDict()
+        self._cache_size = 0
+
+    @staticmethod
+    def make_key(method: str, endpoint: str, body: Any = None) -> str:
+        """Key of a call: method, endpoint (service + path) and body
+
+        Raw bytes are hashed as they are; other bodies are serialized as JSON
+        (key order ignored) first, which is only cheap for small bodies.
+        """
+        digest = hashlib.sha256(f"{method.upper()} {endpoint}\0".encode("utf-8"))
+        if isinstance(body, bytes):
+            digest.update(body)
+        elif body is not None:
+            digest.update(json.dumps(body, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _cached(self, key: str) -> Optional[httpx.Response]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires, response = entry
+        if expires < time.monotonic():
+            self._evict(key)
+            return None
+        self._cache.move_to_end(key)
+        return response
+
+    def _evict(self, key: str) -> None:
+        _, response = self._cache.pop(key)
+        self._cache_size -= len(response.content)
+
+    def _store(self, key: str, response: httpx.Response) -> None:
+        size = len(response.content)
+        if self.ttl <= 0 or not response.is_success or size > self.max_size:
+            return
+        if key in self._cache:
+            self._evict(key)
+        self._cache[key] = (time.monotonic() + self.ttl, response)
+        self._cache_size += size
+        while self._cache_size > self.max_size:
+            self._evict(next(iter(self._cache)))
+
+    async def run(self, key: str, call: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        """Response of `call`, shared with identical calls (same key) in flight or cached
+
+        The response is read completely, so it can be handed to any number of callers.
+        """
+        if not self.enabled:
+            return await call()
+        cached = self._cached(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = self._in_flight[key] = asyncio.create_task(call())
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: "asyncio.Task[httpx.Response]") -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled() and task.exception() is None:
+            self._store(key, task.result())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache_hits,
+            "in_flight": len(self._in_flight),
+            "cached_responses": len(self._cache),
+            "cache_size": self._cache_size,
+            "cache_max_size": self.max_size,
+            "ttl": self.ttl
+        }
@@ -0,0 +1,78 @@
+"""Long-lived HTTP clients of the microservices"""
+from typing import Dict
+import logging
+import httpx
+from infrastructure.config.settings import Settings
+
+try:
+    import h2  # noqa: F401 - httpx needs it for HTTP/2
+except ImportError:
+    h2 = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceClients:
+    """One httpx.AsyncClient per microservice, kept for the whole process lifetime
+
+    Each client owns a keep-alive connection pool (limits from Settings), so
+    proxied calls reuse connections instead of paying TCP setup per request.
+    Opened on startup and closed on shutdown (see main.py); a client asked for
+    before startup is created on first use.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.service_urls = {
+            "ifc-parser": settings.ifc_parser_url,
+            "calculation-engine": settings.calculation_engine_url,
+            "cost-calculator": settings.cost_calculator_url,
+            "3d-data": settings.data_3d_url,
+            "db-manager": settings.db_manager_url,
+        }
+        self.timeouts = {
+            "ifc-parser": settings.ifc_parser_timeout,
+            "calculation-engine": settings.calculation_engine_timeout,
+            "cost-calculator": settings.cost_calculator_timeout,
+            "3d-data": settings.data_3d_timeout,
+            "db-manager": settings.db_manager_timeout,
+        }
+        self.http2 = settings.http2
+        if self.http2 and h2 is None:
+            logger.warning("http2 is enabled but the h2 package is not installed - using HTTP/1.1")
+            self.http2 = False
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def _create(self, service_name: str) -> httpx.AsyncClient:
+        settings = self.settings
+        return httpx.AsyncClient(
+            base_url=self.service_urls[service_name],
+            timeout=httpx.Timeout(self.timeouts[service_name], connect=settings.http_connect_timeout),
+            limits=httpx.Limits(
+                max_connections=settings.http_max_connections,
+                max_keepalive_connections=settings.http_max_keepalive_connections,
+                keepalive_expiry=settings.http_keepalive_expiry
+            ),
+            http2=self.http2
+        )
+
+    async def start(self) -> None:
+        """Open the clients of all services"""
+        for service_name in self.service_urls:
+            self.get(service_name)
+
+    def get(self, service_name: str) -> httpx.AsyncClient:
+        """Client of a service (base URL set - requests use the endpoint path); KeyError if unknown"""
+        client = self._clients.get(service_name)
+        if client is None or client.is_closed:
+            if service_name not in self.service_urls:
+                raise KeyError(service_name)
+            client = self._clients[service_name] = self._create(service_name)
+        return client
+
+    async def close(self) -> None:
+        """Close all pooled connections"""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
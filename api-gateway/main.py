@@ -33,6 +33,18 @@ app.include_router(health.router)
 app.include_router(gateway.router)
 
 
+@app.on_event("startup")
+async def startup():
+    """Open the pooled upstream HTTP clients"""
+    await gateway.get_container().service_clients().start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close upstream connections"""
+    await gateway.get_container().service_clients().close()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
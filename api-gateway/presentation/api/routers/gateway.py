@@ -1,8 +1,18 @@
 """Gateway router - routes requests to microservices"""
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
-from pydantic import BaseModel
-from typing import Dict, Any, Optional, List
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.requests import ClientDisconnect
+from typing import AsyncIterator, Dict, Any, Optional, List, Tuple
 from application.container import Container
+import asyncio
+import json
+import logging
+import tempfile
+import httpx
+
+logger = logging.getLogger(__name__)
 
 # Singleton container instance
 _container = None
@@ -24,79 +34,274 @@ class RouteRequest(BaseModel):
     endpoint: str
     method: str = "GET"
     data: Optional[Dict[str, Any]] = None
+    timeout: Optional[float] = Field(None, gt=0)  # Seconds, per sub-request of an aggregate
 
 
 class AggregateRequest(BaseModel):
     """Request model for aggregating multiple service calls"""
     requests: List[RouteRequest]
+    max_concurrency: Optional[int] = Field(None, ge=1)  # Sub-requests in flight at once
+    deadline: Optional[float] = Field(None, gt=0)  # Seconds for the whole aggregate
 
 
 # ========== Direct Service Endpoints (easier to use) ==========
 
+# Bodies up to this size are hashed for coalescing on the event loop
+_INLINE_KEY_SIZE = 1024 * 1024
+
 # IFC Parser Service
-@router.post("/ifc/parse")
+_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"]
+                }
+            }
+        }
+    }
+}
+
+
+def _upload_headers(request: Request) -> Dict[str, str]:
+    """Headers the parser needs to read a relayed multipart body (boundary, length)"""
+    headers = {"content-type": request.headers.get("content-type", "")}
+    if "content-length" in request.headers:
+        headers["content-length"] = request.headers["content-length"]
+    return headers
+
+
+async def _open_parse(
+    parser_client: httpx.AsyncClient,
+    request: Request,
+    params: Dict[str, Any]
+) -> httpx.Response:
+    """Start the upstream parse, relaying the upload body chunk by chunk
+    
+    The returned response is streaming (body not read yet); non-200 answers are
+    read, closed and raised as HTTPException with the parser's status and detail.
+    """
+    upstream = parser_client.build_request(
+        "POST",
+        "/api/ifc/parse",
+        params=params,
+        headers=_upload_headers(request),
+        content=request.stream()
+    )
+    try:
+        response = await parser_client.send(upstream, stream=True)
+    except ClientDisconnect:
+        raise HTTPException(status_code=400, detail="Upload interrupted by client")
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Error parsing IFC file: {str(e)}")
+    
+    if response.status_code != 200:
+        try:
+            await response.aread()
+            detail = response.json().get("detail", response.text)
+        except Exception:
+            detail = response.text
+        finally:
+            await response.aclose()
+        raise HTTPException(status_code=response.status_code, detail=detail)
+    return response
+
+
+async def _relay(response: httpx.Response, chunk_size: int) -> AsyncIterator[bytes]:
+    """Upstream body chunk by chunk; the upstream is closed when the client goes away"""
+    try:
+        async for chunk in response.aiter_bytes(chunk_size):
+            yield chunk
+    finally:
+        await response.aclose()
+
+
+class _ParseCosts:
+    """Costs of a relayed parse - by reference, falling back to sending the elements
+    
+    The cost calculator is given the parse result's content hash and pulls the
+    cost-relevant projection of the elements from the parser itself, so the
+    elements are not decoded and re-encoded by the gateway. The relayed document
+    is spooled meanwhile (in memory up to `spool_size`, then a temp file): if the
+    parser no longer holds the result (404 for the reference), the spooled
+    elements are sent to the cost calculator instead.
+    """
+    
+    def __init__(
+        self,
+        orchestration,
+        content_hash: str,
+        parse_options: Dict[str, Any],
+        price_list_id: Optional[str],
+        spool_size: int
+    ):
+        self.orchestration = orchestration
+        self.content_hash = content_hash
+        self._price = {"price_list_id": price_list_id} if price_list_id is not None else {}
+        self._spool = tempfile.SpooledTemporaryFile(max_size=spool_size)
+        self._reference = asyncio.create_task(self._post(
+            "/api/costs/calculate/reference",
+            {"content_hash": content_hash, "parse_options": parse_options, **self._price}
+        ))
+    
+    async def _post(
+        self,
+        endpoint: str,
+        payload: Dict[str, Any],
+        coalesce: bool = True
+    ) -> Tuple[Optional[httpx.Response], Optional[str]]:
+        """(response, None), or (None, error) if the cost calculator could not be reached"""
+        try:
+            response = await self.orchestration.request("cost-calculator", endpoint, "POST", payload, coalesce=coalesce)
+        except Exception as e:
+            # Don't fail parsing if cost calculation fails
+            logger.warning("Cost calculation error (non-fatal): %s", e)
+            return None, f"Cost calculation error: {str(e)}"
+        return response, None
+    
+    async def write(self, chunk: bytes) -> None:
+        """Spool a chunk of the relayed parser document"""
+        await run_in_threadpool(self._spool.write, chunk)
+    
+    def _spooled_elements(self) -> List[Dict[str, Any]]:
+        self._spool.seek(0)
+        return json.load(self._spool).get("elements", [])
+    
+    async def result(self) -> Tuple[Optional[bytes], Optional[str]]:
+        """(cost breakdown JSON, None), or (None, error) - costs never fail the parse"""
+        response, error = await self._reference
+        if response is not None and response.status_code == 404:
+            logger.info("Parse result %s is not stored by the parser - sending elements to the cost calculator", self.content_hash)
+            elements = await run_in_threadpool(self._spooled_elements)
+            # Not coalesced - hashing the whole element list would block the event loop
+            response, error = await self._post("/api/costs/calculate", {"elements": elements, **self._price}, coalesce=False)
+        if error is not None:
+            return None, error
+        if response.status_code != 200:
+            logger.warning("Cost calculation failed: %s %s", response.status_code, response.text[:200])
+            return None, f"Cost calculation failed: HTTP {response.status_code}"
+        return response.content, None
+    
+    def close(self) -> None:
+        if not self._reference.done():
+            self._reference.cancel()
+        self._spool.close()
+
+
+async def _relay_elements_document(
+    response: httpx.Response,
+    chunk_size: int,
+    costs: Optional[_ParseCosts] = None,
+    costs_error: Optional[str] = None
+) -> AsyncIterator[bytes]:
+    """Parser's {"elements": [...]} document extended with the gateway fields
+    
+    The closing brace is held back and replaced by costs / element_count /
+    costs_calculated (and costs_error when requested costs are missing), so the
+    document is relayed without ever being parsed. `costs` are calculated while
+    the elements are relayed.
+    """
+    count = response.headers.get("x-element-count")
+    cost_json = None
+    held = b""
+    try:
+        async for chunk in _relay(response, chunk_size):
+            if costs is not None:
+                await costs.write(chunk)
+            chunk = held + chunk
+            held = chunk[-1:]
+            if chunk[:-1]:
+                yield chunk[:-1]
+        if held != b"}":
+            raise RuntimeError("Malformed elements document from IFC parser")
+        if costs is not None:
+            cost_json, costs_error = await costs.result()
+    finally:
+        if costs is not None:
+            costs.close()
+    trailer = (
+        b',"costs":' + (cost_json or b"null") +
+        b',"element_count":' + (count.encode("ascii") if count else b"null") +
+        b',"costs_calculated":' + (b"true" if cost_json else b"false")
+    )
+    if costs_error is not None:
+        trailer += b',"costs_error":' + json.dumps(costs_error).encode("utf-8")
+    yield trailer + b"}"
+
+
+@router.post("/ifc/parse", openapi_extra=_UPLOAD_BODY)
 async def parse_ifc(
-    file: UploadFile = File(...),
+    request: Request,
     calculate_costs: bool = True,  # Automatyczne obliczanie kosztów
     price_list_id: Optional[str] = None,  # Opcjonalny cennik
+    include_geometry: bool = False,  # Bounding boxy z geometrii (wolne)
+    stream: bool = False,  # NDJSON - elementy przesyłane w trakcie parsowania
+    types: Optional[str] = None,  # Tylko te klasy IFC, np. IfcBeam,IfcColumn
+    exclude_types: Optional[str] = None,  # Pomiń te klasy IFC
+    properties: Optional[str] = None,  # Tylko te klucze właściwości
+    property_prefixes: Optional[str] = None,  # Tylko klucze z tymi prefiksami
+    include_placement: bool = True,
     container: Container = Depends(get_container)
 ):
     """Parse IFC file and optionally calculate costs
     
+    The multipart upload (field "file") is relayed to the parser as it arrives and
+    the parser's answer is relayed back the same way, so gateway memory per upload
+    stays bounded by `proxy_chunk_size` whatever the file size. Costs are
+    calculated by reference: the cost calculator gets the parse result's content
+    hash and pulls the elements from the parser, while the gateway relays them
+    (see _ParseCosts). Costs that were requested but are missing come with
+    "costs_error".
+    
     Args:
-        file: IFC file to parse
         calculate_costs: If True, automatically calculate costs after parsing
+            (not with types / exclude_types / properties / property_prefixes)
         price_list_id: Optional price list ID for cost calculation
+        include_geometry: If True, parser computes geometry bounding boxes
+        stream: If True, pass the parser's NDJSON stream (one element per line)
+            straight through; costs are not calculated in this mode
+        types, exclude_types, properties, property_prefixes, include_placement:
+            projection passed to the parser (comma separated lists) - the parser
+            skips everything that is not requested
     """
-    import httpx
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="Expected a multipart/form-data upload with a 'file' field")
+    
     settings = container.settings()
+    orchestration = container.orchestration_service()
+    parser_client = orchestration.client("ifc-parser")
     
-    # Read file content
-    content = await file.read()
-    files = {"file": (file.filename, content, file.content_type)}
+    params = {"include_geometry": include_geometry, "include_placement": include_placement}
+    for name, value in (
+        ("types", types), ("exclude_types", exclude_types),
+        ("properties", properties), ("property_prefixes", property_prefixes)
+    ):
+        if value is not None:
+            params[name] = value
     
-    try:
-        async with httpx.AsyncClient(timeout=300.0) as client:
-            # 1. Parse IFC file
-            parse_response = await client.post(
-                f"{settings.ifc_parser_url}/api/ifc/parse",
-                files=files
-            )
-            parse_response.raise_for_status()
-            parse_data = parse_response.json()
-            
-            # IFC parser service returns {"elements": [...]}, extract the array
-            elements = parse_data.get("elements", []) if isinstance(parse_data, dict) else (parse_data if isinstance(parse_data, list) else [])
-            
-            # 2. Calculate costs if requested
-            costs = None
-            if calculate_costs and elements:
-                try:
-                    cost_response = await client.post(
-                        f"{settings.cost_calculator_url}/api/costs/calculate",
-                        json={
-                            "elements": elements,
-                            "price_list_id": price_list_id
-                        },
-                        timeout=120.0
-                    )
-                    if cost_response.status_code == 200:
-                        costs = cost_response.json()
-                    else:
-                        # Don't fail if cost calculation fails, just log
-                        print(f"Cost calculation failed: {cost_response.status_code}")
-                except Exception as e:
-                    # Don't fail parsing if cost calculation fails
-                    print(f"Cost calculation error (non-fatal): {str(e)}")
-            
-            return {
-                "elements": elements,
-                "costs": costs,
-                "element_count": len(elements) if isinstance(elements, list) else 0,
-                "costs_calculated": costs is not None
-            }
-    except httpx.HTTPError as e:
-        raise HTTPException(status_code=500, detail=f"Error parsing IFC file: {str(e)}")
+    if stream:
+        parse_response = await _open_parse(parser_client, request, {**params, "stream": True})
+        return StreamingResponse(
+            _relay(parse_response, settings.proxy_chunk_size),
+            media_type="application/x-ndjson"
+        )
+    
+    parse_response = await _open_parse(parser_client, request, params)
+    
+    costs = costs_error = None
+    content_hash = parse_response.headers.get("x-content-hash")
+    if calculate_costs and any(value is not None for value in (types, exclude_types, properties, property_prefixes)):
+        # Providers would miss properties (or elements) they price by
+        costs_error = "Costs are not calculated for a filtered parse (types, exclude_types, properties, property_prefixes)"
+    elif calculate_costs and content_hash and parse_response.headers.get("x-element-count") != "0":
+        costs = _ParseCosts(orchestration, content_hash, params, price_list_id, settings.proxy_chunk_size)
+    return StreamingResponse(
+        _relay_elements_document(parse_response, settings.proxy_chunk_size, costs, costs_error),
+        media_type="application/json"
+    )
 
 
 @router.get("/ifc/elements")
@@ -117,6 +322,20 @@ async def get_elements(
     return result.value
 
 
+async def _coalesce_key(http_request: Request, container: Container, service_name: str, endpoint: str) -> str:
+    """Coalescing key of a forwarded POST, from the raw body as received
+    
+    Hashing the bytes is cheap - serializing the parsed element list again just
+    for the key would block the event loop on large models. Large bodies are
+    hashed in a worker thread all the same.
+    """
+    body = await http_request.body()
+    make_key = container.request_coalescer().make_key
+    if len(body) > _INLINE_KEY_SIZE:
+        return await run_in_threadpool(make_key, "POST", f"{service_name}{endpoint}", body)
+    return make_key("POST", f"{service_name}{endpoint}", body)
+
+
 # Calculation Engine Service
 class StaticCalculationRequest(BaseModel):
     """Request for static calculation"""
@@ -127,6 +346,7 @@ class StaticCalculationRequest(BaseModel):
 @router.post("/calculations/static")
 async def calculate_static(
     request: StaticCalculationRequest,
+    http_request: Request,
     container: Container = Depends(get_container)
 ):
     """Perform static analysis calculation"""
@@ -135,7 +355,9 @@ async def calculate_static(
         service_name="calculation-engine",
         endpoint="/api/calculations/static",
         method="POST",
-        data={"elements": request.elements, "loads": request.loads}
+        data={"elements": request.elements, "loads": request.loads},
+        coalesce=True,
+        coalesce_key=await _coalesce_key(http_request, container, "calculation-engine", "/api/calculations/static")
     )
     
     if result.is_failure:
@@ -147,6 +369,7 @@ async def calculate_static(
 @router.post("/calculations/strength")
 async def calculate_strength(
     request: StaticCalculationRequest,
+    http_request: Request,
     container: Container = Depends(get_container)
 ):
     """Perform strength analysis"""
@@ -155,7 +378,9 @@ async def calculate_strength(
         service_name="calculation-engine",
         endpoint="/api/calculations/strength",
         method="POST",
-        data={"elements": request.elements}
+        data={"elements": request.elements},
+        coalesce=True,
+        coalesce_key=await _coalesce_key(http_request, container, "calculation-engine", "/api/calculations/strength")
     )
     
     if result.is_failure:
@@ -174,15 +399,18 @@ class CostCalculationRequest(BaseModel):
 @router.post("/costs/calculate")
 async def calculate_costs(
     request: CostCalculationRequest,
+    http_request: Request,
     container: Container = Depends(get_container)
 ):
-    """Calculate costs for elements"""
+    """Calculate costs for elements (identical concurrent requests share one calculation)"""
     orchestration = container.orchestration_service()
     result = await orchestration.route_request(
         service_name="cost-calculator",
         endpoint="/api/costs/calculate",
         method="POST",
-        data={"elements": request.elements, "price_list_id": request.price_list_id}
+        data={"elements": request.elements, "price_list_id": request.price_list_id},
+        coalesce=True,
+        coalesce_key=await _coalesce_key(http_request, container, "cost-calculator", "/api/costs/calculate")
     )
     
     if result.is_failure:
@@ -201,6 +429,7 @@ class VisualizationRequest(BaseModel):
 @router.post("/visualization/scene")
 async def generate_scene(
     request: VisualizationRequest,
+    http_request: Request,
     container: Container = Depends(get_container)
 ):
     """Generate 3D scene data for Three.js"""
@@ -209,7 +438,9 @@ async def generate_scene(
         service_name="3d-data",
         endpoint="/api/visualization/scene",
         method="POST",
-        data={"elements": request.elements, "options": request.options}
+        data={"elements": request.elements, "options": request.options},
+        coalesce=True,
+        coalesce_key=await _coalesce_key(http_request, container, "3d-data", "/api/visualization/scene")
     )
     
     if result.is_failure:
@@ -285,7 +516,14 @@ async def aggregate_requests(
     request: AggregateRequest,
     container: Container = Depends(get_container)
 ):
-    """Aggregate multiple service requests"""
+    """Aggregate multiple service requests
+    
+    Sub-requests run concurrently (up to `max_concurrency`, each with its own
+    `timeout`, all within `deadline`). The response has one entry per request,
+    keyed by its index, with status ("ok", "error", "timeout",
+    "deadline_exceeded"), HTTP status code, timings and data or error - a
+    failed entry does not discard the others.
+    """
     orchestration = container.orchestration_service()
     
     requests_list = [
@@ -293,15 +531,25 @@ async def aggregate_requests(
             "service": req.service,
             "endpoint": req.endpoint,
             "method": req.method,
-            "data": req.data
+            "data": req.data,
+            "timeout": req.timeout
         }
         for req in request.requests
     ]
     
-    result = await orchestration.aggregate_responses(requests_list)
+    result = await orchestration.aggregate_responses(
+        requests_list,
+        max_concurrency=request.max_concurrency,
+        deadline=request.deadline
+    )
     
     if result.is_failure:
         raise HTTPException(status_code=500, detail=result.error)
     
     return result.value
 
+
+@router.get("/gateway/coalescing")
+async def coalescing_stats(container: Container = Depends(get_container)):
+    """Counters of request coalescing (shared in-flight calls and TTL cache hits)"""
+    return container.request_coalescer().stats()
@@ -1,6 +1,7 @@
 """Dependency Injection Container for Cost Calculator Service"""
 from dependency_injector import containers, providers
 from infrastructure.services.cost_service import CostService
+from infrastructure.services.parser_client import ParserClient
 from infrastructure.config.settings import Settings
 from infrastructure.config.rules_loader import JsonRuleLoader
 
@@ -14,6 +15,12 @@ class Container(containers.DeclarativeContainer):
         JsonRuleLoader
     )
     
+    # Pooled client of ifc-parser-service
+    parser_client = providers.Singleton(
+        ParserClient,
+        settings=settings
+    )
+    
     cost_service = providers.Factory(
         CostService,
         settings=settings,
@@ -1,6 +1,6 @@
 """Cost provider interfaces - Strategy pattern for different cost types"""
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from decimal import Decimal
 
 from domain.entities.cost_breakdown import CostItem, ElementCostBreakdown
@@ -23,6 +23,13 @@ class ICostProvider(ABC):
     def get_provider_name(self) -> str:
         """Get name of this provider (e.g., 'material', 'labor', 'connection')"""
         pass
+    
+    def get_property_keys(self) -> Optional[List[str]]:
+        """Element property keys this provider reads (None = needs all properties)
+        
+        Used to request only these properties when elements are pulled from the parser.
+        """
+        return None
 
 
 class IMaterialCostProvider(ICostProvider):
@@ -7,6 +7,12 @@ class Settings(BaseMicroserviceSettings):
     api_host: str = "0.0.0.0"
     api_port: int = 5003
     api_prefix: str = "/api/costs"
+    
+    # ifc-parser-service (elements of parsed models are pulled by reference)
+    ifc_parser_url: str = "http://ifc-parser-service:5001"
+    ifc_parser_timeout: float = 120.0
+    http_connect_timeout: float = 5.0
+    
     log_level: str = "INFO"
     
     class Config:
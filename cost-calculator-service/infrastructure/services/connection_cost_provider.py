@@ -9,9 +9,18 @@ from domain.entities.cost_breakdown import CostItem
 class ConnectionCostProvider(IConnectionCostProvider):
     """Calculates costs for connections, welds, bolts, joints"""
     
+    # Every property key read below
+    PROPERTY_KEYS = [
+        'CONNECTION_CODE', 'Welding', 'Bolts', 'WeldLength', 'WeldingLength', 'BaseQuantities.Length',
+        'BoltCount', 'FastenerCount', 'BoltType', 'BoltSize', 'JointType'
+    ]
+    
     def get_provider_name(self) -> str:
         return "connection"
     
+    def get_property_keys(self) -> List[str]:
+        return list(self.PROPERTY_KEYS)
+    
     def can_calculate(self, element: Dict[str, Any]) -> bool:
         """Can calculate if element has connection info"""
         properties = element.get('properties', {})
@@ -194,10 +203,14 @@ class ConnectionCostProvider(IConnectionCostProvider):
         
         return cost_items
     
-    def _try_get_property(self, properties: Dict[str, str], keys: List[str]) -> float:
-        """Try to get numeric property value"""
+    def _try_get_property(self, properties: Dict[str, Any], keys: List[str]) -> float:
+        """Try to get numeric property value (typed numbers, or strings from the legacy format)"""
         for key in keys:
             value = properties.get(key)
+            if isinstance(value, bool):
+                continue
+            if isinstance(value, (int, float)):
+                return float(value)
             if value:
                 try:
                     return float(value)
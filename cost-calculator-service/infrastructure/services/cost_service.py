@@ -31,6 +31,16 @@ class CostService(ICostService):
             # SurfaceTreatmentCostProvider(),
         ]
     
+    def get_property_keys(self) -> Optional[List[str]]:
+        """Property keys read by the providers and the waste factor (None = all needed)"""
+        keys = ['MATERIAL']
+        for provider in self.providers:
+            provider_keys = provider.get_property_keys()
+            if provider_keys is None:
+                return None
+            keys.extend(key for key in provider_keys if key not in keys)
+        return keys
+    
     def _create_default_rule_loader(self) -> IRuleLoader:
         """Create default rule loader"""
         from infrastructure.config.rules_loader import JsonRuleLoader
@@ -9,9 +9,22 @@ from domain.entities.cost_breakdown import CostItem
 class MaterialCostProvider(IMaterialCostProvider):
     """Calculates material costs based on weight/volume"""
     
+    MATERIAL_KEYS = ['MATERIAL', 'Type.MATERIAL']
+    WEIGHT_KEYS = ['BaseQuantities.NetWeight', 'NetWeight', 'Weight']
+    VOLUME_KEYS = ['BaseQuantities.NetVolume', 'NetVolume', 'Volume']
+    WIDTH_KEYS = ['BaseQuantities.Width', 'Width', 'w']
+    HEIGHT_KEYS = ['BaseQuantities.Height', 'Height', 'h']
+    LENGTH_KEYS = ['BaseQuantities.Length', 'Length', 'l']
+    
     def get_provider_name(self) -> str:
         return "material"
     
+    def get_property_keys(self) -> List[str]:
+        return (
+            self.MATERIAL_KEYS + self.WEIGHT_KEYS + self.VOLUME_KEYS +
+            self.WIDTH_KEYS + self.HEIGHT_KEYS + self.LENGTH_KEYS
+        )
+    
     def can_calculate(self, element: Dict[str, Any]) -> bool:
         """Can calculate if element has material info"""
         properties = element.get('properties', {})
@@ -52,28 +65,25 @@ class MaterialCostProvider(IMaterialCostProvider):
         )]
     
     def _get_quantity(self, element: Dict[str, Any], material_config: Dict[str, Any]) -> Decimal:
-        """Get quantity based on material config and element properties"""
+        """Get quantity based on material config and element properties
+        
+        The parser's quantity takeoff ("quantities", SI units) is used first;
+        property keys are the fallback for elements parsed without it.
+        """
         properties = element.get('properties', {})
+        quantities = element.get('quantities') or {}
         unit = material_config.get('unit', 'kg')
         
         # Try NetWeight first (most accurate)
         if unit == 'kg':
-            weight = self._try_get_property(properties, [
-                'BaseQuantities.NetWeight',
-                'NetWeight',
-                'Weight'
-            ])
+            weight = self._try_get_quantity(quantities, ['net_weight', 'gross_weight']) or self._try_get_property(properties, self.WEIGHT_KEYS)
             if weight > 0:
                 return Decimal(str(weight))
             
             # Calculate from volume if density available
             density = material_config.get('density_kg_m3')
             if density:
-                volume = self._try_get_property(properties, [
-                    'BaseQuantities.NetVolume',
-                    'NetVolume',
-                    'Volume'
-                ])
+                volume = self._try_get_quantity(quantities, ['net_volume', 'gross_volume']) or self._try_get_property(properties, self.VOLUME_KEYS)
                 if volume > 0:
                     # volume is in m³, convert to kg
                     return Decimal(str(volume * density))
@@ -85,11 +95,7 @@ class MaterialCostProvider(IMaterialCostProvider):
         
         # For m³ units
         elif unit == 'm³':
-            volume = self._try_get_property(properties, [
-                'BaseQuantities.NetVolume',
-                'NetVolume',
-                'Volume'
-            ])
+            volume = self._try_get_quantity(quantities, ['net_volume', 'gross_volume']) or self._try_get_property(properties, self.VOLUME_KEYS)
             if volume > 0:
                 return Decimal(str(volume))
             
@@ -100,10 +106,22 @@ class MaterialCostProvider(IMaterialCostProvider):
         
         return Decimal('0.00')
     
-    def _try_get_property(self, properties: Dict[str, str], keys: List[str]) -> float:
-        """Try to get numeric property value"""
+    def _try_get_quantity(self, quantities: Dict[str, Any], columns: List[str]) -> float:
+        """First positive takeoff value of the given columns (0.0 if none)"""
+        for column in columns:
+            value = quantities.get(column)
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+                return float(value)
+        return 0.0
+    
+    def _try_get_property(self, properties: Dict[str, Any], keys: List[str]) -> float:
+        """Try to get numeric property value (typed numbers, or strings from the legacy format)"""
         for key in keys:
             value = properties.get(key)
+            if isinstance(value, bool):
+                continue
+            if isinstance(value, (int, float)):
+                return float(value)
             if value:
                 try:
                     return float(value)
@@ -113,15 +131,9 @@ class MaterialCostProvider(IMaterialCostProvider):
     
     def _calculate_volume_from_dimensions(self, properties: Dict[str, str]) -> float:
         """Calculate volume from Width x Height x Length"""
-        width = self._try_get_property(properties, [
-            'BaseQuantities.Width', 'Width', 'w'
-        ])
-        height = self._try_get_property(properties, [
-            'BaseQuantities.Height', 'Height', 'h'
-        ])
-        length = self._try_get_property(properties, [
-            'BaseQuantities.Length', 'Length', 'l'
-        ])
+        width = self._try_get_property(properties, self.WIDTH_KEYS)
+        height = self._try_get_property(properties, self.HEIGHT_KEYS)
+        length = self._try_get_property(properties, self.LENGTH_KEYS)
         
         if width > 0 and height > 0 and length > 0:
             # Assume dimensions are in mm, convert to m³
@@ -0,0 +1,51 @@
+"""Client pulling parse results from ifc-parser-service"""
+from typing import Any, Dict, List, Optional
+import httpx
+
+from infrastructure.config.settings import Settings
+
+
+class ParserClient:
+    """Fetches element projections of parsed models by reference (content hash)
+    
+    One pooled connection set, opened on first use and kept alive between
+    requests; close() on shutdown.
+    """
+    
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.settings.ifc_parser_url,
+                timeout=httpx.Timeout(self.settings.ifc_parser_timeout, connect=self.settings.http_connect_timeout)
+            )
+        return self._client
+    
+    async def fetch_projection(
+        self,
+        content_hash: str,
+        parse_options: Dict[str, Any],
+        property_keys: Optional[List[str]] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Compact elements (ids, type, name, `property_keys` properties, quantities) of a parse
+        
+        parse_options: the projection query the model was parsed with (part of the
+        reference). None if the parser no longer has the result; other failures
+        raise httpx.HTTPError.
+        """
+        params = dict(parse_options)
+        if property_keys is not None:
+            params["keys"] = property_keys
+        response = await self._get_client().get(f"/api/ifc/results/{content_hash}/projection", params=params)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()["elements"]
+    
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -12,6 +12,13 @@ container = Container()
 # Include routers
 app.include_router(costs.router)
 
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close the connections to ifc-parser-service"""
+    await costs.get_container().parser_client().close()
+
+
 @app.get("/")
 async def root():
     return {"message": "Cost Calculator Service", "version": "1.0.0", "docs": "/docs"}
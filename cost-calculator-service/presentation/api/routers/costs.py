@@ -2,6 +2,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any, List
 from pydantic import BaseModel
+import httpx
 from application.container import Container
 from ifc_common import Result
 
@@ -43,6 +44,45 @@ async def calculate_costs(
     return result.value
 
 
+class ReferenceCostCalculationRequest(BaseModel):
+    """Request model for cost calculation of a model parsed by ifc-parser-service"""
+    content_hash: str  # X-Content-Hash of the parser's /parse response
+    parse_options: Dict[str, Any] = {}  # Projection query the model was parsed with
+    price_list_id: str = "default"
+
+
+@router.post("/calculate/reference")
+async def calculate_costs_by_reference(
+    request: ReferenceCostCalculationRequest,
+    container: Container = Depends(get_container)
+):
+    """Calculate costs for a parsed model referenced by its content hash
+    
+    Instead of receiving elements, the service pulls a compact projection of the
+    parse result from the parser - only the properties the cost providers read,
+    plus quantities. 404 if the parser no longer has the result.
+    """
+    cost_service = container.cost_service()
+    
+    try:
+        elements = await container.parser_client().fetch_projection(
+            request.content_hash,
+            request.parse_options,
+            cost_service.get_property_keys()
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Error fetching elements from IFC parser: {str(e)}")
+    if elements is None:
+        raise HTTPException(status_code=404, detail=f"IFC parser has no result for {request.content_hash}")
+    
+    result = await cost_service.calculate_costs(elements=elements)
+    
+    if result.is_failure:
+        raise HTTPException(status_code=500, detail=result.error)
+    
+    return result.value
+
+
 @router.get("/health")
 async def health_check():
     """Health check"""
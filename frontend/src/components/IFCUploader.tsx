@@ -12,6 +12,11 @@ interface IFCUploaderProps {
   onLocalLoad?: (file: File) => void; // Opcjonalna funkcja do lokalnego ładowania
 }
 
+// Skompresowane pliki (.ifczip, gzip, zstd) są rozpakowywane przez backend
+const ACCEPTED_EXTENSIONS = ['.ifc', '.ifczip', '.ifc.gz', '.ifc.zst'];
+
+const isAccepted = (name: string) => ACCEPTED_EXTENSIONS.some((extension) => name.toLowerCase().endsWith(extension));
+
 export function IFCUploader({ onParsed, onError, isLoading, setIsLoading, onLocalLoad }: IFCUploaderProps) {
   const [file, setFile] = useState<File | null>(null);
   const [uploadStatus, setUploadStatus] = useState<string>('');
@@ -19,12 +24,12 @@ export function IFCUploader({ onParsed, onError, isLoading, setIsLoading, onLoca
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     const selectedFile = e.target.files?.[0];
     if (selectedFile) {
-      if (selectedFile.name.endsWith('.ifc')) {
+      if (isAccepted(selectedFile.name)) {
         setFile(selectedFile);
         setUploadStatus('');
         onError(''); // Clear previous errors
       } else {
-        onError('Proszę wybrać plik .ifc');
+        onError('Proszę wybrać plik .ifc, .ifczip, .ifc.gz lub .ifc.zst');
         setFile(null);
       }
     }
@@ -67,6 +72,11 @@ export function IFCUploader({ onParsed, onError, isLoading, setIsLoading, onLoca
       return;
     }
 
+    if (!file.name.toLowerCase().endsWith('.ifc')) {
+      onError('Lokalnie można załadować tylko nieskompresowany plik .ifc');
+      return;
+    }
+
     if (onLocalLoad) {
       setUploadStatus('Ładowanie pliku lokalnie...');
       onLocalLoad(file);
@@ -93,7 +103,7 @@ export function IFCUploader({ onParsed, onError, isLoading, setIsLoading, onLoca
         <input
           id="ifc-file-input"
           type="file"
-          accept=".ifc"
+          accept={ACCEPTED_EXTENSIONS.join(',')}
           onChange={handleFileChange}
           className="hidden"
           style={{ pointerEvents: 'auto' }}
@@ -1,6 +1,11 @@
 """Dependency Injection Container for IFC Parser Service"""
 from dependency_injector import containers, providers
 from infrastructure.services.ifc_parser_service import IfcParserService
+from infrastructure.services.model_sessions import ModelSessionStore
+from infrastructure.services.model_snapshot import ModelSnapshotStore
+from infrastructure.services.parse_jobs import ParseJobManager
+from infrastructure.services.parse_metrics import ParseMetrics
+from infrastructure.services.parse_result_cache import ParseResultCache
 from infrastructure.config.settings import Settings
 
 
@@ -14,8 +19,41 @@ class Container(containers.DeclarativeContainer):
     settings = providers.Singleton(Settings)
     
     # Infrastructure services
+    parse_metrics = providers.Singleton(ParseMetrics)
+    
+    model_snapshot_store = providers.Singleton(
+        ModelSnapshotStore,
+        snapshot_dir=settings.provided.snapshot_dir,
+        max_size=settings.provided.snapshot_max_size,
+        enabled=settings.provided.snapshot_enabled
+    )
+    
     ifc_parser_service = providers.Singleton(
         IfcParserService,
-        settings=settings
+        settings=settings,
+        metrics=parse_metrics,
+        snapshots=model_snapshot_store
+    )
+    
+    parse_result_cache = providers.Singleton(
+        ParseResultCache,
+        cache_dir=settings.provided.parse_cache_dir,
+        max_size=settings.provided.parse_cache_max_size,
+        enabled=settings.provided.parse_cache_enabled
+    )
+    
+    parse_job_manager = providers.Singleton(
+        ParseJobManager,
+        parser_service=ifc_parser_service,
+        workers=settings.provided.parse_job_workers,
+        max_queued=settings.provided.parse_job_queue_size,
+        max_finished=settings.provided.parse_job_history,
+        result_memory_budget=settings.provided.parse_job_result_memory_budget,
+        result_ttl=settings.provided.parse_job_result_ttl
+    )
+    
+    model_session_store = providers.Singleton(
+        ModelSessionStore,
+        max_models=settings.provided.session_max_models,
+        memory_budget=settings.provided.session_memory_budget
     )
-
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""IFC parser benchmark - throughput, latency and peak memory of IfcParserService.parse_file
+
+Runs on the sample model and on synthetic models that replicate its beams, columns,
+members, plates and assemblies N times (fresh GlobalIds, relationships copied so every
+replica has the same psets, types and aggregation as its original). Results are
+written as JSON so runs of different commits can be compared:
+
+    python benchmark.py --scales 1,10,100 --output bench.json
+    python benchmark.py --scales 1,10,100 --compare bench.json
+"""
+from typing import Any, Dict, Iterator, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+import ifcopenshell
+import ifcopenshell.guid
+from domain.entities.parse_options import ParseOptions
+from infrastructure.config.settings import Settings
+from infrastructure.services.ifc_parser_service import IfcParserService
+from infrastructure.services.parse_metrics import ParseMetrics, ParseProfile, current_rss
+
+
+DEFAULT_SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "KONSTRUKCJA_NAWA_III.ifc")
+
+# Entities copied for every replica
+REPLICATED_PRODUCTS = {"IFCBEAM", "IFCCOLUMN", "IFCMEMBER", "IFCPLATE", "IFCELEMENTASSEMBLY"}
+# Relationships copied (with references to replicated products remapped) for every replica
+REPLICATED_RELATIONS = {
+    "IFCRELDEFINESBYPROPERTIES",
+    "IFCRELDEFINESBYTYPE",
+    "IFCRELAGGREGATES",
+    "IFCRELCONTAINEDINSPATIALSTRUCTURE",
+    "IFCRELASSOCIATESMATERIAL"
+}
+
+_INSTANCE = re.compile(r"#(\d+)\s*=\s*([A-Za-z0-9_]+)\s*\((.*)\)\s*$", re.S)
+_STRING = re.compile(r"('(?:[^']|'')*')")
+_REFERENCE = re.compile(r"#(\d+)")
+
+
+def _split_instances(data: str) -> Iterator[str]:
+    """Entity instances of a DATA section (";" inside strings is not a separator)"""
+    start = 0
+    in_string = False
+    for position, char in enumerate(data):
+        if char == "'":
+            in_string = not in_string
+        elif char == ";" and not in_string:
+            yield data[start:position].strip()
+            start = position + 1
+
+
+def _remap(args: str, replicated: set, offset: int) -> str:
+    """Shift references to replicated entities by `offset` (strings are left alone)"""
+    parts = _STRING.split(args)
+    for index in range(0, len(parts), 2):
+        parts[index] = _REFERENCE.sub(
+            lambda match: f"#{int(match.group(1)) + offset}" if int(match.group(1)) in replicated else match.group(0),
+            parts[index]
+        )
+    return "".join(parts)
+
+
+def _with_global_id(args: str, global_id: str) -> str:
+    """Replace the first attribute (GlobalId) of a rooted entity"""
+    return _STRING.sub(f"'{global_id}'", args, count=1)
+
+
+def generate_scaled_model(sample_path: str, scale: int, output_path: str, seed: int = 0) -> Dict[str, Any]:
+    """Write a model with `scale` copies of the sample's structural products"""
+    with open(sample_path, "r", encoding="utf-8", errors="surrogateescape") as f:
+        text = f.read()
+
+    data_start = text.index("DATA;") + len("DATA;")
+    data_end = text.index("ENDSEC;", data_start)
+    instances = []
+    for raw in _split_instances(text[data_start:data_end]):
+        match = _INSTANCE.match(raw)
+        if match:
+            instances.append((int(match.group(1)), match.group(2).upper(), match.group(3)))
+
+    max_id = max(entity_id for entity_id, _, _ in instances)
+    replicated = {entity_id for entity_id, entity_type, _ in instances if entity_type in REPLICATED_PRODUCTS}
+    relations = [
+        (entity_id, entity_type, args) for entity_id, entity_type, args in instances
+        if entity_type in REPLICATED_RELATIONS
+        and any(int(ref) in replicated for ref in _REFERENCE.findall("".join(_STRING.split(args)[0::2])))
+    ]
+    products = [item for item in instances if item[0] in replicated]
+
+    rng = random.Random(seed)
+
+    def fresh_global_id() -> str:
+        return ifcopenshell.guid.compress(uuid.UUID(int=rng.getrandbits(128)).hex)
+
+    with open(output_path, "w", encoding="utf-8", errors="surrogateescape") as out:
+        out.write(text[:data_end])
+        for copy in range(1, scale):
+            offset = copy * max_id
+            lines = []
+            for entity_id, entity_type, args in products + relations:
+                new_args = _with_global_id(_remap(args, replicated, offset), fresh_global_id())
+                lines.append(f"#{entity_id + offset}= {entity_type}({new_args});\n")
+            out.write("".join(lines))
+        out.write(text[data_end:])
+
+    return {
+        "products_per_copy": len(products),
+        "relations_per_copy": len(relations),
+        "file_size_bytes": os.path.getsize(output_path)
+    }
+
+
+def _available_memory() -> Optional[int]:
+    """MemAvailable in bytes (None where /proc/meminfo does not exist)"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _run_once(settings: Settings, path: str, options: ParseOptions) -> Dict[str, Any]:
+    """One cold parse (new service instance, so no type cache is reused)"""
+    service = IfcParserService(settings, metrics=ParseMetrics())
+    profile = ParseProfile()
+    rss_before = current_rss()
+    started = time.perf_counter()
+    result = await service.parse_file(path, options=options, profile=profile)
+    seconds = time.perf_counter() - started
+    if result.is_failure:
+        raise RuntimeError(result.error)
+    elements = len(result.value)
+    return {
+        "seconds": round(seconds, 4),
+        "elements": elements,
+        "elements_per_second": round(elements / seconds, 1) if seconds > 0 else None,
+        "peak_rss_bytes": profile.peak_rss,
+        "peak_rss_delta_bytes": profile.peak_rss - rss_before,
+        "stages": {stage: round(value, 4) for stage, value in profile.stages.items()}
+    }
+
+
+def benchmark_model(settings: Settings, name: str, path: str, scale: int, runs: int, options: ParseOptions) -> Dict[str, Any]:
+    """Parse one model `runs` times and summarize"""
+    samples = [asyncio.run(_run_once(settings, path, options)) for _ in range(runs)]
+    seconds = [sample["seconds"] for sample in samples]
+    median = statistics.median(seconds)
+    elements = samples[0]["elements"]
+    return {
+        "model": name,
+        "scale": scale,
+        "file_size_bytes": os.path.getsize(path),
+        "elements": elements,
+        "median_seconds": round(median, 4),
+        "min_seconds": min(seconds),
+        "max_seconds": max(seconds),
+        "elements_per_second": round(elements / median, 1) if median > 0 else None,
+        "peak_rss_bytes": max(sample["peak_rss_bytes"] for sample in samples),
+        "runs": samples
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Human readable comparison with a previous result file"""
+    previous = {(item["model"], item["scale"]): item for item in baseline.get("results", []) if "median_seconds" in item}
+    lines = [f"{'model':<32} {'scale':>6} {'median s':>10} {'prev s':>10} {'change':>8} {'peak MB':>9}"]
+    for item in results["results"]:
+        if "median_seconds" not in item:
+            lines.append(f"{item['model']:<32} {item['scale']:>6} skipped: {item.get('skipped')}")
+            continue
+        before = previous.get((item["model"], item["scale"]))
+        change = f"{(item['median_seconds'] / before['median_seconds'] - 1) * 100:+.1f}%" if before else "n/a"
+        lines.append(
+            f"{item['model']:<32} {item['scale']:>6} {item['median_seconds']:>10.3f} "
+            f"{before['median_seconds'] if before else float('nan'):>10.3f} {change:>8} "
+            f"{item['peak_rss_bytes'] / 1e6:>9.1f}"
+        )
+    return lines
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", default=DEFAULT_SAMPLE, help="IFC file to benchmark and replicate")
+    parser.add_argument("--scales", default="1,10,100,1000", help="Comma separated replication factors (1 = sample itself)")
+    parser.add_argument("--runs", type=int, default=3, help="Parses per model (median is reported)")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "ifc-benchmark"),
+                        help="Where synthetic models are generated (reused between runs)")
+    parser.add_argument("--include-geometry", action="store_true", help="Also tessellate geometry")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="Previous results JSON to compare with")
+    args = parser.parse_args(argv)
+
+    settings = Settings()
+    options = ParseOptions(include_geometry=args.include_geometry)
+    scales = [int(value) for value in args.scales.split(",") if value.strip()]
+    os.makedirs(args.work_dir, exist_ok=True)
+    sample_name = os.path.splitext(os.path.basename(args.sample))[0]
+    sample_size = os.path.getsize(args.sample)
+
+    results: Dict[str, Any] = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "ifcopenshell": ifcopenshell.version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sample": os.path.basename(args.sample),
+            "runs": args.runs,
+            "options": options.to_dict(),
+            "settings": {
+                "parse_workers": settings.parse_workers,
+                "parallel_parse_min_size": settings.parallel_parse_min_size,
+                "placement_mode": settings.placement_mode,
+                "geometry_threads": settings.geometry_threads
+            }
+        },
+        "results": []
+    }
+
+    for scale in scales:
+        name = sample_name if scale == 1 else f"{sample_name}.x{scale}"
+        # Opened models take several times the file size - don't start what cannot fit
+        available = _available_memory()
+        if available is not None and sample_size * scale * 10 > available:
+            results["results"].append({"model": name, "scale": scale, "skipped": "not enough memory"})
+            print(f"[{name}] skipped - needs ~{sample_size * scale * 10 / 1e9:.1f} GB", file=sys.stderr)
+            continue
+
+        path = args.sample
+        if scale > 1:
+            path = os.path.join(args.work_dir, f"{name}.ifc")
+            if not os.path.exists(path):
+                print(f"[{name}] generating ...", file=sys.stderr)
+                generate_scaled_model(args.sample, scale, path)
+
+        print(f"[{name}] parsing {args.runs}x ...", file=sys.stderr)
+        item = benchmark_model(settings, name, path, scale, args.runs, options)
+        results["results"].append(item)
+        print(
+            f"[{name}] {item['elements']} elements, median {item['median_seconds']:.3f} s, "
+            f"{item['elements_per_second']} el/s, peak {item['peak_rss_bytes'] / 1e6:.0f} MB",
+            file=sys.stderr
+        )
+
+    document = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(document + "\n")
+    else:
+        print(document)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\n".join(compare(results, baseline)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
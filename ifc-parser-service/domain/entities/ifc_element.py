@@ -1,14 +1,17 @@
 """IFC Element entity"""
 from dataclasses import dataclass
-from typing import Dict, Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 
 
-@dataclass
+@dataclass(slots=True)
 class IfcElement:
-    """IFC Element domain entity"""
+    """IFC Element domain entity (see IfcModel for the compact form of a whole model)"""
     global_id: str
     type_name: str
     name: str
-    properties: Dict[str, str]
+    properties: Dict[str, Any]  # native values: str, int, float, bool, None
     placement_matrix: Optional[List[float]] = None
+    units: Optional[Dict[str, str]] = None  # unit symbol by property key (quantities, measures)
+    quantities: Optional[Dict[str, float]] = None  # takeoff in SI units by QUANTITY_COLUMNS name
+    derived_quantities: Optional[Tuple[str, ...]] = None  # quantities computed from the profile, not read from the model
 
@@ -0,0 +1,393 @@
+"""Compact (columnar) IFC model"""
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+import hashlib
+import numpy as np
+from domain.entities.ifc_element import IfcElement
+from domain.entities.quantities import QUANTITY_COLUMNS
+
+
+class IfcModel(Sequence):
+    """Parsed model stored column by column
+
+    Instead of one dict per element:
+    - property keys live once in `key_table`; elements reference them by index and
+      elements with the same key set share one key tuple
+    - equal property values share one object (value pool)
+    - all placement matrices are one (N, 16) numpy array
+    - quantity takeoff is one (N, len(QUANTITY_COLUMNS)) numpy array in SI units
+      (NaN where an element has no value), so totals are vectorised
+
+    Indexing / iterating returns lazy IfcElementView objects, which expose the same
+    attributes as IfcElement, so existing callers keep working.
+    """
+
+    def __init__(self):
+        self.global_ids: List[str] = []
+        self.type_names: List[str] = []
+        self.names: List[str] = []
+        self.key_table: List[str] = []
+        self._key_ids: Dict[str, int] = {}
+        self._key_sets: Dict[Tuple[int, ...], Tuple[int, ...]] = {}
+        self._value_pool: Dict[Any, Any] = {}
+        self._property_keys: List[Tuple[int, ...]] = []
+        self._property_values: List[Tuple[Any, ...]] = []
+        self._units: List[Optional[Dict[str, str]]] = []
+        self._unit_maps: Dict[Tuple[Tuple[str, str], ...], Dict[str, str]] = {}
+        self._index_by_global_id: Optional[Dict[str, int]] = None
+        self._placements = array('d')
+        self._has_placement = bytearray()
+        self._placement_matrices: Optional[np.ndarray] = None
+        self._quantities = array('d')
+        self._derived_quantities = bytearray()
+        self._quantity_matrix: Optional[np.ndarray] = None
+        self._derived_quantity_mask: Optional[np.ndarray] = None
+        self._property_hashes: Optional[np.ndarray] = None
+        self._placement_hashes: Optional[np.ndarray] = None
+        self._quantity_hashes: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_elements(cls, elements: Iterable[IfcElement]) -> "IfcModel":
+        """Build compact model from domain entities (consumed one at a time)"""
+        model = cls()
+        for element in elements:
+            model._append(element)
+        model._finalize()
+        return model
+
+    @classmethod
+    def from_columns(
+        cls,
+        global_ids: Iterable[str],
+        type_names: Iterable[str],
+        names: Iterable[str],
+        key_table: Iterable[str],
+        property_keys: Iterable[Sequence[int]],
+        property_values: Iterable[Sequence[Any]],
+        units: Iterable[Optional[Dict[str, str]]],
+        placement_matrices: np.ndarray,
+        has_placement: np.ndarray,
+        pool_values: bool = True,
+        quantity_matrix: Optional[np.ndarray] = None,
+        derived_quantity_mask: Optional[np.ndarray] = None
+    ) -> "IfcModel":
+        """Rebuild a model from its columns (e.g. a snapshot)
+
+        property_keys: per element, indices into key_table; placement_matrices and
+        quantity_matrix are used as they are (they may be read-only memory-mapped
+        arrays). pool_values=False if equal property values already are shared objects.
+        Without a quantity_matrix the model has no quantities.
+        """
+        model = cls()
+        model.global_ids = list(global_ids)
+        model.type_names = [model._pooled(type_name) for type_name in type_names]
+        model.names = [model._pooled(name) for name in names]
+        model.key_table = list(key_table)
+        model._key_ids = {key: key_id for key_id, key in enumerate(model.key_table)}
+        for key_set, values in zip(property_keys, property_values):
+            key_set = tuple(key_set)
+            model._property_keys.append(model._key_sets.setdefault(key_set, key_set))
+            model._property_values.append(tuple(model._pooled(value) for value in values) if pool_values else tuple(values))
+        for unit_map in units:
+            if unit_map:
+                unit_items = tuple(unit_map.items())
+                model._units.append(model._unit_maps.setdefault(unit_items, dict(unit_items)))
+            else:
+                model._units.append(None)
+        model._has_placement = bytearray(np.asarray(has_placement, dtype=np.uint8).tobytes())
+        model._finalize()
+        model._placement_matrices = np.asarray(placement_matrices, dtype=np.float64).reshape(-1, 16)
+        if quantity_matrix is not None:
+            model._quantity_matrix = np.asarray(quantity_matrix, dtype=np.float64).reshape(-1, len(QUANTITY_COLUMNS))
+            if derived_quantity_mask is not None:
+                model._derived_quantity_mask = np.asarray(derived_quantity_mask, dtype=bool).reshape(model._quantity_matrix.shape)
+            else:
+                model._derived_quantity_mask = np.zeros(model._quantity_matrix.shape, dtype=bool)
+        return model
+
+    def _pooled(self, value: Any) -> Any:
+        """Shared instance of an equal value (keyed by type too - 1 == 1.0 == True)"""
+        try:
+            return self._value_pool.setdefault((type(value), value), value)
+        except TypeError:
+            # Unhashable values are stored as they are
+            return value
+
+    def _key_id(self, key: str) -> int:
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            key_id = len(self.key_table)
+            self._key_ids[key] = key_id
+            self.key_table.append(key)
+        return key_id
+
+    def _append(self, element: IfcElement) -> None:
+        self.global_ids.append(element.global_id)
+        self.type_names.append(self._pooled(element.type_name))
+        self.names.append(self._pooled(element.name))
+
+        key_set = tuple(self._key_id(key) for key in element.properties)
+        self._property_keys.append(self._key_sets.setdefault(key_set, key_set))
+        self._property_values.append(tuple(self._pooled(value) for value in element.properties.values()))
+
+        # Most elements share the same unit map - keep one read-only copy of each
+        if element.units:
+            unit_items = tuple(element.units.items())
+            self._units.append(self._unit_maps.setdefault(unit_items, dict(unit_items)))
+        else:
+            self._units.append(None)
+
+        if element.placement_matrix is not None and len(element.placement_matrix) == 16:
+            self._placements.extend(element.placement_matrix)
+            self._has_placement.append(1)
+        else:
+            self._placements.extend(np.eye(4).flatten().tolist())
+            self._has_placement.append(0)
+
+        quantities = element.quantities or {}
+        derived = element.derived_quantities or ()
+        self._quantities.extend(quantities.get(column, np.nan) for column in QUANTITY_COLUMNS)
+        self._derived_quantities.extend(column in derived for column in QUANTITY_COLUMNS)
+
+    def _finalize(self) -> None:
+        """Move placements into the (N, 16) array and drop build-time tables"""
+        self._placement_matrices = np.frombuffer(self._placements, dtype=np.float64).reshape(-1, 16).copy()
+        self._placements = array('d')
+        columns = len(QUANTITY_COLUMNS)
+        self._quantity_matrix = np.frombuffer(self._quantities, dtype=np.float64).reshape(-1, columns).copy()
+        self._derived_quantity_mask = np.frombuffer(bytes(self._derived_quantities), dtype=np.uint8).reshape(-1, columns).astype(bool)
+        if len(self._quantity_matrix) != len(self.global_ids):
+            # Built from columns without quantities
+            self._quantity_matrix = np.full((len(self.global_ids), columns), np.nan)
+            self._derived_quantity_mask = np.zeros((len(self.global_ids), columns), dtype=bool)
+        self._quantities = array('d')
+        self._derived_quantities = bytearray()
+        self._value_pool = {}
+        self._key_sets = {}
+        self._unit_maps = {}
+
+    @property
+    def placement_matrices(self) -> np.ndarray:
+        """(N, 16) placement matrices (identity where an element has none)"""
+        return self._placement_matrices
+
+    def placement_matrix(self, index: int) -> Optional[List[float]]:
+        """Placement of one element as a list (None if it has none)"""
+        if not self._has_placement[index]:
+            return None
+        return self._placement_matrices[index].tolist()
+
+    @property
+    def has_placement(self) -> np.ndarray:
+        """(N,) bool - which elements have a placement"""
+        return np.frombuffer(bytes(self._has_placement), dtype=np.uint8).astype(bool)
+
+    @property
+    def quantity_matrix(self) -> np.ndarray:
+        """(N, len(QUANTITY_COLUMNS)) quantities in SI units (NaN where an element has none)"""
+        return self._quantity_matrix
+
+    @property
+    def derived_quantity_mask(self) -> np.ndarray:
+        """(N, len(QUANTITY_COLUMNS)) bool - values derived from the profile, not read from the model"""
+        return self._derived_quantity_mask
+
+    def quantity_column(self, column: str) -> np.ndarray:
+        """(N,) values of one quantity column (a view - do not modify)"""
+        return self._quantity_matrix[:, QUANTITY_COLUMNS.index(column)]
+
+    def quantities(self, index: int) -> Optional[Dict[str, float]]:
+        """Quantities of one element in SI units (None if it has none)"""
+        row = self._quantity_matrix[index]
+        quantities = {column: float(value) for column, value in zip(QUANTITY_COLUMNS, row) if value == value}
+        return quantities or None
+
+    def derived_quantities(self, index: int) -> Optional[Tuple[str, ...]]:
+        """Quantity columns of one element derived from the profile (None if none)"""
+        derived = tuple(column for column, flag in zip(QUANTITY_COLUMNS, self._derived_quantity_mask[index]) if flag)
+        return derived or None
+
+    def quantity_totals_by_type(self) -> Dict[str, Dict[str, float]]:
+        """Sum of each quantity column per IFC class (elements without a value count as 0)"""
+        type_names, inverse = np.unique(np.asarray(self.type_names, dtype=object), return_inverse=True)
+        totals = np.zeros((len(type_names), len(QUANTITY_COLUMNS)))
+        np.add.at(totals, inverse, np.nan_to_num(self._quantity_matrix, nan=0.0))
+        return {
+            type_name: dict(zip(QUANTITY_COLUMNS, row.tolist()))
+            for type_name, row in zip(type_names.tolist(), totals)
+        }
+
+    def property_items(self, index: int) -> Tuple[Tuple[int, ...], Tuple[Any, ...]]:
+        """Properties of one element as (key ids into key_table, values) - shared, do not modify"""
+        return self._property_keys[index], self._property_values[index]
+
+    def properties(self, index: int) -> Dict[str, Any]:
+        """Properties of one element as a new dictionary"""
+        key_table = self.key_table
+        return {
+            key_table[key_id]: value
+            for key_id, value in zip(self._property_keys[index], self._property_values[index])
+        }
+
+    def units(self, index: int) -> Optional[Dict[str, str]]:
+        """Unit symbols by property key (shared between elements - do not modify)"""
+        return self._units[index]
+
+    def property(self, index: int, key: str, default: Any = None) -> Any:
+        """Single property value without building the dictionary"""
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            return default
+        try:
+            return self._property_values[index][self._property_keys[index].index(key_id)]
+        except ValueError:
+            return default
+
+    def global_id_index(self) -> Dict[str, int]:
+        """GlobalId → position (built on first use, do not modify)"""
+        if self._index_by_global_id is None:
+            self._index_by_global_id = {global_id: index for index, global_id in enumerate(self.global_ids)}
+        return self._index_by_global_id
+
+    def index_of(self, global_id: str) -> Optional[int]:
+        """Position of an element by GlobalId"""
+        return self.global_id_index().get(global_id)
+
+    @staticmethod
+    def _digest(data: bytes) -> int:
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+    def property_hashes(self) -> np.ndarray:
+        """(N,) uint64 hashes of type, name and properties (computed once)
+
+        Independent of property order and of the ".id" entries (STEP ids change on
+        every export). The sorted key layout is prepared once per shared key set, so
+        per element only the values are serialized.
+        """
+        if self._property_hashes is None:
+            key_table = self.key_table
+            layouts: Dict[int, Tuple[Tuple[int, ...], Tuple[int, ...], bytes]] = {}
+            hashes = np.empty(len(self), dtype=np.uint64)
+            for index, (key_set, values) in enumerate(zip(self._property_keys, self._property_values)):
+                layout = layouts.get(id(key_set))
+                if layout is None:
+                    keys = [key_table[key_id] for key_id in key_set]
+                    order = tuple(sorted(
+                        (position for position, key in enumerate(keys) if key != "id" and not key.endswith(".id")),
+                        key=lambda position: keys[position]
+                    ))
+                    # Key set is kept in the entry so its id() cannot be reused
+                    layout = (key_set, order, repr(tuple(keys[position] for position in order)).encode("utf-8"))
+                    layouts[id(key_set)] = layout
+                data = repr((self.type_names[index], self.names[index], tuple(values[position] for position in layout[1])))
+                hashes[index] = self._digest(layout[2] + data.encode("utf-8"))
+            self._property_hashes = hashes
+        return self._property_hashes
+
+    def placement_hashes(self) -> np.ndarray:
+        """(N,) uint64 hashes of placement matrices rounded to 1e-6 (computed once)"""
+        if self._placement_hashes is None:
+            # + 0.0 turns -0.0 into 0.0
+            rounded = np.round(self._placement_matrices, 6) + 0.0
+            self._placement_hashes = np.fromiter(
+                (self._digest(row.tobytes() + bytes((flag,))) for row, flag in zip(rounded, self._has_placement)),
+                dtype=np.uint64,
+                count=len(self)
+            )
+        return self._placement_hashes
+
+    def quantity_hashes(self) -> np.ndarray:
+        """(N,) uint64 hashes of quantities rounded to 1e-6 and their derived flags (computed once)"""
+        if self._quantity_hashes is None:
+            # + 0.0 turns -0.0 into 0.0; NaN (no quantity) becomes one canonical value
+            rounded = np.round(self._quantity_matrix, 6) + 0.0
+            rounded[np.isnan(rounded)] = np.nan
+            derived = np.packbits(self._derived_quantity_mask, axis=1)
+            self._quantity_hashes = np.fromiter(
+                (self._digest(row.tobytes() + flags.tobytes()) for row, flags in zip(rounded, derived)),
+                dtype=np.uint64,
+                count=len(self)
+            )
+        return self._quantity_hashes
+
+    def content_hash(self, index: int) -> str:
+        """Content hash of one element (properties + placement + quantities) as hex"""
+        return (
+            f"{int(self.property_hashes()[index]):016x}"
+            f"{int(self.placement_hashes()[index]):016x}"
+            f"{int(self.quantity_hashes()[index]):016x}"
+        )
+
+    def to_element(self, index: int) -> IfcElement:
+        """Materialize one element as a plain domain entity"""
+        return IfcElement(
+            global_id=self.global_ids[index],
+            type_name=self.type_names[index],
+            name=self.names[index],
+            properties=self.properties(index),
+            placement_matrix=self.placement_matrix(index),
+            units=dict(self._units[index]) if self._units[index] else None,
+            quantities=self.quantities(index),
+            derived_quantities=self.derived_quantities(index)
+        )
+
+    def __len__(self) -> int:
+        return len(self.global_ids)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union["IfcElementView", List["IfcElementView"]]:
+        if isinstance(index, slice):
+            return [IfcElementView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("IfcModel index out of range")
+        return IfcElementView(self, index)
+
+    def __iter__(self) -> Iterator["IfcElementView"]:
+        for index in range(len(self)):
+            yield IfcElementView(self, index)
+
+
+class IfcElementView:
+    """Lazy read-only view of one element of an IfcModel (same attributes as IfcElement)"""
+
+    __slots__ = ("_model", "_index")
+
+    def __init__(self, model: IfcModel, index: int):
+        self._model = model
+        self._index = index
+
+    @property
+    def global_id(self) -> str:
+        return self._model.global_ids[self._index]
+
+    @property
+    def type_name(self) -> str:
+        return self._model.type_names[self._index]
+
+    @property
+    def name(self) -> str:
+        return self._model.names[self._index]
+
+    @property
+    def properties(self) -> Dict[str, Any]:
+        return self._model.properties(self._index)
+
+    @property
+    def placement_matrix(self) -> Optional[List[float]]:
+        return self._model.placement_matrix(self._index)
+
+    @property
+    def units(self) -> Optional[Dict[str, str]]:
+        return self._model.units(self._index)
+
+    @property
+    def quantities(self) -> Optional[Dict[str, float]]:
+        return self._model.quantities(self._index)
+
+    @property
+    def derived_quantities(self) -> Optional[Tuple[str, ...]]:
+        return self._model.derived_quantities(self._index)
+
+    def __repr__(self) -> str:
+        return f"IfcElementView(global_id={self.global_id!r}, type_name={self.type_name!r})"
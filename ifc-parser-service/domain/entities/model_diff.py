@@ -0,0 +1,116 @@
+"""Difference between two revisions of a model"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+import numpy as np
+from domain.entities.ifc_model import IfcModel
+
+
+@dataclass(slots=True)
+class ModifiedElement:
+    """Element present in both revisions with different content"""
+    global_id: str
+    content_hash: str  # of the new revision
+    properties_changed: bool
+    placement_changed: bool
+    quantities_changed: bool
+    changed_keys: Optional[List[str]] = None  # only with details
+
+
+@dataclass
+class ModelDiff:
+    """Added / removed / modified elements, matched by GlobalId
+
+    Elements are compared by their content hashes (IfcModel.property_hashes /
+    placement_hashes / quantity_hashes), so unchanged elements cost one integer comparison and only
+    modified elements are ever expanded into dictionaries (with details).
+    """
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    modified: List[ModifiedElement] = field(default_factory=list)
+    unchanged_count: int = 0
+
+    @classmethod
+    def between(cls, old: IfcModel, new: IfcModel, details: bool = False) -> "ModelDiff":
+        """Diff of two parsed revisions; with details, list changed property keys of modified elements"""
+        old_index = old.global_id_index()
+        new_index = new.global_id_index()
+
+        diff = cls()
+        diff.removed = [global_id for global_id in old_index if global_id not in new_index]
+
+        old_positions = []
+        new_positions = []
+        for global_id, new_position in new_index.items():
+            old_position = old_index.get(global_id)
+            if old_position is None:
+                diff.added.append(global_id)
+            else:
+                old_positions.append(old_position)
+                new_positions.append(new_position)
+
+        old_positions = np.asarray(old_positions, dtype=np.int64)
+        new_positions = np.asarray(new_positions, dtype=np.int64)
+        properties_changed = old.property_hashes()[old_positions] != new.property_hashes()[new_positions]
+        placement_changed = old.placement_hashes()[old_positions] != new.placement_hashes()[new_positions]
+        quantities_changed = old.quantity_hashes()[old_positions] != new.quantity_hashes()[new_positions]
+        changed = properties_changed | placement_changed | quantities_changed
+        diff.unchanged_count = int(len(changed) - changed.sum())
+
+        for pair in np.flatnonzero(changed):
+            old_position = int(old_positions[pair])
+            new_position = int(new_positions[pair])
+            element = ModifiedElement(
+                global_id=new.global_ids[new_position],
+                content_hash=new.content_hash(new_position),
+                properties_changed=bool(properties_changed[pair]),
+                placement_changed=bool(placement_changed[pair]),
+                quantities_changed=bool(quantities_changed[pair])
+            )
+            if details and element.properties_changed:
+                element.changed_keys = cls._changed_keys(old, old_position, new, new_position)
+            diff.modified.append(element)
+        return diff
+
+    @staticmethod
+    def _changed_keys(old: IfcModel, old_position: int, new: IfcModel, new_position: int) -> List[str]:
+        """Property keys added, removed or changed ("type_name" / "name" if those changed)"""
+        old_properties = old.properties(old_position)
+        new_properties = new.properties(new_position)
+        missing = object()
+        keys = sorted(
+            key for key in old_properties.keys() | new_properties.keys()
+            if key != "id" and not key.endswith(".id")
+            and (type(old_properties.get(key, missing)), old_properties.get(key, missing))
+            != (type(new_properties.get(key, missing)), new_properties.get(key, missing))
+        )
+        if old.names[old_position] != new.names[new_position]:
+            keys.insert(0, "name")
+        if old.type_names[old_position] != new.type_names[new_position]:
+            keys.insert(0, "type_name")
+        return keys
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Diff for API responses"""
+        modified = []
+        for element in self.modified:
+            item = {
+                "global_id": element.global_id,
+                "content_hash": element.content_hash,
+                "properties_changed": element.properties_changed,
+                "placement_changed": element.placement_changed,
+                "quantities_changed": element.quantities_changed
+            }
+            if element.changed_keys is not None:
+                item["changed_keys"] = element.changed_keys
+            modified.append(item)
+        return {
+            "summary": {
+                "added": len(self.added),
+                "removed": len(self.removed),
+                "modified": len(self.modified),
+                "unchanged": self.unchanged_count
+            },
+            "added": self.added,
+            "removed": self.removed,
+            "modified": modified
+        }
@@ -0,0 +1,41 @@
+"""Parse options (projection / filtering)"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ParseOptions:
+    """What a parse extracts - skipped work is never done, not filtered afterwards
+
+    include_types / exclude_types: IFC classes (subtypes match too, e.g. "IfcBeam"
+    also selects IfcBeamStandardCase); None = all products
+    property_keys / property_prefixes: properties to keep, by exact key
+    ("Pset_BeamCommon.Span") or key prefix ("Type.", "BaseQuantities."); both None =
+    all properties, an empty whitelist = no properties at all
+    include_placement: resolve placement matrices
+    include_quantities: quantity takeoff in SI units (IfcElementQuantity, else profile-derived)
+    include_geometry: tessellate products for `_geometry_bounds` / `_geometry_size`
+    """
+    include_types: Optional[Tuple[str, ...]] = None
+    exclude_types: Tuple[str, ...] = field(default_factory=tuple)
+    property_keys: Optional[Tuple[str, ...]] = None
+    property_prefixes: Optional[Tuple[str, ...]] = None
+    include_placement: bool = True
+    include_quantities: bool = True
+    include_geometry: bool = False
+
+    @property
+    def filters_properties(self) -> bool:
+        return self.property_keys is not None or self.property_prefixes is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Options as plain values (cache keys, job status)"""
+        return {
+            "include_types": list(self.include_types) if self.include_types is not None else None,
+            "exclude_types": list(self.exclude_types),
+            "property_keys": list(self.property_keys) if self.property_keys is not None else None,
+            "property_prefixes": list(self.property_prefixes) if self.property_prefixes is not None else None,
+            "include_placement": self.include_placement,
+            "include_quantities": self.include_quantities,
+            "include_geometry": self.include_geometry
+        }
@@ -0,0 +1,15 @@
+"""Quantity takeoff columns"""
+
+# Column → SI unit of its values
+QUANTITY_UNITS = {
+    "net_weight": "kg",
+    "gross_weight": "kg",
+    "net_volume": "m3",
+    "gross_volume": "m3",
+    "net_area": "m2",
+    "gross_area": "m2",
+    "length": "m"
+}
+
+# Column order of IfcModel.quantity_matrix
+QUANTITY_COLUMNS = tuple(QUANTITY_UNITS)
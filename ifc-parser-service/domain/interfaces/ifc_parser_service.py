@@ -1,7 +1,10 @@
 """IFC Parser service interface"""
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Any, AsyncIterator, Optional, Tuple, Union
 from domain.entities.ifc_element import IfcElement
+from domain.entities.ifc_model import IfcModel
+from domain.entities.model_diff import ModelDiff
+from domain.entities.parse_options import ParseOptions
 from ifc_common import Result
 
 
@@ -9,8 +12,71 @@ class IIfcParserService(ABC):
     """Interface for IFC parser service"""
     
     @abstractmethod
-    async def parse_file(self, file_path: str) -> Result[List[IfcElement], str]:
-        """Parse IFC file"""
+    async def parse_file(
+        self,
+        source: Union[str, bytes],
+        options: Optional[ParseOptions] = None,
+        content_hash: Optional[str] = None,
+        profile=None
+    ) -> Result[IfcModel, str]:
+        """Parse IFC file from a path or from its content (compact model, iterable as elements)"""
+        pass
+    
+    @abstractmethod
+    async def open_model(
+        self,
+        source: Union[str, bytes],
+        options: Optional[ParseOptions] = None,
+        content_hash: Optional[str] = None,
+        profile=None
+    ) -> Result[Tuple[Any, IfcModel], str]:
+        """Parse IFC file and keep it open: (opened file handle, compact model)"""
+        pass
+    
+    @abstractmethod
+    async def diff_files(
+        self,
+        old_source: Union[str, bytes],
+        new_source: Union[str, bytes],
+        options: Optional[ParseOptions] = None,
+        details: bool = False,
+        old_content_hash: Optional[str] = None,
+        new_content_hash: Optional[str] = None
+    ) -> Result[ModelDiff, str]:
+        """Parse two revisions of a model and diff them by GlobalId"""
+        pass
+    
+    @abstractmethod
+    async def diff_models(self, old_model: IfcModel, new_model: IfcModel, details: bool = False) -> Result[ModelDiff, str]:
+        """Diff two parsed revisions by GlobalId (content hashes of properties and placement)"""
+        pass
+    
+    @abstractmethod
+    def stream_file(
+        self,
+        source: Union[str, bytes],
+        options: Optional[ParseOptions] = None,
+        content_hash: Optional[str] = None,
+        profile=None
+    ) -> AsyncIterator[IfcElement]:
+        """Parse IFC file, yielding elements as they are parsed"""
+        pass
+    
+    @abstractmethod
+    def parse_with_progress(
+        self,
+        source: Union[str, bytes],
+        options: Optional[ParseOptions] = None,
+        content_hash: Optional[str] = None,
+        progress=None,
+        profile=None
+    ) -> IfcModel:
+        """Parse IFC file in the calling thread, reporting progress (blocking, for background jobs)"""
+        pass
+    
+    @abstractmethod
+    async def load_parsed(self, content_hash: str, options: Optional[ParseOptions] = None) -> Optional[IfcModel]:
+        """Model of an earlier parse by content hash + options (None if not stored)"""
         pass
     
     @abstractmethod
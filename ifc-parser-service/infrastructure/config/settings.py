@@ -16,6 +16,40 @@ class Settings(BaseMicroserviceSettings):
     # IFC Parsing
     upload_dir: str = "./uploads"
     max_file_size: int = 100 * 1024 * 1024  # 100 MB
+    in_memory_parse_max_size: int = 32 * 1024 * 1024  # smaller uploads are parsed from memory, larger are spooled to disk
+    upload_chunk_size: int = 1024 * 1024  # chunk size when spooling uploads to disk
+    upload_max_decompressed_size: int = 4 * 1024 * 1024 * 1024  # .ifczip / gzip / zstd uploads are cut off above this (413)
+    type_cache_revisions: int = 8  # file revisions whose type psets are kept between parses
+    parse_workers: int = 1  # processes for sharded parsing (0 = all CPU cores, 1 = no sharding)
+    parallel_parse_min_size: int = 20 * 1024 * 1024  # smaller files are parsed in a single thread
+    geometry_threads: int = 0  # tessellation threads for include_geometry (0 = all CPU cores)
+    stream_buffer_size: int = 256  # elements buffered between parser thread and NDJSON response
+    placement_mode: str = "local"  # "local" (like C#, element placement only) or "global" (full hierarchy)
+    
+    # STEP validation (/api/ifc/validate, validate=true on /parse)
+    validation_max_errors: int = 20  # validation stops after this many errors
+    validation_max_statement_size: int = 16 * 1024 * 1024  # longer statements are rejected (unterminated string)
+    
+    # Background parse jobs
+    parse_job_workers: int = 2  # jobs parsed at the same time
+    parse_job_queue_size: int = 16  # waiting jobs before submissions are refused (429)
+    parse_job_history: int = 64  # finished jobs whose status is kept
+    parse_job_result_memory_budget: int = 512 * 1024 * 1024  # estimated; older job models are released above it
+    parse_job_result_ttl: float = 3600.0  # seconds a finished job keeps its model
+    
+    # Resident model sessions (/api/ifc/models)
+    session_max_models: int = 8
+    session_memory_budget: int = 1024 * 1024 * 1024  # 1 GB, estimated
+    
+    # Parse result cache (keyed by hash of uploaded bytes)
+    parse_cache_enabled: bool = True
+    parse_cache_dir: str = "./cache/parsed"
+    parse_cache_max_size: int = 2 * 1024 * 1024 * 1024  # 2 GB
+    
+    # Model snapshots (Arrow files of parsed models, memory-mapped on warm starts)
+    snapshot_enabled: bool = True
+    snapshot_dir: str = "./cache/snapshots"
+    snapshot_max_size: int = 4 * 1024 * 1024 * 1024  # 4 GB
     
     # Logging
     log_level: str = "INFO"
@@ -0,0 +1,137 @@
+"""Size-bounded directory of cache files, evicted least recently used first"""
+from typing import Any, Dict, Optional
+import os
+import threading
+import uuid
+
+
+class FileLruStore:
+    """Entry files `<key><suffix>` under `directory`, at most `max_size` bytes in total
+
+    Shared by the parse result cache and the model snapshot store. Entries are
+    written to a temp file and published with an atomic rename, so readers never
+    see partial files. Recency is tracked with file mtimes and the least recently
+    used entries are removed once the total size exceeds `max_size`; a single
+    entry larger than `max_size` is never published (counted as too_large).
+    """
+
+    def __init__(self, directory: str, suffix: str, max_size: int, enabled: bool = True):
+        self.directory = directory
+        self.suffix = suffix
+        self.max_size = max_size
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.too_large = 0
+        self.discarded = 0
+        self._lock = threading.Lock()
+        self._sizes: Dict[str, int] = {}
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            for file_name in os.listdir(self.directory):
+                path = os.path.join(self.directory, file_name)
+                if file_name.endswith(self.suffix):
+                    self._sizes[path] = os.path.getsize(path)
+                elif file_name.endswith(".tmp"):
+                    # Leftover of an interrupted write
+                    os.remove(path)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}{self.suffix}")
+
+    def tmp_path(self, key: str) -> str:
+        """Unique temp file to write an entry to before publishing it"""
+        return os.path.join(self.directory, f".{key}.{uuid.uuid4().hex}.tmp")
+
+    def get_path(self, key: str) -> Optional[str]:
+        """Path of a stored entry (counts as hit/miss and refreshes recency)
+
+        Hits and misses only ever grow (they are exported as counters): an entry
+        that turns out to be gone or unreadable is discarded without taking the
+        hit back, and counted in `discarded`.
+        """
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        with self._lock:
+            if path not in self._sizes or not os.path.exists(path):
+                self._sizes.pop(path, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return path
+
+    def discard(self, path: str) -> None:
+        """Drop an entry handed out by get_path that was evicted meanwhile or is unreadable"""
+        with self._lock:
+            self._sizes.pop(path, None)
+            self.discarded += 1
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def fits(self, size: int) -> bool:
+        """False (and counted as too_large) if an entry of `size` bytes could never be kept"""
+        if size <= self.max_size:
+            return True
+        with self._lock:
+            self.too_large += 1
+        return False
+
+    def publish(self, tmp_path: str, key: str) -> bool:
+        """Move a finished temp file into the store and evict old entries
+
+        An entry larger than max_size is dropped instead - storing it would only
+        evict everything else and then itself.
+        """
+        if not self.fits(os.path.getsize(tmp_path)):
+            os.remove(tmp_path)
+            return False
+        path = self.path(key)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._sizes[path] = os.path.getsize(path)
+            self.stores += 1
+            self._evict()
+        return True
+
+    def _evict(self) -> None:
+        """Remove least recently used entries until the store fits in max_size (lock held)"""
+        total = sum(self._sizes.values())
+        if total <= self.max_size:
+            return
+        by_age = sorted(
+            self._sizes,
+            key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0.0
+        )
+        for path in by_age:
+            if total <= self.max_size:
+                break
+            total -= self._sizes.pop(path)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "too_large": self.too_large,
+                "discarded": self.discarded,
+                "entries": len(self._sizes),
+                "size_bytes": sum(self._sizes.values()),
+                "max_size_bytes": self.max_size
+            }
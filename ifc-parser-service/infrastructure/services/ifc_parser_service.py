@@ -1,453 +1,729 @@
 """IFC Parser service implementation"""
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple, Union
 import os
 import json
+import asyncio
+import concurrent.futures
+import threading
+import hashlib
+import heapq
+import logging
+import tempfile
+import time
 import ifcopenshell
-import ifcopenshell.util.element
-import ifcopenshell.util.placement
-import ifcopenshell.util.shape
-import numpy as np
 from domain.entities.ifc_element import IfcElement
+from domain.entities.ifc_model import IfcModel
+from domain.entities.model_diff import ModelDiff
+from domain.entities.parse_options import ParseOptions
 from domain.interfaces.ifc_parser_service import IIfcParserService
 from ifc_common import Result
 from infrastructure.config.settings import Settings
+from infrastructure.services.geometry_bounds import GeometryBoundsCalculator
+from infrastructure.services.model_snapshot import ModelSnapshotStore
+from infrastructure.services.parse_jobs import ParseProgress
+from infrastructure.services.parse_metrics import ParseMetrics, ParseProfile
+from infrastructure.services.placement_resolver import PlacementResolver
+from infrastructure.services.property_set_index import PropertyKeyFilter, PropertySet, PropertySetIndex, TypePropertyCache
+from infrastructure.services.quantity_takeoff import QuantityTakeoff
+from infrastructure.services.step_validator import StepValidator
+
+
+logger = logging.getLogger(__name__)
+
+# Path of an IFC file or its content
+IfcSource = Union[str, bytes]
 
 
 class IfcParserService(IIfcParserService):
     """IFC Parser service implementation"""
     
-    def __init__(self, settings: Settings):
+    def __init__(
+        self,
+        settings: Settings,
+        metrics: Optional[ParseMetrics] = None,
+        snapshots: Optional[ModelSnapshotStore] = None
+    ):
         self.settings = settings
+        self.metrics = metrics or ParseMetrics()
+        self.snapshots = snapshots
+        # Type psets survive between parses of the same file revision
+        self._type_cache = TypePropertyCache(max_revisions=settings.type_cache_revisions)
+        self._process_pool = None
+        # Snapshots are written one at a time, off the request path
+        self._snapshot_writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot")
+        self._pending_snapshots: Dict[str, concurrent.futures.Future] = {}
+    
+    @staticmethod
+    def _file_revision(source: IfcSource) -> str:
+        """Content hash identifying a file revision"""
+        if isinstance(source, bytes):
+            return hashlib.sha256(source).hexdigest()
+        digest = hashlib.sha256()
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def snapshot_metadata(self, content_hash: str, options: Optional[ParseOptions] = None) -> Dict[str, Any]:
+        """What a snapshot of a parse was made from (stored in the snapshot file)"""
+        return {
+            "content_hash": content_hash,
+            "options": (options or ParseOptions()).to_dict(),
+            "placement_mode": self.settings.placement_mode
+        }
+    
+    def _snapshot_key(self, content_hash: Optional[str], options: Optional[ParseOptions]) -> Optional[str]:
+        """Snapshot store key of a parse (None when snapshots are off or the hash is unknown)"""
+        if self.snapshots is None or not self.snapshots.enabled or content_hash is None:
+            return None
+        return self.snapshots.make_key(
+            content_hash,
+            placement_mode=self.settings.placement_mode,
+            **(options or ParseOptions()).to_dict()
+        )
+    
+    def _save_snapshot(self, key: str, model: IfcModel, content_hash: str, options: Optional[ParseOptions]) -> None:
+        """Write the snapshot in the background (the parse result is returned right away)"""
+        future = self._snapshot_writer.submit(
+            self.snapshots.save, key, model, self.snapshot_metadata(content_hash, options)
+        )
+        self._pending_snapshots[key] = future
+        
+        def forget(done: concurrent.futures.Future) -> None:
+            if self._pending_snapshots.get(key) is done:
+                del self._pending_snapshots[key]
+        
+        future.add_done_callback(forget)
+    
+    async def load_parsed(self, content_hash: str, options: Optional[ParseOptions] = None) -> Optional[IfcModel]:
+        """Model of an earlier parse by reference (content hash + options), from its snapshot
+        
+        Waits for the snapshot if it is still being written, so a result can be
+        referenced right after the parse response. None if there is no snapshot.
+        """
+        key = self._snapshot_key(content_hash, options)
+        if key is None:
+            return None
+        pending = self._pending_snapshots.get(key)
+        if pending is not None:
+            await asyncio.wrap_future(pending)
+        return await asyncio.get_running_loop().run_in_executor(None, self.snapshots.load, key)
+    
+    @staticmethod
+    def _source_size(source: IfcSource) -> int:
+        return len(source) if isinstance(source, bytes) else os.path.getsize(source)
+    
+    @staticmethod
+    def _open(source: IfcSource) -> ifcopenshell.file:
+        """Open IFC model from a path or directly from the file content in memory"""
+        if not isinstance(source, bytes):
+            return ifcopenshell.open(source)
+        try:
+            text = source.decode("utf-8")
+        except UnicodeDecodeError:
+            # Not UTF-8 - let ifcopenshell read the raw bytes from disk
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".ifc") as tmp_file:
+                tmp_file.write(source)
+            try:
+                return ifcopenshell.open(tmp_file.name)
+            finally:
+                os.remove(tmp_file.name)
+        return ifcopenshell.file.from_string(text)
     
-    def _extract_properties(self, element) -> Dict[str, Any]:
-        """Extract properties from IFC element"""
-        properties = {}
+    def _extract_properties(self, element, pset_index: PropertySetIndex) -> PropertySet:
+        """Extract properties (native values) and their units from IFC element"""
+        properties = PropertySet({}, {})
         
         try:
-            # Get Psets (Property Sets)
-            psets = ifcopenshell.util.element.get_psets(element)
-            for pset_name, pset_props in psets.items():
-                for prop_name, prop_value in pset_props.items():
-                    key = f"{pset_name}.{prop_name}" if pset_name != "Base" else prop_name
-                    properties[key] = str(prop_value) if prop_value is not None else ""
+            # Get Psets (Property Sets) - already flattened once per property set
+            properties = pset_index.get_properties(element)
             
             # Get Type properties if element has type
-            if hasattr(element, 'IsTypedBy') and element.IsTypedBy:
-                type_element = element.IsTypedBy[0].RelatingType
-                if type_element:
-                    type_psets = ifcopenshell.util.element.get_psets(type_element)
-                    for pset_name, pset_props in type_psets.items():
-                        for prop_name, prop_value in pset_props.items():
-                            key = f"Type.{pset_name}.{prop_name}" if pset_name != "Base" else f"Type.{prop_name}"
-                            if key not in properties:  # Don't override instance properties
-                                properties[key] = str(prop_value) if prop_value is not None else ""
+            type_element = pset_index.get_type(element)
+            if type_element is not None:
+                type_properties = pset_index.get_type_properties(type_element)
+                for key, value in type_properties.values.items():
+                    if key not in properties.values:  # Don't override instance properties
+                        properties.values[key] = value
+                        if key in type_properties.units:
+                            properties.units[key] = type_properties.units[key]
         except Exception as e:
             # If property extraction fails, continue without properties
             pass
         
-        # Add basic geometric properties if available
-        try:
-            if hasattr(element, 'ObjectPlacement'):
-                # Try to get dimensions from geometry
-                if hasattr(element, 'Representation'):
-                    # This would require more complex geometry extraction
-                    pass
-        except Exception:
-            pass
-        
         return properties
     
-    def _get_placement_matrix(self, element) -> List[float]:
-        """Extract GLOBAL placement transformation matrix from IFC element
+    def _get_placement_matrix(self, element, resolver: PlacementResolver) -> List[float]:
+        """Extract placement transformation matrix from IFC element
         
-        CRITICAL: In IFC, placement can be hierarchical:
+        In IFC, placement can be hierarchical:
         - Site → Building → BuildingStorey → Element
         - Assembly → Element
-        Local placement is relative to parent, so we need to accumulate through hierarchy.
+        The resolver caches every IfcLocalPlacement by id, so shared parents are
+        resolved once per parse. By default only the element's LOCAL placement is used
+        (like C# ToWpfMatrix3D); set `placement_mode = "global"` to accumulate the hierarchy.
         
         Returns matrix in format similar to WPF Matrix3D (column-major):
         [m00, m10, m20, m30, m01, m11, m21, m31, m02, m12, m22, m32, m03, m13, m23, m33]
         where indices 12, 13, 14 are translation (OffsetX, OffsetY, OffsetZ)
         """
+        return resolver.resolve(getattr(element, 'ObjectPlacement', None))
+    
+    def _get_quantities(self, element, takeoff: QuantityTakeoff) -> Tuple[Dict[str, float], Tuple[str, ...]]:
+        """Quantity takeoff of IFC element (none if its quantities or profile cannot be read)"""
         try:
-            if not hasattr(element, 'ObjectPlacement') or element.ObjectPlacement is None:
-                return [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
-            
-            def extract_matrix_from_placement(placement_obj) -> np.ndarray:
-                """Extract transformation matrix from IIfcLocalPlacement (exactly like C# ToWpfMatrix3D)"""
-                try:
-                    if not hasattr(placement_obj, 'RelativePlacement'):
-                        return np.eye(4)
-                    
-                    rel_placement = placement_obj.RelativePlacement
-                    if rel_placement is None:
-                        return np.eye(4)
-                    
-                    # Extract Location (origin/translation) - like C#: location.Coordinates
-                    origin = np.array([0.0, 0.0, 0.0])
-                    if hasattr(rel_placement, 'Location') and rel_placement.Location is not None:
-                        location = rel_placement.Location
-                        if hasattr(location, 'Coordinates'):
-                            coords = location.Coordinates
-                            try:
-                                if isinstance(coords, (list, tuple)) and len(coords) >= 3:
-                                    origin = np.array([float(coords[0]), float(coords[1]), float(coords[2])])
-                                elif hasattr(coords, '__getitem__'):
-                                    origin = np.array([float(coords[0]), float(coords[1]), float(coords[2])])
-                                elif hasattr(coords, '__iter__'):
-                                    coords_list = list(coords)[:3]
-                                    if len(coords_list) >= 3:
-                                        origin = np.array([float(coords_list[0]), float(coords_list[1]), float(coords_list[2])])
-                            except (ValueError, TypeError, IndexError):
-                                pass
-                    
-                    # Extract Axis (Z-axis) - like C#: axis.DirectionRatios
-                    zAxis = np.array([0.0, 0.0, 1.0])  # Default Z-up
-                    if hasattr(rel_placement, 'Axis') and rel_placement.Axis is not None:
-                        axis = rel_placement.Axis
-                        if hasattr(axis, 'DirectionRatios'):
-                            ratios = axis.DirectionRatios
-                            try:
-                                if isinstance(ratios, (list, tuple)) and len(ratios) >= 3:
-                                    zAxis = np.array([float(ratios[0]), float(ratios[1]), float(ratios[2])])
-                                elif hasattr(ratios, '__getitem__'):
-                                    zAxis = np.array([float(ratios[0]), float(ratios[1]), float(ratios[2])])
-                            except (ValueError, TypeError, IndexError):
-                                pass
-                        # Normalize
-                        zNorm = np.linalg.norm(zAxis)
-                        if zNorm > 1e-6:
-                            zAxis = zAxis / zNorm
-                    
-                    # Extract RefDirection (X-axis) - like C#: refDirection.DirectionRatios
-                    xAxis = np.array([1.0, 0.0, 0.0])  # Default X-right
-                    if hasattr(rel_placement, 'RefDirection') and rel_placement.RefDirection is not None:
-                        ref_dir = rel_placement.RefDirection
-                        if hasattr(ref_dir, 'DirectionRatios'):
-                            ratios = ref_dir.DirectionRatios
-                            try:
-                                if isinstance(ratios, (list, tuple)) and len(ratios) >= 3:
-                                    xAxis = np.array([float(ratios[0]), float(ratios[1]), float(ratios[2])])
-                                elif hasattr(ratios, '__getitem__'):
-                                    xAxis = np.array([float(ratios[0]), float(ratios[1]), float(ratios[2])])
-                            except (ValueError, TypeError, IndexError):
-                                pass
-                        # Normalize
-                        xNorm = np.linalg.norm(xAxis)
-                        if xNorm > 1e-6:
-                            xAxis = xAxis / xNorm
-                    
-                    # Calculate Y-axis as cross product (Z x X) - like C#: CrossProduct(zAxis, xAxis)
-                    yAxis = np.cross(zAxis, xAxis)
-                    yNorm = np.linalg.norm(yAxis)
-                    if yNorm > 1e-6:
-                        yAxis = yAxis / yNorm
-                    else:
-                        yAxis = np.array([0.0, 1.0, 0.0])
-                    
-                    # Build 4x4 transformation matrix (row-major, like WPF Matrix3D constructor)
-                    # Matrix format: [xAxis, yAxis, zAxis, origin] as rows
-                    # Like C#: new Matrix3D(xAxis[0], xAxis[1], xAxis[2], 0, yAxis[0], yAxis[1], yAxis[2], 0, zAxis[0], zAxis[1], zAxis[2], 0, origin[0], origin[1], origin[2], 1)
-                    matrix = np.array([
-                        [xAxis[0], xAxis[1], xAxis[2], origin[0]],
-                        [yAxis[0], yAxis[1], yAxis[2], origin[1]],
-                        [zAxis[0], zAxis[1], zAxis[2], origin[2]],
-                        [0.0, 0.0, 0.0, 1.0]
-                    ])
-                    
-                    return matrix
-                except Exception:
-                    return np.eye(4)
-            
-            # Traverse hierarchy: element → parent → ... → root
-            matrices = []
-            placement = element.ObjectPlacement
-            level = 0
-            
-            # Debug only first few elements
-            if not hasattr(self, '_debug_count'):
-                self._debug_count = 0
-            debug_this_element = self._debug_count < 5
-            if debug_this_element:
-                self._debug_count += 1
-                element_id = element.GlobalId if hasattr(element, 'GlobalId') else 'unknown'
-                print(f"DEBUG: Element {element_id} - traversing placement hierarchy")
-            
-            while placement is not None:
-                try:
-                    # Extract matrix using C#-like method
-                    local_matrix = extract_matrix_from_placement(placement)
-                    matrices.append(local_matrix)
-                    
-                    if debug_this_element:
-                        pos = local_matrix[:3, 3]
-                        print(f"  Level {level}: local_pos={pos}")
-                    
-                    # Move to parent
-                    if hasattr(placement, 'PlacementRelTo') and placement.PlacementRelTo:
-                        placement = placement.PlacementRelTo
-                        level += 1
-                    else:
-                        break
-                except Exception as e:
-                    if debug_this_element:
-                        print(f"  Error at level {level}: {e}")
-                    break
-            
-            # CRITICAL: In C# code, ToWpfMatrix3D is called on instance.ObjectPlacement directly
-            # This means C# uses ONLY the LOCAL placement, not the full hierarchy!
-            # Let's try both approaches:
-            # 1. Use only local placement (like C#) - SIMPLER, might be what IFC file expects
-            # 2. Or accumulate through hierarchy (more correct for hierarchical IFC)
-            
-            # For now, let's use ONLY local placement (like C#) since parent levels all show [0,0,0]
-            # This suggests the IFC file uses global coordinates at element level
-            if matrices:
-                # OPTION 1: Use only element's local placement (like C#)
-                # This matches the C# implementation exactly
-                element_local_matrix = matrices[0]  # First matrix is element's local placement
-                
-                if debug_this_element:
-                    local_pos = element_local_matrix[:3, 3]
-                    print(f"  Using ONLY local placement (like C#): pos={local_pos}")
-                    if len(matrices) > 1:
-                        print(f"  (Ignoring {len(matrices)-1} parent levels with zero positions)")
-                
-                # Convert to column-major format (like WPF Matrix3D)
-                # WPF Matrix3D stores data internally as column-major:
-                # [M11, M21, M31, OffsetX, M12, M22, M32, OffsetY, M13, M23, M33, OffsetZ, M14, M24, M34, M44]
-                # But our matrix is row-major: rows are [xAxis, yAxis, zAxis, origin]
-                # After transpose: columns become [xAxis, yAxis, zAxis, origin]
-                element_matrix_colmajor = element_local_matrix.T
-                matrix_flat = element_matrix_colmajor.flatten().tolist()
-                
-                if debug_this_element:
-                    print(f"  Matrix (row-major):")
-                    print(f"    Row 0 (xAxis): {element_local_matrix[0]}")
-                    print(f"    Row 1 (yAxis): {element_local_matrix[1]}")
-                    print(f"    Row 2 (zAxis): {element_local_matrix[2]}")
-                    print(f"    Row 3 (origin): {element_local_matrix[3]}")
-                    print(f"  Matrix (column-major, flattened):")
-                    print(f"    Indices 0-3: {matrix_flat[0:4]} (col 0)")
-                    print(f"    Indices 4-7: {matrix_flat[4:8]} (col 1)")
-                    print(f"    Indices 8-11: {matrix_flat[8:12]} (col 2)")
-                    print(f"    Indices 12-15: {matrix_flat[12:16]} (col 3 - translation)")
-                    print(f"  Translation from matrix[12:15]: {matrix_flat[12:15]}")
-                
-                if len(matrix_flat) >= 16:
-                    return matrix_flat
-                
-                # OPTION 2: If option 1 doesn't work, we can try accumulating hierarchy
-                # But for now, let's match C# exactly
-            
-            # Fallback: try just local placement if hierarchy traversal failed
-            try:
-                local_matrix = ifcopenshell.util.placement.get_local_placement(element.ObjectPlacement)
-                if local_matrix is not None:
-                    # Transpose to column-major format (like WPF Matrix3D)
-                    local_matrix_colmajor = local_matrix.T
-                    matrix_flat = local_matrix_colmajor.flatten().tolist()
-                    if len(matrix_flat) >= 16:
-                        return matrix_flat
-            except Exception as e:
-                pass
-            
-            # Try alternative: extract location directly from ObjectPlacement (like C# ToWpfMatrix3D)
-            try:
-                if hasattr(element.ObjectPlacement, 'RelativePlacement'):
-                    placement = element.ObjectPlacement.RelativePlacement
-                    if hasattr(placement, 'Location') and hasattr(placement.Location, 'Coordinates'):
-                        coords = placement.Location.Coordinates
-                        if coords and len(coords) >= 3:
-                            location = [float(coords[0]), float(coords[1]), float(coords[2])]
-                            # Create matrix with just translation
-                            return [
-                                1.0, 0.0, 0.0, location[0],
-                                0.0, 1.0, 0.0, location[1],
-                                0.0, 0.0, 1.0, location[2],
-                                0.0, 0.0, 0.0, 1.0
-                            ]
-            except Exception as e:
-                pass
-            
-            # Return identity matrix if placement is not available
-            return [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+            return takeoff.quantities(element)
         except Exception as e:
-            # Return identity matrix on error
-            return [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+            # A malformed profile or quantity set must not fail the whole parse
+            logger.debug("Quantity takeoff failed for %s: %s", getattr(element, "GlobalId", element), e)
+            return {}, ()
     
-    def _get_geometry_bounds(self, element) -> Dict[str, Any]:
-        """Extract bounding box from element geometry"""
-        try:
-            if not hasattr(element, 'Representation') or element.Representation is None:
-                return None
+    def _get_geometry_bounds(self, element, bounds_by_id: Optional[Dict[int, Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Bounding box of element geometry (computed in one batch per parse, see GeometryBoundsCalculator)"""
+        if not bounds_by_id:
+            return None
+        return bounds_by_id.get(element.id())
+    
+    @staticmethod
+    def _get_products(ifc_file, options: Optional[ParseOptions] = None) -> List[Any]:
+        """Products to parse (elements that can be placed in space), in by_type order
+        
+        include_types / exclude_types of the options are applied here, so filtered-out
+        products never reach property or placement extraction.
+        """
+        # Skip certain types that are not physical building elements
+        products = [
+            product for product in ifc_file.by_type("IfcProduct")
+            if product.is_a() not in ["IfcSpace", "IfcOpeningElement", "IfcAnnotation"]
+        ]
+        if options is None or (options.include_types is None and not options.exclude_types):
+            return products
+        
+        # Decide once per concrete class (is_a(name) also matches subtypes)
+        selected: Dict[str, bool] = {}
+        
+        def is_selected(product) -> bool:
+            class_name = product.is_a()
+            if class_name not in selected:
+                included = options.include_types is None or any(product.is_a(name) for name in options.include_types)
+                excluded = any(product.is_a(name) for name in options.exclude_types)
+                selected[class_name] = included and not excluded
+            return selected[class_name]
+        
+        return [product for product in products if is_selected(product)]
+    
+    @staticmethod
+    def _shard_id_range(products: List[Any], shard_index: int, shard_count: int) -> Tuple[float, float]:
+        """Entity id range [low, high) of a shard - contiguous ranges with equal product counts"""
+        ids = sorted(product.id() for product in products)
+        low = ids[len(ids) * shard_index // shard_count] if shard_index > 0 else float("-inf")
+        high = ids[len(ids) * (shard_index + 1) // shard_count] if shard_index + 1 < shard_count else float("inf")
+        return low, high
+    
+    def _build_element(
+        self,
+        product,
+        index: int,
+        resolver: PlacementResolver,
+        pset_index: Optional[PropertySetIndex],
+        bounds_by_id: Optional[Dict[int, Dict[str, Any]]] = None,
+        profile: Optional[ParseProfile] = None,
+        takeoff: Optional[QuantityTakeoff] = None
+    ) -> IfcElement:
+        """Build domain entity for one product (index = position among parsed products)
+        
+        Without a pset index the element has no properties, without a resolver no
+        placement, without a takeoff no quantities.
+        Pset, placement and quantity time is added to `profile`.
+        """
+        # Get element type name
+        type_name = product.is_a()
+        
+        # Get global ID
+        global_id = product.GlobalId if hasattr(product, 'GlobalId') else f"unknown-{index}"
+        
+        # Get name
+        name = product.Name if hasattr(product, 'Name') and product.Name else type_name
+        
+        # Extract properties
+        started = time.perf_counter()
+        property_set = self._extract_properties(product, pset_index) if pset_index is not None else PropertySet({}, {})
+        properties = property_set.values
+        
+        # Get placement matrix
+        extracted = time.perf_counter()
+        placement_matrix = self._get_placement_matrix(product, resolver) if resolver is not None else None
+        
+        # Quantity takeoff in SI units
+        placed = time.perf_counter()
+        quantities, derived_quantities = self._get_quantities(product, takeoff) if takeoff is not None else ({}, ())
+        
+        if profile is not None:
+            profile.add("psets", extracted - started)
+            profile.add("placement", placed - extracted)
+            profile.add("quantities", time.perf_counter() - placed)
+            profile.count_element(type_name)
+        
+        # Try to get geometry bounds for better position/dimensions
+        geometry_bounds = self._get_geometry_bounds(product, bounds_by_id)
+        
+        # Extract position from matrix (translation/offset components)
+        # Matrix is in column-major format (like WPF): [m00, m10, m20, m30, m01, m11, m21, m31, m02, m12, m22, m32, m03, m13, m23, m33]
+        # Translation (OffsetX, OffsetY, OffsetZ) is at indices: 12, 13, 14
+        position = [0.0, 0.0, 0.0]
+        if placement_matrix and len(placement_matrix) >= 16:
+            position = [
+                float(placement_matrix[12]) if placement_matrix[12] is not None else 0.0,  # OffsetX
+                float(placement_matrix[13]) if placement_matrix[13] is not None else 0.0,  # OffsetY
+                float(placement_matrix[14]) if placement_matrix[14] is not None else 0.0   # OffsetZ
+            ]
+        
+        # If we have geometry bounds, use the center as position (more accurate)
+        if geometry_bounds and geometry_bounds.get('center'):
+            # Use geometry center, but apply placement matrix transformation
+            geom_center = geometry_bounds['center']
+            # For now, use geometry center directly if placement is at origin
+            if abs(position[0]) < 0.001 and abs(position[1]) < 0.001 and abs(position[2]) < 0.001:
+                position = geom_center
             
-            # Try to get shape from geometry using ifcopenshell
-            # This requires the IFC file context, so we'll need to pass it or use a different approach
-            # For now, try basic shape extraction
-            try:
-                shape = ifcopenshell.util.shape.get_shape(element)
-                if shape is None:
-                    return None
-                
-                # Get geometry from shape
-                geometry = shape.geometry if hasattr(shape, 'geometry') else None
-                if geometry is None:
-                    return None
-                
-                # Try to get bounding box from geometry
-                # The bbox might be in different formats depending on ifcopenshell version
-                bbox = None
-                if hasattr(geometry, 'bbox'):
-                    bbox = geometry.bbox
-                elif hasattr(geometry, 'bounding_box'):
-                    bbox = geometry.bounding_box
-                elif hasattr(geometry, 'getBoundingBox'):
-                    bbox = geometry.getBoundingBox()
-                
-                if bbox is None:
-                    return None
-                
-                # bbox format varies - try to handle common formats
-                min_point = None
-                max_point = None
-                
-                if isinstance(bbox, tuple) or isinstance(bbox, list):
-                    if len(bbox) >= 2:
-                        min_point = bbox[0]
-                        max_point = bbox[1]
-                elif hasattr(bbox, '__getitem__'):
-                    try:
-                        min_point = bbox[0]
-                        max_point = bbox[1]
-                    except:
-                        pass
-                
-                if min_point is None or max_point is None:
-                    return None
-                
-                # Convert to lists and calculate center and size
-                min_coords = [float(min_point[i]) if len(min_point) > i else 0.0 for i in range(3)]
-                max_coords = [float(max_point[i]) if len(max_point) > i else 0.0 for i in range(3)]
-                
-                return {
-                    'min': min_coords,
-                    'max': max_coords,
-                    'center': [
-                        (min_coords[0] + max_coords[0]) / 2.0,
-                        (min_coords[1] + max_coords[1]) / 2.0,
-                        (min_coords[2] + max_coords[2]) / 2.0
-                    ],
-                    'size': [
-                        max_coords[0] - min_coords[0],
-                        max_coords[1] - min_coords[1],
-                        max_coords[2] - min_coords[2]
-                    ]
-                }
-            except Exception as e:
-                # Geometry extraction failed, return None
-                # Don't log to avoid spam - many elements might not have extractable geometry
-                pass
-        except Exception as e:
-            # Outer exception - also silent
-            pass
+            # Add geometry bounds to properties for frontend (as JSON strings for easy parsing)
+            properties['_geometry_bounds'] = json.dumps(geometry_bounds)
+            properties['_geometry_size'] = json.dumps(geometry_bounds.get('size', [0, 0, 0]))
+        
+        # Don't skip elements - let frontend decide what to render
+        # Only skip if explicitly organizational (but they'll be filtered in frontend anyway)
+        # Keep all elements with placement data or geometry
         
-        return None
+        # Log first few elements for debugging
+        if index < 5:
+            logger.debug("Element %s: position=%s, has_geometry=%s", type_name, position, geometry_bounds is not None)
+        
+        # Create domain entity
+        return IfcElement(
+            global_id=global_id,
+            type_name=type_name,
+            name=str(name),
+            properties=properties,
+            placement_matrix=placement_matrix,
+            units=property_set.units or None,
+            quantities=quantities or None,
+            derived_quantities=derived_quantities or None
+        )
     
-    async def parse_file(self, file_path: str) -> Result[List[IfcElement], str]:
-        """Parse IFC file using ifcopenshell"""
-        if not os.path.exists(file_path):
-            return Result.failure(f"File not found: {file_path}")
+    def _iter_shard(
+        self,
+        source: Union[IfcSource, ifcopenshell.file],
+        revision: str,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        options: Optional[ParseOptions] = None,
+        progress: Optional[ParseProgress] = None,
+        profile: Optional[ParseProfile] = None
+    ) -> Iterator[Tuple[int, IfcElement]]:
+        """Parse products of one entity id range (blocking generator)
+        
+        Yields (index, element) pairs, where index is the product position in the
+        whole model, so shards can be merged back into the sequential order.
+        With `progress`, the product count and built elements are reported to it
+        and a cancellation stops the parse between elements.
+        `source` may also be an already opened file. Stage timings go to `profile`.
+        """
+        options = options or ParseOptions()
+        profile = profile or ParseProfile()
+        
+        # Open IFC file
+        if isinstance(source, ifcopenshell.file):
+            ifc_file = source
+        else:
+            with profile.stage("open"):
+                ifc_file = self._open(source)
+        
+        # One placement cache per parse (placements are shared between elements)
+        resolver = None
+        if options.include_placement:
+            resolver = PlacementResolver(use_global=self.settings.placement_mode == "global")
+        
+        # Element → psets index, built in a single sweep over the relationships.
+        # Filtered type psets are cached separately from the full ones.
+        pset_index = None
+        with profile.stage("psets"):
+            if not options.filters_properties:
+                pset_index = PropertySetIndex(ifc_file, type_cache=self._type_cache.for_revision(revision))
+            elif options.property_keys or options.property_prefixes:
+                key_filter = PropertyKeyFilter(options.property_keys, options.property_prefixes)
+                type_cache = self._type_cache.for_revision(f"{revision}|{key_filter.cache_key}")
+                pset_index = PropertySetIndex(ifc_file, type_cache=type_cache, key_filter=key_filter)
         
+        takeoff = None
+        if options.include_quantities:
+            with profile.stage("quantities"):
+                takeoff = QuantityTakeoff(ifc_file)
+        
+        with profile.stage("open"):
+            products = self._get_products(ifc_file, options)
+        low, high = (float("-inf"), float("inf")) if shard_count <= 1 else self._shard_id_range(products, shard_index, shard_count)
+        
+        shard = [(index, product) for index, product in enumerate(products) if low <= product.id() < high]
+        if progress is not None:
+            progress.total = len(shard)
+            progress.check_cancelled()
+        
+        # Optional geometry stage - all shapes of the shard tessellated in one batch
+        geometry_bounds = None
+        if options.include_geometry:
+            with profile.stage("geometry"):
+                calculator = GeometryBoundsCalculator(threads=self.settings.geometry_threads)
+                geometry_bounds = calculator.compute(ifc_file, [product for _, product in shard])
+        
+        for index, product in shard:
+            if progress is not None:
+                progress.check_cancelled()
+            yield index, self._build_element(product, index, resolver, pset_index, geometry_bounds, profile, takeoff)
+            if progress is not None:
+                progress.processed += 1
+    
+    def _parse_shard(
+        self,
+        source: IfcSource,
+        revision: str,
+        shard_index: int = 0,
+        shard_count: int = 1,
+        options: Optional[ParseOptions] = None
+    ) -> Tuple[List[Tuple[int, IfcElement]], ParseProfile]:
+        """Parse products of one entity id range (blocking) - elements and the shard's profile"""
+        profile = ParseProfile()
+        elements = list(self._iter_shard(source, revision, shard_index, shard_count, options, profile=profile))
+        profile.finish()
+        return elements, profile
+    
+    def _parse_workers(self, source: IfcSource) -> int:
+        """Number of worker processes for a file (1 = parse in a thread)"""
+        workers = self.settings.parse_workers or os.cpu_count() or 1
+        if workers <= 1 or self._source_size(source) < self.settings.parallel_parse_min_size:
+            return 1
+        return workers
+    
+    def _get_process_pool(self, workers: int) -> ProcessPoolExecutor:
+        """Lazily created process pool for sharded parsing"""
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=workers)
+        return self._process_pool
+    
+    def _parse_model(
+        self,
+        source: IfcSource,
+        revision: str,
+        options: Optional[ParseOptions] = None,
+        profile: Optional[ParseProfile] = None
+    ) -> IfcModel:
+        """Parse whole file into the compact model (blocking)"""
+        return IfcModel.from_elements(
+            element for _, element in self._iter_shard(source, revision, 0, 1, options, profile=profile)
+        )
+    
+    def parse_with_progress(
+        self,
+        source: IfcSource,
+        options: Optional[ParseOptions] = None,
+        content_hash: Optional[str] = None,
+        progress: Optional[ParseProgress] = None,
+        profile: Optional[ParseProfile] = None
+    ) -> IfcModel:
+        """Parse whole file in the calling thread, reporting to `progress` (blocking)
+        
+        Used by background jobs, which already run in their own worker pool.
+        Raises ParseCancelledError if the job is cancelled.
+        """
+        if not isinstance(source, bytes) and not os.path.exists(source):
+            raise FileNotFoundError(f"File not found: {source}")
+        profile = profile or ParseProfile()
+        snapshot_key = self._snapshot_key(content_hash, options)
+        if snapshot_key is not None:
+            with profile.stage("snapshot"):
+                model = self.snapshots.load(snapshot_key)
+            if model is not None:
+                if progress is not None:
+                    progress.total = progress.processed = len(model)
+                return model
         try:
-            # Open IFC file
-            ifc_file = ifcopenshell.open(file_path)
-            
-            elements = []
-            
-            # Get all products (elements that can be placed in space)
-            products = ifc_file.by_type("IfcProduct")
+            revision = content_hash or self._file_revision(source)
+            model = IfcModel.from_elements(
+                element for _, element in self._iter_shard(source, revision, 0, 1, options, progress, profile)
+            )
+        except Exception:
+            self.metrics.record(profile, success=False)
+            raise
+        self.metrics.record(profile)
+        if snapshot_key is not None:
+            self._save_snapshot(snapshot_key, model, content_hash, options)
+        return model
+    
+    def _load_model(
+        self,
+        source: IfcSource,
+        revision: str,
+        options: Optional[ParseOptions] = None,
+        profile: Optional[ParseProfile] = None
+    ) -> Tuple[ifcopenshell.file, IfcModel]:
+        """Open file and parse it into the compact model, keeping the file (blocking)"""
+        profile = profile or ParseProfile()
+        with profile.stage("open"):
+            ifc_file = self._open(source)
+        model = IfcModel.from_elements(
+            element for _, element in self._iter_shard(ifc_file, revision, 0, 1, options, profile=profile)
+        )
+        return ifc_file, model
+    
+    async def _parse_sharded(
+        self,
+        file_path: str,
+        revision: str,
+        workers: int,
+        options: ParseOptions,
+        profile: ParseProfile
+    ) -> IfcModel:
+        """Parse in `workers` processes, one entity id range each (worker profiles are merged into `profile`)"""
+        loop = asyncio.get_running_loop()
+        pool = self._get_process_pool(workers)
+        shards = await asyncio.gather(*[
+            loop.run_in_executor(
+                pool, _parse_shard_in_worker, self.settings, file_path, revision, shard_index, workers, options
+            )
+            for shard_index in range(workers)
+        ])
+        for _, shard_profile in shards:
+            profile.merge(shard_profile)
+        indexed_elements = heapq.merge(*(elements for elements, _ in shards), key=lambda item: item[0])
+        return IfcModel.from_elements(element for _, element in indexed_elements)
+    
+    async def parse_file(
+        self,
+        source: IfcSource,
+        options: Optional[ParseOptions] = None,
+        content_hash: Optional[str] = None,
+        profile: Optional[ParseProfile] = None
+    ) -> Result[IfcModel, str]:
+        """Parse IFC file using ifcopenshell
+        
+        Parsing never runs on the event loop: small files are parsed in a thread,
+        large files are sharded by entity id range across `parse_workers` processes
+        and merged back in the original order.
+        
+        source: path of the IFC file, or its content (bytes) - parsed without a temp file
+        options: projection / filtering (ParseOptions) - entity types, property keys,
+        placement, and geometry (expensive - cost-only callers should leave it off)
+        content_hash: sha256 of the content if the caller already has it
+        profile: collects stage timings, type counts and peak RSS (see ParseProfile);
+        every parse is also added to the service metrics
+        
+        The result is a compact IfcModel; iterating it yields element views.
+        With a content_hash and the snapshot store enabled, a model parsed before
+        with the same options is memory-mapped from its Arrow snapshot instead
+        (stage "snapshot"; not counted as a parse in the metrics).
+        """
+        if not isinstance(source, bytes) and not os.path.exists(source):
+            return Result.failure(f"File not found: {source}")
+        
+        profile = profile or ParseProfile()
+        loop = asyncio.get_running_loop()
+        snapshot_key = self._snapshot_key(content_hash, options)
+        if snapshot_key is not None:
+            with profile.stage("snapshot"):
+                model = await loop.run_in_executor(None, self.snapshots.load, snapshot_key)
+            if model is not None:
+                return Result.success(model)
+        try:
+            revision = content_hash or self._file_revision(source)
+            workers = self._parse_workers(source)
             
-            for product in products:
-                # Skip certain types that are not physical building elements
-                if product.is_a() in ["IfcSpace", "IfcOpeningElement", "IfcAnnotation"]:
-                    continue
-                
-                # Get element type name
-                type_name = product.is_a()
-                
-                # Get global ID
-                global_id = product.GlobalId if hasattr(product, 'GlobalId') else f"unknown-{len(elements)}"
-                
-                # Get name
-                name = product.Name if hasattr(product, 'Name') and product.Name else type_name
-                
-                # Extract properties
-                properties = self._extract_properties(product)
-                
-                # Get placement matrix
-                placement_matrix = self._get_placement_matrix(product)
-                
-                # Try to get geometry bounds for better position/dimensions
-                geometry_bounds = self._get_geometry_bounds(product)
-                
-                # Extract position from matrix (translation/offset components)
-                # Matrix is in column-major format (like WPF): [m00, m10, m20, m30, m01, m11, m21, m31, m02, m12, m22, m32, m03, m13, m23, m33]
-                # Translation (OffsetX, OffsetY, OffsetZ) is at indices: 12, 13, 14
-                position = [0.0, 0.0, 0.0]
-                if placement_matrix and len(placement_matrix) >= 16:
-                    position = [
-                        float(placement_matrix[12]) if placement_matrix[12] is not None else 0.0,  # OffsetX
-                        float(placement_matrix[13]) if placement_matrix[13] is not None else 0.0,  # OffsetY
-                        float(placement_matrix[14]) if placement_matrix[14] is not None else 0.0   # OffsetZ
-                    ]
-                
-                # If we have geometry bounds, use the center as position (more accurate)
-                if geometry_bounds and geometry_bounds.get('center'):
-                    # Use geometry center, but apply placement matrix transformation
-                    geom_center = geometry_bounds['center']
-                    # For now, use geometry center directly if placement is at origin
-                    if abs(position[0]) < 0.001 and abs(position[1]) < 0.001 and abs(position[2]) < 0.001:
-                        position = geom_center
-                    
-                    # Add geometry bounds to properties for frontend (as JSON strings for easy parsing)
-                    properties['_geometry_bounds'] = json.dumps(geometry_bounds)
-                    properties['_geometry_size'] = json.dumps(geometry_bounds.get('size', [0, 0, 0]))
-                
-                # Don't skip elements - let frontend decide what to render
-                # Only skip if explicitly organizational (but they'll be filtered in frontend anyway)
-                # Keep all elements with placement data or geometry
-                
-                # Log first few elements for debugging
-                if len(elements) < 5:
-                    print(f"Element {type_name}: position={position}, has_geometry={geometry_bounds is not None}")
-                
-                # Create domain entity
-                element = IfcElement(
-                    global_id=global_id,
-                    type_name=type_name,
-                    name=str(name),
-                    properties={str(k): str(v) for k, v in properties.items()},
-                    placement_matrix=placement_matrix
+            if workers > 1 and isinstance(source, bytes):
+                # Worker processes open the model from disk
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".ifc") as tmp_file:
+                    tmp_file.write(source)
+                try:
+                    model = await self._parse_sharded(tmp_file.name, revision, workers, options, profile)
+                finally:
+                    os.remove(tmp_file.name)
+            elif workers > 1:
+                model = await self._parse_sharded(source, revision, workers, options, profile)
+            else:
+                model = await loop.run_in_executor(
+                    None, self._parse_model, source, revision, options, profile
                 )
-                
-                elements.append(element)
             
-            return Result.success(elements)
+            self.metrics.record(profile)
+            if snapshot_key is not None:
+                self._save_snapshot(snapshot_key, model, content_hash, options)
+            return Result.success(model)
+        
+        except Exception as e:
+            self.metrics.record(profile, success=False)
+            return Result.failure(f"Error parsing IFC file: {str(e)}")
+    
+    async def open_model(
+        self,
+        source: IfcSource,
+        options: Optional[ParseOptions] = None,
+        content_hash: Optional[str] = None,
+        profile: Optional[ParseProfile] = None
+    ) -> Result[Tuple[ifcopenshell.file, IfcModel], str]:
+        """Parse IFC file and also return the opened ifcopenshell file
+        
+        For resident model sessions, which answer follow-up queries from the open
+        file. Always parsed in a single thread - the file has to live in this process.
+        """
+        if not isinstance(source, bytes) and not os.path.exists(source):
+            return Result.failure(f"File not found: {source}")
         
+        profile = profile or ParseProfile()
+        try:
+            revision = content_hash or self._file_revision(source)
+            loaded = await asyncio.get_running_loop().run_in_executor(
+                None, self._load_model, source, revision, options, profile
+            )
+            self.metrics.record(profile)
+            return Result.success(loaded)
         except Exception as e:
+            self.metrics.record(profile, success=False)
             return Result.failure(f"Error parsing IFC file: {str(e)}")
     
+    async def diff_files(
+        self,
+        old_source: IfcSource,
+        new_source: IfcSource,
+        options: Optional[ParseOptions] = None,
+        details: bool = False,
+        old_content_hash: Optional[str] = None,
+        new_content_hash: Optional[str] = None
+    ) -> Result[ModelDiff, str]:
+        """Parse two revisions and diff them by GlobalId (see ModelDiff)"""
+        old_result, new_result = await asyncio.gather(
+            self.parse_file(old_source, options=options, content_hash=old_content_hash),
+            self.parse_file(new_source, options=options, content_hash=new_content_hash)
+        )
+        if old_result.is_failure:
+            return Result.failure(f"Old revision: {old_result.error}")
+        if new_result.is_failure:
+            return Result.failure(f"New revision: {new_result.error}")
+        return await self.diff_models(old_result.value, new_result.value, details)
+    
+    async def diff_models(self, old_model: IfcModel, new_model: IfcModel, details: bool = False) -> Result[ModelDiff, str]:
+        """Diff two parsed revisions (hashing runs in a thread, hashes stay cached on the models)"""
+        try:
+            diff = await asyncio.get_running_loop().run_in_executor(
+                None, ModelDiff.between, old_model, new_model, details
+            )
+            return Result.success(diff)
+        except Exception as e:
+            return Result.failure(f"Error comparing models: {str(e)}")
+    
+    async def stream_file(
+        self,
+        source: IfcSource,
+        options: Optional[ParseOptions] = None,
+        content_hash: Optional[str] = None,
+        profile: Optional[ParseProfile] = None
+    ) -> AsyncIterator[IfcElement]:
+        """Parse IFC file and yield elements as soon as they are built
+        
+        The parser runs in a thread and hands elements over through a bounded queue
+        (`stream_buffer_size`), so memory stays flat regardless of model size and a slow
+        consumer pauses the parser. Errors are raised from the iterator.
+        """
+        profile = profile or ParseProfile()
+        if not isinstance(source, bytes) and not os.path.exists(source):
+            raise FileNotFoundError(f"File not found: {source}")
+        
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(self.settings.stream_buffer_size, 1))
+        stopped = threading.Event()
+        end_of_stream = object()
+        
+        def put(item) -> bool:
+            """Blocking put from the parser thread (False if the consumer went away)"""
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while True:
+                try:
+                    future.result(timeout=0.1)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    if stopped.is_set():
+                        future.cancel()
+                        return False
+        
+        def produce() -> None:
+            try:
+                revision = content_hash or self._file_revision(source)
+                for _, element in self._iter_shard(source, revision, 0, 1, options, profile=profile):
+                    if not put(element):
+                        return
+            except Exception as e:
+                self.metrics.record(profile, success=False)
+                put(e)
+                return
+            self.metrics.record(profile)
+            put(end_of_stream)
+        
+        producer = loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is end_of_stream:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
+            await producer
+    
+    def create_validator(self) -> StepValidator:
+        """Streaming STEP validator configured from settings"""
+        return StepValidator(
+            max_errors=self.settings.validation_max_errors,
+            max_statement_size=self.settings.validation_max_statement_size
+        )
+    
     async def validate_file(self, file_path: str) -> Result[bool, str]:
-        """Validate IFC file"""
+        """Validate IFC file
+        
+        Streams the file through StepValidator (structure, header, entity syntax,
+        reference integrity) instead of opening it, so memory stays bounded and
+        malformed files are rejected after the first errors.
+        """
         if not os.path.exists(file_path):
             return Result.failure(f"File not found: {file_path}")
         
         try:
-            # Try to open the file
-            ifc_file = ifcopenshell.open(file_path)
-            # If we can open it, it's valid
-            return Result.success(True)
+            report = await asyncio.get_running_loop().run_in_executor(
+                None, self.create_validator().validate_file, file_path
+            )
         except Exception as e:
             return Result.failure(f"Error validating IFC file: {str(e)}")
+        if not report.valid:
+            errors = "; ".join(
+                f"line {error['line']}: {error['message']}" if error["line"] else error["message"]
+                for error in report.errors[:5]
+            )
+            return Result.failure(f"Invalid IFC file: {errors}")
+        return Result.success(True)
+
+
+# Parser instance of a worker process (keeps its type cache between shards)
+_worker_service = None
+
 
+def _parse_shard_in_worker(
+    settings: Settings,
+    file_path: str,
+    revision: str,
+    shard_index: int,
+    shard_count: int,
+    options: Optional[ParseOptions] = None
+) -> Tuple[List[Tuple[int, IfcElement]], ParseProfile]:
+    """Process pool entry point for sharded parsing"""
+    global _worker_service
+    if _worker_service is None:
+        _worker_service = IfcParserService(settings)
+    return _worker_service._parse_shard(file_path, revision, shard_index, shard_count, options)
@@ -0,0 +1,145 @@
+"""Resident parsed models"""
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+import hashlib
+import threading
+import time
+import ifcopenshell
+from domain.entities.ifc_model import IfcModel
+from domain.entities.parse_options import ParseOptions
+
+
+# Opened ifcopenshell files take roughly this many times the STEP file size in memory
+IFC_FILE_MEMORY_FACTOR = 7
+# Rough per-element size of the compact model (ids, key/value tuples, placement row)
+MODEL_ELEMENT_BYTES = 1024
+
+
+class ModelSession:
+    """A parsed model kept in memory together with its opened IFC file"""
+
+    def __init__(
+        self,
+        model_id: str,
+        ifc_file: ifcopenshell.file,
+        model: IfcModel,
+        content_hash: str,
+        options: ParseOptions,
+        source_size: int
+    ):
+        self.model_id = model_id
+        self.ifc_file = ifc_file
+        self.model = model
+        self.content_hash = content_hash
+        self.options = options
+        self.created_at = time.time()
+        self.last_access = self.created_at
+        self.estimated_size = source_size * IFC_FILE_MEMORY_FACTOR + len(model) * MODEL_ELEMENT_BYTES
+        self._indices_by_type: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def indices_of_type(self, type_name: str) -> List[int]:
+        """Model positions of elements of an IFC class, subtypes included (cached per class)"""
+        type_name = type_name.lower()
+        with self._lock:
+            indices = self._indices_by_type.get(type_name)
+            if indices is None:
+                try:
+                    global_ids = {entity.GlobalId for entity in self.ifc_file.by_type(type_name)}
+                except RuntimeError:
+                    # Not a class of this schema
+                    global_ids = set()
+                indices = [index for index, global_id in enumerate(self.model.global_ids) if global_id in global_ids]
+                self._indices_by_type[type_name] = indices
+            return indices
+
+    def entity(self, global_id: str) -> Optional[ifcopenshell.entity_instance]:
+        """IFC entity of an element (from the open file)"""
+        try:
+            return self.ifc_file.by_guid(global_id)
+        except RuntimeError:
+            return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Session summary for API responses"""
+        return {
+            "model_id": self.model_id,
+            "content_hash": self.content_hash,
+            "schema": self.ifc_file.schema,
+            "options": self.options.to_dict(),
+            "element_count": len(self.model),
+            "type_counts": dict(Counter(self.model.type_names)),
+            "estimated_size_bytes": self.estimated_size,
+            "created_at": self.created_at,
+            "last_access": self.last_access
+        }
+
+
+class ModelSessionStore:
+    """LRU of resident model sessions bounded by count and by estimated memory
+
+    A model id is derived from the content hash and the parse options, so uploading
+    the same file with the same options again finds the resident session instead
+    of parsing. Least recently used sessions are dropped once `max_models` or
+    `memory_budget` is exceeded (the newest session is always kept).
+    """
+
+    def __init__(self, max_models: int = 8, memory_budget: int = 1024 * 1024 * 1024):
+        self.max_models = max(max_models, 1)
+        self.memory_budget = memory_budget
+        self.evictions = 0
+        self._sessions: "OrderedDict[str, ModelSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_model_id(content_hash: str, options: ParseOptions) -> str:
+        """Model id of a content hash + parse options"""
+        parts = [content_hash]
+        parts.extend(f"{name}={value}" for name, value in sorted(options.to_dict().items()))
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:32]
+
+    def get(self, model_id: str) -> Optional[ModelSession]:
+        """Session by id (refreshes recency)"""
+        with self._lock:
+            session = self._sessions.get(model_id)
+            if session is not None:
+                self._sessions.move_to_end(model_id)
+                session.last_access = time.time()
+            return session
+
+    def latest(self) -> Optional[ModelSession]:
+        """Most recently used session"""
+        with self._lock:
+            if not self._sessions:
+                return None
+            model_id = next(reversed(self._sessions))
+        return self.get(model_id)
+
+    def add(self, session: ModelSession) -> None:
+        """Keep a session resident and evict least recently used ones over the limits"""
+        with self._lock:
+            self._sessions[session.model_id] = session
+            self._sessions.move_to_end(session.model_id)
+            total = sum(item.estimated_size for item in self._sessions.values())
+            while len(self._sessions) > 1 and (len(self._sessions) > self.max_models or total > self.memory_budget):
+                _, evicted = self._sessions.popitem(last=False)
+                total -= evicted.estimated_size
+                self.evictions += 1
+
+    def remove(self, model_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(model_id, None) is not None
+
+    def list_sessions(self) -> List[ModelSession]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "models": len(self._sessions),
+                "max_models": self.max_models,
+                "estimated_size_bytes": sum(item.estimated_size for item in self._sessions.values()),
+                "memory_budget_bytes": self.memory_budget,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,375 @@
+"""Columnar snapshots of parsed models (Arrow IPC / Parquet)"""
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import time
+import numpy as np
+from domain.entities.ifc_model import IfcModel
+from domain.entities.quantities import QUANTITY_COLUMNS
+from infrastructure.services.file_lru_store import FileLruStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # snapshots are unavailable without pyarrow
+    pa = None
+    pq = None
+
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the snapshot layout or the parser output changes
+SNAPSHOT_FORMAT_VERSION = 2
+
+# format → file extension
+SNAPSHOT_FORMATS = {"arrow": ".arrow", "parquet": ".parquet"}
+
+# Value kinds of the property table
+_NULL, _BOOL, _INT, _FLOAT, _TEXT, _JSON = range(6)
+
+_ARROW_MAGIC = b"ARROW1"
+_PARQUET_MAGIC = b"PAR1"
+
+
+class SnapshotError(ValueError):
+    """Snapshot cannot be written or read"""
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise SnapshotError("Model snapshots need the pyarrow package")
+
+
+def _schema() -> "pa.Schema":
+    return pa.schema([
+        pa.field("global_id", pa.string()),
+        pa.field("type_name", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("name", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("placement", pa.list_(pa.float64(), 16)),
+        pa.field("has_placement", pa.bool_()),
+        # JSON of the unit map - few distinct maps, so dictionary encoded
+        pa.field("units", pa.dictionary(pa.int32(), pa.string())),
+        # Key/value table of each element; key indexes the key table in the metadata
+        pa.field("properties", pa.list_(pa.struct([
+            pa.field("key", pa.int32()),
+            pa.field("kind", pa.int8()),
+            pa.field("integer", pa.int64()),
+            pa.field("number", pa.float64()),
+            pa.field("text", pa.dictionary(pa.int32(), pa.string()))
+        ]))),
+        # Takeoff in SI units, columns as in ifc.quantity_columns (NaN = no value)
+        pa.field("quantities", pa.list_(pa.float64(), len(QUANTITY_COLUMNS))),
+        pa.field("derived_quantities", pa.list_(pa.bool_(), len(QUANTITY_COLUMNS)))
+    ])
+
+
+def _dictionary_array(values: List[Optional[str]]) -> "pa.DictionaryArray":
+    return pa.array(values, type=pa.string()).dictionary_encode()
+
+
+def model_to_table(model: IfcModel, metadata: Optional[Dict[str, Any]] = None) -> "pa.Table":
+    """Model as an Arrow table; `metadata` (JSON values) is kept in the schema metadata"""
+    _require_pyarrow()
+    count = len(model)
+
+    offsets = np.zeros(count + 1, dtype=np.int32)
+    keys: List[int] = []
+    kinds: List[int] = []
+    integers: List[int] = []
+    numbers: List[float] = []
+    texts: List[Optional[str]] = []
+    for index in range(count):
+        key_ids, values = model.property_items(index)
+        keys.extend(key_ids)
+        for value in values:
+            if value is None:
+                kinds.append(_NULL)
+                integers.append(0)
+                numbers.append(0.0)
+                texts.append(None)
+            elif isinstance(value, bool):
+                kinds.append(_BOOL)
+                integers.append(int(value))
+                numbers.append(0.0)
+                texts.append(None)
+            elif isinstance(value, int) and -2 ** 63 <= value < 2 ** 63:
+                kinds.append(_INT)
+                integers.append(value)
+                numbers.append(0.0)
+                texts.append(None)
+            elif isinstance(value, float):
+                kinds.append(_FLOAT)
+                integers.append(0)
+                numbers.append(value)
+                texts.append(None)
+            elif isinstance(value, str):
+                kinds.append(_TEXT)
+                integers.append(0)
+                numbers.append(0.0)
+                texts.append(value)
+            else:
+                kinds.append(_JSON)
+                integers.append(0)
+                numbers.append(0.0)
+                texts.append(json.dumps(value, default=str))
+        offsets[index + 1] = len(keys)
+
+    property_table = pa.StructArray.from_arrays(
+        [
+            pa.array(np.asarray(keys, dtype=np.int32)),
+            pa.array(np.asarray(kinds, dtype=np.int8)),
+            pa.array(np.asarray(integers, dtype=np.int64)),
+            pa.array(np.asarray(numbers, dtype=np.float64)),
+            _dictionary_array(texts)
+        ],
+        fields=list(_schema().field("properties").type.value_type)
+    )
+    unit_json = {}
+    units = []
+    for index in range(count):
+        unit_map = model.units(index)
+        if unit_map:
+            # Maps are shared between elements - serialize each once
+            text = unit_json.get(id(unit_map))
+            if text is None:
+                text = unit_json[id(unit_map)] = json.dumps(unit_map, sort_keys=True)
+            units.append(text)
+        else:
+            units.append(None)
+
+    columns = [
+        pa.array(model.global_ids, type=pa.string()),
+        _dictionary_array(model.type_names),
+        _dictionary_array(model.names),
+        pa.FixedSizeListArray.from_arrays(pa.array(model.placement_matrices.reshape(-1)), 16),
+        pa.array(model.has_placement),
+        _dictionary_array(units),
+        pa.ListArray.from_arrays(pa.array(offsets), property_table),
+        pa.FixedSizeListArray.from_arrays(pa.array(model.quantity_matrix.reshape(-1)), len(QUANTITY_COLUMNS)),
+        pa.FixedSizeListArray.from_arrays(pa.array(model.derived_quantity_mask.reshape(-1)), len(QUANTITY_COLUMNS))
+    ]
+    schema_metadata = {
+        "ifc.snapshot_version": str(SNAPSHOT_FORMAT_VERSION),
+        "ifc.key_table": json.dumps(model.key_table),
+        "ifc.quantity_columns": json.dumps(QUANTITY_COLUMNS),
+        "ifc.metadata": json.dumps(metadata or {})
+    }
+    return pa.Table.from_arrays(columns, schema=_schema().with_metadata(schema_metadata))
+
+
+def _strings(column: "pa.ChunkedArray") -> List[Optional[str]]:
+    """Values of a (dictionary encoded) string column - equal strings are one object"""
+    values: List[Optional[str]] = []
+    for chunk in column.chunks:
+        if pa.types.is_dictionary(chunk.type):
+            dictionary = chunk.dictionary.to_pylist()
+            indices = chunk.indices.fill_null(-1).to_numpy(zero_copy_only=False)
+            values.extend(dictionary[index] if index >= 0 else None for index in indices.tolist())
+        else:
+            values.extend(chunk.to_pylist())
+    return values
+
+
+def _object_array(objects: List[Any]) -> np.ndarray:
+    """1-d object array of `objects` (np.array would turn lists into extra dimensions)"""
+    array = np.empty(len(objects), dtype=object)
+    array[:] = objects
+    return array
+
+
+def _dictionary_encoded(array: "pa.Array") -> "pa.DictionaryArray":
+    """Dictionary array of a string column (Parquet may return it plain)"""
+    return array if pa.types.is_dictionary(array.type) else array.dictionary_encode()
+
+
+def _fixed_size_values(column: "pa.ChunkedArray") -> np.ndarray:
+    """Flat numpy values of a fixed size list column (zero copy for a single numeric chunk)"""
+    if column.num_chunks == 1:
+        return column.chunk(0).flatten().to_numpy(zero_copy_only=False)
+    return np.concatenate([chunk.flatten().to_numpy(zero_copy_only=False) for chunk in column.chunks])
+
+
+def table_to_model(table: "pa.Table") -> Tuple[IfcModel, Dict[str, Any]]:
+    """Model and metadata of a table written by model_to_table"""
+    _require_pyarrow()
+    schema_metadata = {key.decode(): value.decode() for key, value in (table.schema.metadata or {}).items()}
+    version = schema_metadata.get("ifc.snapshot_version")
+    if version != str(SNAPSHOT_FORMAT_VERSION):
+        raise SnapshotError(f"Unsupported snapshot version: {version}")
+    key_table = json.loads(schema_metadata["ifc.key_table"])
+    if tuple(json.loads(schema_metadata.get("ifc.quantity_columns", "[]"))) != QUANTITY_COLUMNS:
+        raise SnapshotError("Snapshot has different quantity columns")
+    metadata = json.loads(schema_metadata.get("ifc.metadata", "{}"))
+
+    # Placements and quantities stay in the table's buffers (zero copy - memory-mapped for IPC files)
+    placement_matrices = _fixed_size_values(table.column("placement"))
+    quantity_matrix = _fixed_size_values(table.column("quantities"))
+    derived_quantity_mask = _fixed_size_values(table.column("derived_quantities"))
+    has_placement = table.column("has_placement").to_numpy()
+
+    unit_maps: Dict[str, Dict[str, str]] = {}
+    units = []
+    for text in _strings(table.column("units")):
+        if text is not None and text not in unit_maps:
+            unit_maps[text] = json.loads(text)
+        units.append(unit_maps[text] if text is not None else None)
+
+    property_keys: List[Tuple[int, ...]] = []
+    property_values: List[Tuple[Any, ...]] = []
+    for chunk in table.column("properties").chunks:
+        offsets = chunk.offsets.to_numpy()
+        items = chunk.flatten()
+        keys = items.field("key").to_numpy().tolist()
+        kinds = items.field("kind").to_numpy()
+        values = np.full(len(keys), None, dtype=object)
+        # Equal values become one shared object (as in a freshly parsed model)
+        for kind, column in (
+            (_INT, items.field("integer").to_numpy()),
+            (_BOOL, items.field("integer").to_numpy()),
+            # Floats are deduplicated by bit pattern (keeps -0.0 and NaN payloads)
+            (_FLOAT, items.field("number").to_numpy().view(np.int64))
+        ):
+            positions = np.flatnonzero(kinds == kind)
+            if not len(positions):
+                continue
+            unique, inverse = np.unique(column[positions], return_inverse=True)
+            if kind == _FLOAT:
+                objects = unique.view(np.float64).tolist()
+            elif kind == _BOOL:
+                objects = [bool(value) for value in unique.tolist()]
+            else:
+                objects = unique.tolist()
+            values[positions] = _object_array(objects)[inverse]
+        for kind in (_TEXT, _JSON):
+            positions = np.flatnonzero(kinds == kind)
+            if not len(positions):
+                continue
+            texts = _dictionary_encoded(items.field("text"))
+            unique, inverse = np.unique(texts.indices.fill_null(0).to_numpy()[positions], return_inverse=True)
+            objects = texts.dictionary.take(pa.array(unique)).to_pylist()
+            if kind == _JSON:
+                objects = [json.loads(text) for text in objects]
+            values[positions] = _object_array(objects)[inverse]
+        values = values.tolist()
+        # Offsets of a sliced chunk do not start at 0
+        base = int(offsets[0])
+        for start, end in zip((offsets[:-1] - base).tolist(), (offsets[1:] - base).tolist()):
+            property_keys.append(tuple(keys[start:end]))
+            property_values.append(tuple(values[start:end]))
+
+    model = IfcModel.from_columns(
+        global_ids=table.column("global_id").to_pylist(),
+        type_names=_strings(table.column("type_name")),
+        names=_strings(table.column("name")),
+        key_table=key_table,
+        property_keys=property_keys,
+        property_values=property_values,
+        units=units,
+        placement_matrices=placement_matrices,
+        has_placement=has_placement,
+        pool_values=False,
+        quantity_matrix=quantity_matrix,
+        derived_quantity_mask=derived_quantity_mask
+    )
+    return model, metadata
+
+
+def write_snapshot(model: IfcModel, path: str, file_format: str = "arrow", metadata: Optional[Dict[str, Any]] = None) -> None:
+    """Write a snapshot file
+
+    "arrow": Arrow IPC file, uncompressed - memory-mapped on read (warm starts, hand-off)
+    "parquet": zstd-compressed Parquet - smaller, for archival
+    """
+    if file_format not in SNAPSHOT_FORMATS:
+        raise SnapshotError(f"Unknown snapshot format: {file_format} (expected one of {', '.join(SNAPSHOT_FORMATS)})")
+    table = model_to_table(model, metadata)
+    if file_format == "parquet":
+        pq.write_table(table, path, compression="zstd")
+    else:
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def read_snapshot(path: str) -> Tuple[IfcModel, Dict[str, Any]]:
+    """Model and metadata of a snapshot file (format detected from its magic bytes)"""
+    _require_pyarrow()
+    with open(path, "rb") as f:
+        head = f.read(len(_ARROW_MAGIC))
+    try:
+        if head.startswith(_ARROW_MAGIC):
+            # Memory-mapped: columns are read straight from the page cache
+            table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        elif head.startswith(_PARQUET_MAGIC):
+            table = pq.read_table(path, memory_map=True)
+        else:
+            raise SnapshotError("Not an Arrow IPC or Parquet snapshot")
+    except pa.ArrowException as e:
+        raise SnapshotError(f"Corrupt snapshot: {e}") from e
+    try:
+        return table_to_model(table)
+    except (KeyError, ValueError, pa.ArrowException) as e:
+        if isinstance(e, SnapshotError):
+            raise
+        raise SnapshotError(f"Not a model snapshot: {e}") from e
+
+
+class ModelSnapshotStore:
+    """LRU store of Arrow snapshots of parsed models (warm starts)
+
+    Keyed like the parse cache (content hash + options), so a model that was
+    parsed once - by this process, an earlier one or another instance sharing the
+    directory - is memory-mapped instead of parsed again. Files are kept in a
+    FileLruStore of at most `max_size` bytes, like parse cache entries.
+    """
+
+    def __init__(self, snapshot_dir: str, max_size: int, enabled: bool = True):
+        self.snapshot_dir = snapshot_dir
+        self.max_size = max_size
+        self.enabled = enabled and pa is not None
+        if enabled and pa is None:
+            logger.warning("pyarrow is not installed - model snapshots are disabled")
+        self._files = FileLruStore(snapshot_dir, ".arrow", max_size, self.enabled)
+
+    @staticmethod
+    def make_key(content_hash: str, **options: Any) -> str:
+        """Snapshot key of a content hash + parse options (+ snapshot format version)"""
+        parts = [f"v{SNAPSHOT_FORMAT_VERSION}", content_hash]
+        parts.extend(f"{name}={options[name]}" for name in sorted(options))
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def load(self, key: str) -> Optional[IfcModel]:
+        """Snapshot model by key (None if there is none or it cannot be read)"""
+        path = self._files.get_path(key)
+        if path is None:
+            return None
+        try:
+            model, _ = read_snapshot(path)
+        except (OSError, SnapshotError) as e:
+            logger.warning("Dropping unreadable snapshot %s: %s", path, e)
+            self._files.discard(path)
+            return None
+        return model
+
+    def save(self, key: str, model: IfcModel, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Store a snapshot (errors are logged - snapshots are only an optimization)"""
+        if not self.enabled:
+            return
+        tmp_path = self._files.tmp_path(key)
+        try:
+            write_snapshot(model, tmp_path, "arrow", {**(metadata or {}), "created_at": time.time()})
+            if not self._files.publish(tmp_path, key):
+                logger.info("Snapshot %s is larger than the store (%d bytes), not kept", key, self.max_size)
+        except (OSError, SnapshotError, pa.ArrowException) as e:
+            logger.warning("Could not store snapshot %s: %s", key, e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        return {
+            "enabled": self.enabled,
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            **self._files.stats()
+        }
@@ -0,0 +1,255 @@
+"""Background parse jobs"""
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+import os
+import threading
+import time
+import uuid
+from domain.entities.ifc_model import IfcModel
+from domain.entities.parse_options import ParseOptions
+from ifc_common import Result
+from infrastructure.services.model_sessions import MODEL_ELEMENT_BYTES
+
+
+class ParseCancelledError(Exception):
+    """Raised inside the parser when a job was cancelled"""
+
+
+class ParseProgress:
+    """Progress of one parse, updated by the parser thread
+
+    `total` is the number of products (known once the model is opened), `processed`
+    the number of elements built so far. Setting `cancel_event` makes the parser stop
+    at the next element.
+    """
+
+    __slots__ = ("total", "processed", "cancel_event")
+
+    def __init__(self):
+        self.total: Optional[int] = None
+        self.processed = 0
+        self.cancel_event = threading.Event()
+
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise ParseCancelledError("Parse job was cancelled")
+
+
+class ParseJob:
+    """One submitted parse and its state"""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+    def __init__(
+        self,
+        source: Union[str, bytes],
+        content_hash: str,
+        tmp_path: Optional[str],
+        options: ParseOptions
+    ):
+        self.job_id = uuid.uuid4().hex
+        self.source = source
+        self.content_hash = content_hash
+        self.tmp_path = tmp_path
+        self.options = options
+        self.status = self.QUEUED
+        self.progress = ParseProgress()
+        self.result: Optional[IfcModel] = None
+        self.result_size = 0  # estimated bytes of `result` while it is kept
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in self.FINISHED
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Job state for API responses"""
+        total = self.progress.total
+        processed = self.progress.processed
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "content_hash": self.content_hash,
+            "options": self.options.to_dict(),
+            "progress": {
+                "processed": processed,
+                "total": total,
+                "percent": round(100.0 * processed / total, 1) if total else (100.0 if self.status == self.COMPLETED else 0.0)
+            },
+            "result_available": self.result is not None,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+class ParseJobManager:
+    """Runs parse jobs in a bounded thread pool
+
+    At most `workers` jobs parse at the same time; up to `max_queued` more wait in
+    the queue and further submissions are refused (the API answers 429), so heavy
+    models cannot pile up unbounded work. Status of the last `max_finished`
+    finished jobs is kept. Their models are released after `result_ttl` seconds,
+    and oldest first once they exceed `result_memory_budget` (estimated, the newest
+    result is always kept) - the parse snapshot can still serve them then.
+    """
+
+    def __init__(
+        self,
+        parser_service,
+        workers: int = 2,
+        max_queued: int = 16,
+        max_finished: int = 64,
+        result_memory_budget: int = 512 * 1024 * 1024,
+        result_ttl: float = 3600.0
+    ):
+        self.parser_service = parser_service
+        self.workers = max(workers, 1)
+        self.max_queued = max(max_queued, 0)
+        self.max_finished = max(max_finished, 1)
+        self.result_memory_budget = result_memory_budget
+        self.result_ttl = result_ttl
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._jobs: "OrderedDict[str, ParseJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Lazily created worker pool"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="parse-job")
+        return self._executor
+
+    def _count(self, status: str) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == status)
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting for a worker"""
+        with self._lock:
+            return self._count(ParseJob.QUEUED)
+
+    def is_full(self) -> bool:
+        """True if a new job would be refused"""
+        return self.queue_depth >= self.max_queued
+
+    def submit(
+        self,
+        source: Union[str, bytes],
+        content_hash: str,
+        tmp_path: Optional[str] = None,
+        options: Optional[ParseOptions] = None
+    ) -> Result[ParseJob, str]:
+        """Queue a parse (the job owns `tmp_path` and removes it when it finishes)"""
+        job = ParseJob(source, content_hash, tmp_path, options or ParseOptions())
+        with self._lock:
+            if self._count(ParseJob.QUEUED) >= self.max_queued:
+                return Result.failure(f"Parse queue is full ({self.max_queued} jobs waiting)")
+            self._jobs[job.job_id] = job
+            job.future = self._get_executor().submit(self._run, job)
+        return Result.success(job)
+
+    def get(self, job_id: str) -> Optional[ParseJob]:
+        with self._lock:
+            self._release_results()
+            return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[ParseJob]:
+        with self._lock:
+            self._release_results()
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[ParseJob]:
+        """Cancel a queued or running job (finished jobs are left as they are)"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.progress.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # Never started - finish it here
+            self._finish(job, ParseJob.CANCELLED)
+        return job
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size and job counts by status"""
+        with self._lock:
+            self._release_results()
+            counts = {status: self._count(status) for status in (
+                ParseJob.QUEUED, ParseJob.RUNNING, ParseJob.COMPLETED, ParseJob.FAILED, ParseJob.CANCELLED
+            )}
+            result_size = sum(job.result_size for job in self._jobs.values())
+        return {
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "jobs": counts,
+            "results_estimated_size_bytes": result_size,
+            "results_memory_budget_bytes": self.result_memory_budget
+        }
+
+    def shutdown(self) -> None:
+        """Cancel everything and stop the pool"""
+        for job in self.list_jobs():
+            self.cancel(job.job_id)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _run(self, job: ParseJob) -> None:
+        """Worker entry point"""
+        if job.progress.cancel_event.is_set():
+            self._finish(job, ParseJob.CANCELLED)
+            return
+        job.status = ParseJob.RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = self.parser_service.parse_with_progress(
+                job.source,
+                options=job.options,
+                content_hash=job.content_hash,
+                progress=job.progress
+            )
+            job.result_size = len(job.result) * MODEL_ELEMENT_BYTES
+            self._finish(job, ParseJob.COMPLETED)
+        except ParseCancelledError:
+            self._finish(job, ParseJob.CANCELLED)
+        except Exception as e:
+            self._finish(job, ParseJob.FAILED, f"Error parsing IFC file: {str(e)}")
+
+    def _finish(self, job: ParseJob, status: str, error: Optional[str] = None) -> None:
+        """Record the outcome, release the input and forget old finished jobs"""
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        job.source = None
+        if job.tmp_path and os.path.exists(job.tmp_path):
+            os.remove(job.tmp_path)
+        with self._lock:
+            finished = [job_id for job_id, item in self._jobs.items() if item.finished]
+            for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+                del self._jobs[job_id]
+            self._release_results()
+
+    def _release_results(self) -> None:
+        """Drop expired models, then the oldest ones while over the memory budget (lock held)"""
+        kept = [job for job in self._jobs.values() if job.result is not None and job.finished_at is not None]
+        kept.sort(key=lambda job: job.finished_at)
+        now = time.time()
+        total = sum(job.result_size for job in kept)
+        for position, job in enumerate(kept):
+            expired = now - job.finished_at > self.result_ttl
+            if not expired and (total <= self.result_memory_budget or position == len(kept) - 1):
+                continue
+            total -= job.result_size
+            job.result = None
+            job.result_size = 0
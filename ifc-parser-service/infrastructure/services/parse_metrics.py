@@ -0,0 +1,169 @@
+"""Parse profiling and Prometheus metrics"""
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+import os
+import resource
+import sys
+import threading
+import time
+
+
+# Stages reported in Server-Timing and metrics, in pipeline order
+STAGES = ("open", "psets", "placement", "geometry", "serialize")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (peak RSS where /proc is not available)"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kB on Linux, bytes on macOS
+        return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+class ParseProfile:
+    """Stage timings, element counts per IFC type and peak RSS of one parse
+
+    Stage times are summed over elements (and over worker processes for sharded
+    parses, so they can exceed the wall time). RSS is sampled at stage boundaries
+    and every `RSS_SAMPLE_INTERVAL` elements.
+    """
+
+    RSS_SAMPLE_INTERVAL = 256
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.type_counts: Counter = Counter()
+        self.peak_rss = current_rss()
+        self.started_at = time.perf_counter()
+        self.wall_time: Optional[float] = None
+        self._elements = 0
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block as `name` (and sample RSS after it)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+            self.sample_rss()
+
+    def count_element(self, type_name: str) -> None:
+        self.type_counts[type_name] += 1
+        self._elements += 1
+        if self._elements % self.RSS_SAMPLE_INTERVAL == 0:
+            self.sample_rss()
+
+    def sample_rss(self) -> None:
+        self.peak_rss = max(self.peak_rss, current_rss())
+
+    def finish(self) -> None:
+        """Stop the wall clock"""
+        if self.wall_time is None:
+            self.wall_time = time.perf_counter() - self.started_at
+        self.sample_rss()
+
+    def merge(self, other: "ParseProfile") -> None:
+        """Add a worker's profile (sharded parses)"""
+        for stage, seconds in other.stages.items():
+            self.add(stage, seconds)
+        self.type_counts.update(other.type_counts)
+        self.peak_rss = max(self.peak_rss, other.peak_rss)
+
+    @property
+    def element_count(self) -> int:
+        return sum(self.type_counts.values())
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (milliseconds)"""
+        entries = [f"{stage};dur={self.stages[stage] * 1000:.1f}" for stage in STAGES if stage in self.stages]
+        entries.extend(
+            f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items() if stage not in STAGES
+        )
+        if self.wall_time is not None:
+            entries.append(f"total;dur={self.wall_time * 1000:.1f}")
+        return ", ".join(entries)
+
+
+class ParseMetrics:
+    """Cumulative parse metrics of the service (Prometheus text format)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parses: Counter = Counter()
+        self.stage_seconds: Dict[str, float] = {stage: 0.0 for stage in STAGES}
+        self.parse_seconds = 0.0
+        self.elements_by_type: Counter = Counter()
+        self.last_peak_rss = 0
+        self.max_peak_rss = 0
+
+    def record(self, profile: ParseProfile, success: bool = True) -> None:
+        """Add a finished parse"""
+        profile.finish()
+        with self._lock:
+            self.parses["success" if success else "failure"] += 1
+            for stage, seconds in profile.stages.items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.parse_seconds += profile.wall_time or 0.0
+            self.elements_by_type.update(profile.type_counts)
+            self.last_peak_rss = profile.peak_rss
+            self.max_peak_rss = max(self.max_peak_rss, profile.peak_rss)
+
+    def observe_stage(self, stage: str, seconds: float) -> None:
+        """Add time spent outside the parser (e.g. serialization in the router)"""
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def render(self, extra: Optional[Dict[str, Tuple[str, str, float]]] = None) -> str:
+        """Metrics in Prometheus text exposition format
+
+        extra: more `name → (kind, help, value)` metrics (cache, jobs, sessions, ...);
+        kind is "counter" (monotonic, name ends in _total) or "gauge"
+        """
+        lines: List[str] = []
+
+        def metric(name: str, kind: str, help_text: str, samples: List[Tuple[str, float]]) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        with self._lock:
+            metric("ifc_parser_parses_total", "counter", "Finished parses by outcome", [
+                (f'{{status="{status}"}}', self.parses[status]) for status in ("success", "failure")
+            ])
+            metric("ifc_parser_parse_seconds_total", "counter", "Wall time spent parsing", [
+                ("", round(self.parse_seconds, 6))
+            ])
+            metric("ifc_parser_stage_seconds_total", "counter", "Time spent per parse stage (summed over elements and workers)", [
+                (f'{{stage="{self._escape(stage)}"}}', round(seconds, 6)) for stage, seconds in self.stage_seconds.items()
+            ])
+            metric("ifc_parser_elements_total", "counter", "Parsed elements by IFC type", [
+                (f'{{ifc_type="{self._escape(type_name)}"}}', count)
+                for type_name, count in sorted(self.elements_by_type.items())
+            ])
+            metric("ifc_parser_last_parse_peak_rss_bytes", "gauge", "Peak resident memory during the last parse", [
+                ("", self.last_peak_rss)
+            ])
+            metric("ifc_parser_max_parse_peak_rss_bytes", "gauge", "Highest peak resident memory of any parse", [
+                ("", self.max_peak_rss)
+            ])
+        metric("ifc_parser_resident_memory_bytes", "gauge", "Current resident memory of the service", [
+            ("", current_rss())
+        ])
+        for name, (kind, help_text, value) in (extra or {}).items():
+            metric(name, kind, help_text, [("", value)])
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,170 @@
+"""Content-addressed on-disk cache of parse results"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import threading
+from infrastructure.services.file_lru_store import FileLruStore
+
+
+# Bump whenever the parser output changes - old cache entries are then never hit
+CACHE_SCHEMA_VERSION = 2
+
+
+class ParseResultCache:
+    """LRU cache of parsed models, keyed by the hash of the uploaded bytes
+
+    Entries are NDJSON files (one serialized element per line) under `cache_dir`,
+    so a hit can be streamed as-is or joined into a {"elements": [...]} document
+    without decoding. Files are kept in a FileLruStore of at most `max_size`
+    bytes. An entry can be evicted between get_path and reading it, the readers
+    then report a miss (None).
+
+    Keys being parsed are tracked too (claim / release), so identical uploads
+    arriving while one is parsed wait for that parse and are served from the
+    cache instead of parsing the same bytes again.
+    """
+
+    def __init__(self, cache_dir: str, max_size: int, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.enabled = enabled
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._files = FileLruStore(cache_dir, ".ndjson", max_size, enabled)
+        self._in_flight: Dict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = {}
+
+    @staticmethod
+    def make_key(content_hash: str, **options: Any) -> str:
+        """Cache key of a content hash + parse options (+ cache schema version)"""
+        parts = [f"v{CACHE_SCHEMA_VERSION}", content_hash]
+        parts.extend(f"{name}={options[name]}" for name in sorted(options))
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def claim(self, key: str) -> Optional[asyncio.Event]:
+        """Mark a key as being parsed (call on the event loop)
+
+        None: the caller parses and must release(key) once the result is stored
+        or the parse failed. Otherwise the key is already being parsed and the
+        returned event is set when that parse ends - the result is then in the
+        cache, unless it failed.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._in_flight.get(key)
+            if entry is not None:
+                self.coalesced += 1
+                return entry[1]
+            self._in_flight[key] = (asyncio.get_running_loop(), asyncio.Event())
+        return None
+
+    def release(self, key: str) -> None:
+        """End a claimed parse, waking up requests waiting for it (any thread)"""
+        with self._lock:
+            entry = self._in_flight.pop(key, None)
+        if entry is not None:
+            loop, event = entry
+            loop.call_soon_threadsafe(event.set)
+
+    def get_path(self, key: str) -> Optional[str]:
+        """Path of a cached result (counts as hit/miss and refreshes recency)"""
+        return self._files.get_path(key)
+
+    def read_lines(self, path: str) -> Optional[List[bytes]]:
+        """Serialized elements of a cached result (None if it was evicted meanwhile)"""
+        try:
+            with open(path, "rb") as f:
+                return [line.rstrip(b"\n") for line in f if line.strip()]
+        except FileNotFoundError:
+            self._files.discard(path)
+            return None
+
+    def iter_chunks(self, path: str, chunk_size: int = 64 * 1024) -> Optional[Iterator[bytes]]:
+        """Cached NDJSON in chunks, for streaming responses (None if it was evicted meanwhile)
+
+        The file is opened right away, so a later eviction cannot cut the stream short.
+        """
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            self._files.discard(path)
+            return None
+        
+        def chunks() -> Iterator[bytes]:
+            with f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    yield chunk
+        
+        return chunks()
+
+    def writer(self, key: str) -> "CacheWriter":
+        """Writer that stores a result line by line and publishes it on commit"""
+        return CacheWriter(self, key)
+
+    def put_lines(self, key: str, lines: List[bytes]) -> None:
+        """Store serialized elements (skipped if they alone exceed max_size)"""
+        if not self.enabled:
+            return
+        if not self._files.fits(sum(len(line) + 1 for line in lines)):
+            return
+        writer = self.writer(key)
+        for line in lines:
+            writer.write(line)
+        writer.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            coalescing = {"coalesced": self.coalesced, "in_flight": len(self._in_flight)}
+        return {
+            "enabled": self.enabled,
+            "schema_version": CACHE_SCHEMA_VERSION,
+            **self._files.stats(),
+            **coalescing
+        }
+
+
+class CacheWriter:
+    """Incremental writer of one cache entry (nothing is visible until commit)
+
+    An entry outgrowing the cache's max_size is dropped as soon as it does.
+    """
+
+    def __init__(self, cache: ParseResultCache, key: str):
+        self.cache = cache
+        self.key = key
+        self._size = 0
+        self._tmp_path = None
+        self._file = None
+        if cache.enabled:
+            self._tmp_path = cache._files.tmp_path(key)
+            self._file = open(self._tmp_path, "wb")
+
+    def write(self, line: bytes) -> None:
+        """Append one serialized element"""
+        if self._file is None:
+            return
+        data = line.rstrip(b"\n") + b"\n"
+        self._size += len(data)
+        if not self.cache._files.fits(self._size):
+            self.abort()
+            return
+        self._file.write(data)
+
+    def commit(self) -> None:
+        """Publish the entry"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        self.cache._files.publish(self._tmp_path, self.key)
+
+    def abort(self) -> None:
+        """Drop a partially written entry"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
@@ -0,0 +1,131 @@
+"""Memoized IfcLocalPlacement resolution"""
+from typing import Dict, List, Optional
+import numpy as np
+
+
+IDENTITY_MATRIX = [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+
+class PlacementResolver:
+    """Resolves placement matrices once per IfcLocalPlacement entity
+
+    One resolver lives for a single parse. Local matrices are cached by entity id,
+    and in global mode every placement is composed with its (already cached) parent
+    exactly once, so shared Site → Building → Storey chains are walked only once.
+
+    Modes:
+    - local (default): only the element's own placement, like the C# ToWpfMatrix3D
+    - global: element placement accumulated through the PlacementRelTo hierarchy
+
+    Output format is the one the frontend already consumes (column-major, flattened):
+    [m00, m10, m20, 0, m01, m11, m21, 0, m02, m12, m22, 0, OffsetX, OffsetY, OffsetZ, 1]
+    """
+
+    def __init__(self, use_global: bool = False):
+        self.use_global = use_global
+        self._local: Dict[int, np.ndarray] = {}
+        self._global: Dict[int, np.ndarray] = {}
+
+    def resolve(self, placement) -> List[float]:
+        """Return flattened matrix for an IfcObjectPlacement (identity if missing)"""
+        if placement is None:
+            return list(IDENTITY_MATRIX)
+        try:
+            matrix = self._global_matrix(placement) if self.use_global else self._local_matrix(placement)
+        except Exception:
+            return list(IDENTITY_MATRIX)
+        return self._flatten(matrix)
+
+    def _local_matrix(self, placement) -> np.ndarray:
+        """Cached local 4x4 matrix (axes as columns, translation in last column)"""
+        key = placement.id()
+        matrix = self._local.get(key)
+        if matrix is None:
+            matrix = self._build_local_matrix(placement)
+            self._local[key] = matrix
+        return matrix
+
+    def _global_matrix(self, placement) -> np.ndarray:
+        """Cached global 4x4 matrix, composing each parent only once"""
+        # Walk up until we hit a placement that is already resolved (or the root)
+        chain = []
+        current = placement
+        while current is not None and current.id() not in self._global:
+            chain.append(current)
+            current = self._parent(current)
+
+        parent_matrix = self._global[current.id()] if current is not None else None
+        for item in reversed(chain):
+            local_matrix = self._local_matrix(item)
+            matrix = local_matrix if parent_matrix is None else parent_matrix @ local_matrix
+            self._global[item.id()] = matrix
+            parent_matrix = matrix
+
+        return self._global[placement.id()]
+
+    @staticmethod
+    def _parent(placement) -> Optional[object]:
+        """Parent placement (PlacementRelTo) or None"""
+        parent = getattr(placement, 'PlacementRelTo', None)
+        return parent if parent else None
+
+    @staticmethod
+    def _flatten(matrix: np.ndarray) -> List[float]:
+        """Convert 4x4 matrix to the flattened column-major layout"""
+        out = np.eye(4)
+        out[:3, :3] = matrix[:3, :3]
+        out[3, :3] = matrix[:3, 3]
+        return out.flatten().tolist()
+
+    @staticmethod
+    def _read_vector(item, attribute: str, default: List[float]) -> np.ndarray:
+        """Read Coordinates/DirectionRatios as a 3D vector (2D values are padded with 0)"""
+        try:
+            values = getattr(item, attribute)
+            values = [float(v) for v in list(values)[:3]]
+            if not values:
+                return np.array(default)
+            while len(values) < 3:
+                values.append(0.0)
+            return np.array(values)
+        except (AttributeError, ValueError, TypeError):
+            return np.array(default)
+
+    def _build_local_matrix(self, placement) -> np.ndarray:
+        """Build matrix from IfcLocalPlacement.RelativePlacement (like C# ToWpfMatrix3D)"""
+        rel_placement = getattr(placement, 'RelativePlacement', None)
+        if rel_placement is None:
+            return np.eye(4)
+
+        origin = np.zeros(3)
+        location = getattr(rel_placement, 'Location', None)
+        if location is not None:
+            origin = self._read_vector(location, 'Coordinates', [0.0, 0.0, 0.0])
+
+        z_axis = np.array([0.0, 0.0, 1.0])
+        axis = getattr(rel_placement, 'Axis', None)
+        if axis is not None:
+            z_axis = self._read_vector(axis, 'DirectionRatios', [0.0, 0.0, 1.0])
+            z_norm = np.linalg.norm(z_axis)
+            if z_norm > 1e-6:
+                z_axis = z_axis / z_norm
+
+        x_axis = np.array([1.0, 0.0, 0.0])
+        ref_direction = getattr(rel_placement, 'RefDirection', None)
+        if ref_direction is not None:
+            x_axis = self._read_vector(ref_direction, 'DirectionRatios', [1.0, 0.0, 0.0])
+            x_norm = np.linalg.norm(x_axis)
+            if x_norm > 1e-6:
+                x_axis = x_axis / x_norm
+
+        # Y-axis as cross product (Z x X) - like C#: CrossProduct(zAxis, xAxis)
+        y_axis = np.cross(z_axis, x_axis)
+        y_norm = np.linalg.norm(y_axis)
+        y_axis = y_axis / y_norm if y_norm > 1e-6 else np.array([0.0, 1.0, 0.0])
+
+        matrix = np.eye(4)
+        matrix[:3, 0] = x_axis
+        matrix[:3, 1] = y_axis
+        matrix[:3, 2] = z_axis
+        matrix[:3, 3] = origin
+        return matrix
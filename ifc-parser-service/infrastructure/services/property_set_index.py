@@ -0,0 +1,248 @@
+"""Single-pass property set index"""
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import sys
+import threading
+import ifcopenshell
+import ifcopenshell.util.element
+import ifcopenshell.util.unit
+
+
+class PropertySet:
+    """Flattened properties with the units of the keys that have one"""
+
+    __slots__ = ("values", "units")
+
+    def __init__(self, values: Dict[str, Any], units: Dict[str, str]):
+        self.values = values
+        self.units = units
+
+    def update(self, other: "PropertySet") -> None:
+        """Merge another set (its values win)"""
+        self.values.update(other.values)
+        self.units.update(other.units)
+
+
+class PropertyKeyFilter:
+    """Whitelist of flattened property keys (exact keys and/or key prefixes)"""
+
+    def __init__(self, keys=None, prefixes=None):
+        self.keys = frozenset(keys or ())
+        self.prefixes = tuple(prefixes or ())
+
+    @property
+    def cache_key(self) -> str:
+        """Identifies the filter in caches of filtered properties"""
+        return "keys=" + ",".join(sorted(self.keys)) + "|prefixes=" + ",".join(sorted(self.prefixes))
+
+    def accepts(self, key: str) -> bool:
+        return key in self.keys or key.startswith(self.prefixes)
+
+    def accepts_group(self, group: str) -> bool:
+        """Can any key starting with `group` ("Pset_X.", "Type.Pset_X.") be accepted"""
+        return (
+            any(key.startswith(group) for key in self.keys)
+            or any(prefix.startswith(group) or group.startswith(prefix) for prefix in self.prefixes)
+        )
+
+
+class PropertySetIndex:
+    """Element → property sets index built in one sweep over the relationships
+
+    Replaces a `get_psets` call per element (each one walks inverse relations).
+    Every IfcPropertySet / IfcElementQuantity is flattened into prefixed
+    key/value pairs exactly once, so extraction per element is dictionary merging.
+
+    Keys match `get_psets` + the parser's flattening:
+    - "PsetName.PropName" (or "PropName" for the "Base" pset)
+    - occurrence psets inherit the type's psets (type values are overridden)
+    - type psets are additionally available with a "Type." prefix
+    Values keep their native types (numbers, booleans, strings, None); units of
+    quantities and measure-typed properties are kept separately by key.
+
+    Type objects are shared by many occurrences, so their merged properties are
+    built once per type entity and kept in `type_cache` (reusable across parses
+    of the same file revision, see TypePropertyCache).
+
+    With a `key_filter`, property sets that cannot contain a wanted key are not
+    read at all and other keys are dropped while flattening (type caches must then
+    be per filter too).
+    """
+
+    def __init__(
+        self,
+        ifc_file: ifcopenshell.file,
+        type_cache: Optional[Dict[int, Tuple[PropertySet, PropertySet]]] = None,
+        key_filter: Optional[PropertyKeyFilter] = None
+    ):
+        self._key_filter = key_filter
+        self._flat: Dict[int, PropertySet] = {}
+        self._flat_type: Dict[int, PropertySet] = {}
+        self._type_cache = type_cache if type_cache is not None else {}
+        self._definitions_by_element: Dict[int, List[ifcopenshell.entity_instance]] = {}
+        self._type_by_element: Dict[int, ifcopenshell.entity_instance] = {}
+        self._unit_symbols: Dict[int, str] = {}
+        self._default_unit_symbols: Dict[str, Optional[str]] = {}
+        self._build(ifc_file)
+
+    def _build(self, ifc_file: ifcopenshell.file) -> None:
+        """Sweep IfcRelDefinesByProperties / IfcRelDefinesByType once"""
+        for rel in ifc_file.by_type("IfcRelDefinesByProperties"):
+            definition = getattr(rel, 'RelatingPropertyDefinition', None)
+            if definition is None:
+                continue
+            # IfcPropertySetDefinitionSet wraps a list of definitions
+            if definition.is_a("IfcPropertySetDefinitionSet"):
+                definitions = list(definition.wrappedValue)
+            else:
+                definitions = [definition]
+            for obj in rel.RelatedObjects or []:
+                self._definitions_by_element.setdefault(obj.id(), []).extend(definitions)
+
+        for rel in ifc_file.by_type("IfcRelDefinesByType"):
+            if rel.RelatingType is None:
+                continue
+            for obj in rel.RelatedObjects or []:
+                self._type_by_element[obj.id()] = rel.RelatingType
+
+    @staticmethod
+    def _typed_value(value: Any) -> Any:
+        """JSON-friendly native value (entity references etc. become strings)"""
+        if value is None or isinstance(value, (str, bool, int, float)):
+            return value
+        if isinstance(value, (list, tuple)):
+            return [PropertySetIndex._typed_value(item) for item in value]
+        return str(value)
+
+    def _symbol(self, unit) -> Optional[str]:
+        """Symbol of a unit entity (cached by id)"""
+        if unit is None:
+            return None
+        if unit.id() not in self._unit_symbols:
+            self._unit_symbols[unit.id()] = ifcopenshell.util.unit.get_unit_symbol(unit)
+        return self._unit_symbols[unit.id()]
+
+    def _unit_symbol(self, prop, ifc_file) -> Optional[str]:
+        """Unit symbol of a quantity / property ("mm", "kg", ...) or None"""
+        try:
+            unit = getattr(prop, 'Unit', None)
+            if unit is not None:
+                return self._symbol(unit)
+
+            # Without an explicit unit the project default for the measure type applies,
+            # so resolve it once per quantity class / measure class
+            if prop.is_a("IfcPhysicalSimpleQuantity"):
+                measure = prop.is_a()
+            elif prop.is_a("IfcPropertySingleValue"):
+                if prop.NominalValue is None:
+                    return None
+                measure = prop.NominalValue.is_a()
+            else:
+                return self._symbol(ifcopenshell.util.unit.get_property_unit(prop, ifc_file))
+
+            if measure not in self._default_unit_symbols:
+                self._default_unit_symbols[measure] = self._symbol(ifcopenshell.util.unit.get_property_unit(prop, ifc_file))
+            return self._default_unit_symbols[measure]
+        except Exception:
+            return None
+
+    def _flatten(self, definition, prefix: str) -> PropertySet:
+        """Flatten one property definition into prefixed key/value pairs (+ units)"""
+        flat = {}
+        units = {}
+        pset_name = definition.Name
+        key_filter = self._key_filter
+        if key_filter is not None and pset_name != "Base" and not key_filter.accepts_group(f"{prefix}{pset_name}."):
+            return PropertySet(flat, units)
+
+        for prop_name, prop_value in ifcopenshell.util.element.get_property_definition(definition).items():
+            key = f"{prefix}{pset_name}.{prop_name}" if pset_name != "Base" else f"{prefix}{prop_name}"
+            if key_filter is not None and not key_filter.accepts(key):
+                continue
+            # Same key in thousands of psets → one string object
+            flat[sys.intern(key)] = self._typed_value(prop_value)
+
+        # Units come from IfcElementQuantity quantities / measure-typed single values
+        members = definition.Quantities if definition.is_a("IfcElementQuantity") else getattr(definition, 'HasProperties', None)
+        for member in members or []:
+            key = f"{prefix}{pset_name}.{member.Name}" if pset_name != "Base" else f"{prefix}{member.Name}"
+            if key_filter is not None and key not in flat:
+                continue
+            symbol = self._unit_symbol(member, definition.file)
+            if symbol:
+                units[sys.intern(key)] = symbol
+        return PropertySet(flat, units)
+
+    def _definition_properties(self, definition) -> PropertySet:
+        """Flattened occurrence-style properties of a definition (cached by id)"""
+        flat = self._flat.get(definition.id())
+        if flat is None:
+            flat = self._flatten(definition, "")
+            self._flat[definition.id()] = flat
+        return flat
+
+    def _definition_type_properties(self, definition) -> PropertySet:
+        """Flattened "Type."-prefixed properties of a definition (cached by id)"""
+        flat = self._flat_type.get(definition.id())
+        if flat is None:
+            flat = self._flatten(definition, "Type.")
+            self._flat_type[definition.id()] = flat
+        return flat
+
+    def get_type(self, element):
+        """Type object of an element (IfcRelDefinesByType) or None"""
+        return self._type_by_element.get(element.id())
+
+    def _type_entry(self, type_element) -> Tuple[PropertySet, PropertySet]:
+        """(inherited, "Type."-prefixed) properties of a type object, built once per type"""
+        entry = self._type_cache.get(type_element.id())
+        if entry is None:
+            inherited = PropertySet({}, {})
+            prefixed = PropertySet({}, {})
+            for definition in getattr(type_element, 'HasPropertySets', None) or []:
+                inherited.update(self._definition_properties(definition))
+                prefixed.update(self._definition_type_properties(definition))
+            entry = (inherited, prefixed)
+            self._type_cache[type_element.id()] = entry
+        return entry
+
+    def get_type_properties(self, type_element) -> PropertySet:
+        """"Type."-prefixed properties of a type object (shared, do not modify)"""
+        return self._type_entry(type_element)[1]
+
+    def get_properties(self, element) -> PropertySet:
+        """Occurrence properties (inherited type psets overridden by the element's own)"""
+        properties = PropertySet({}, {})
+        type_element = self.get_type(element)
+        if type_element is not None:
+            properties.update(self._type_entry(type_element)[0])
+        for definition in self._definitions_by_element.get(element.id(), ()):
+            properties.update(self._definition_properties(definition))
+        return properties
+
+
+class TypePropertyCache:
+    """LRU of per-revision type property caches
+
+    Entity ids are only stable within one file revision, so caches are keyed by
+    the content hash of the file and reused when the same revision is parsed again.
+    Parses run in several threads, so the LRU itself is guarded by a lock.
+    """
+
+    def __init__(self, max_revisions: int = 8):
+        self.max_revisions = max_revisions
+        self._revisions: "OrderedDict[str, Dict[int, Tuple[PropertySet, PropertySet]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def for_revision(self, revision: str) -> Dict[int, Tuple[PropertySet, PropertySet]]:
+        """Get (or create) the type cache of a file revision"""
+        with self._lock:
+            cache = self._revisions.get(revision)
+            if cache is None:
+                cache = {}
+                self._revisions[revision] = cache
+                while len(self._revisions) > max(self.max_revisions, 1):
+                    self._revisions.popitem(last=False)
+            else:
+                self._revisions.move_to_end(revision)
+            return cache
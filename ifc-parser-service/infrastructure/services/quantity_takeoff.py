@@ -0,0 +1,375 @@
+"""Quantity takeoff in SI units (IfcElementQuantity, profile-derived fallback)"""
+from typing import Dict, List, Optional, Tuple
+import math
+import ifcopenshell
+import ifcopenshell.util.element
+import ifcopenshell.util.unit
+from domain.entities.quantities import QUANTITY_COLUMNS
+
+
+# Quantity names read into each column, most specific first
+QUANTITY_NAMES = {
+    "net_weight": ("NetWeight", "Weight"),
+    "gross_weight": ("GrossWeight",),
+    "net_volume": ("NetVolume", "Volume"),
+    "gross_volume": ("GrossVolume",),
+    "net_area": ("NetSurfaceArea", "OuterSurfaceArea", "NetSideArea", "NetArea"),
+    "gross_area": ("GrossSurfaceArea", "GrossSideArea", "GrossArea"),
+    "length": ("Length", "NetLength", "GrossLength")
+}
+
+# Quantity class → project unit type of its value
+_UNIT_TYPES = {
+    "IfcQuantityLength": "LENGTHUNIT",
+    "IfcQuantityArea": "AREAUNIT",
+    "IfcQuantityVolume": "VOLUMEUNIT",
+    "IfcQuantityWeight": "MASSUNIT"
+}
+
+# Mass units scale to grams, weights are kept in kilograms
+_MASS_SCALE = 0.001
+
+
+class ExtrusionQuantities:
+    """Sums over the extruded solids of one representation (project length units)"""
+
+    __slots__ = ("volume", "surface", "length", "clipped")
+
+    def __init__(self, volume: float = 0.0, surface: float = 0.0, length: float = 0.0, clipped: bool = False):
+        self.volume = volume
+        self.surface = surface  # None once a profile without a known perimeter is seen
+        self.length = length
+        self.clipped = clipped
+
+    def add(self, other: "ExtrusionQuantities") -> None:
+        self.volume += other.volume
+        self.surface = None if self.surface is None or other.surface is None else self.surface + other.surface
+        self.length = max(self.length, other.length)
+        self.clipped = self.clipped or other.clipped
+
+
+def _polyline_area_perimeter(curve) -> Optional[Tuple[float, float]]:
+    """Area (shoelace) and perimeter of a closed IfcPolyline"""
+    if curve is None or not curve.is_a("IfcPolyline"):
+        return None
+    points = [tuple(point.Coordinates[:2]) for point in curve.Points]
+    if len(points) < 3:
+        return None
+    if points[0] != points[-1]:
+        points.append(points[0])
+    area = 0.0
+    perimeter = 0.0
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        area += x1 * y2 - x2 * y1
+        perimeter += math.hypot(x2 - x1, y2 - y1)
+    return abs(area) / 2.0, perimeter
+
+
+def profile_area_perimeter(profile) -> Optional[Tuple[float, Optional[float]]]:
+    """Cross-section area and perimeter of a profile (perimeter may be None)
+
+    Parameterized profiles use their nominal dimensions (I-shape fillets included,
+    other radii ignored) and the outer perimeter of hollow sections; arbitrary
+    profiles need polyline curves and count void edges in the perimeter. None for
+    anything else.
+    """
+    if profile is None:
+        return None
+    if profile.is_a("IfcRectangleHollowProfileDef"):
+        x, y, t = profile.XDim, profile.YDim, profile.WallThickness
+        return x * y - max(x - 2 * t, 0.0) * max(y - 2 * t, 0.0), 2 * (x + y)
+    if profile.is_a("IfcRoundedRectangleProfileDef"):
+        x, y, r = profile.XDim, profile.YDim, profile.RoundingRadius or 0.0
+        return x * y - (4 - math.pi) * r * r, 2 * (x + y) - (8 - 2 * math.pi) * r
+    if profile.is_a("IfcRectangleProfileDef"):
+        return profile.XDim * profile.YDim, 2 * (profile.XDim + profile.YDim)
+    if profile.is_a("IfcCircleHollowProfileDef"):
+        r, t = profile.Radius, profile.WallThickness
+        return math.pi * (r * r - max(r - t, 0.0) ** 2), 2 * math.pi * r
+    if profile.is_a("IfcCircleProfileDef"):
+        return math.pi * profile.Radius ** 2, 2 * math.pi * profile.Radius
+    if profile.is_a("IfcEllipseProfileDef"):
+        a, b = profile.SemiAxis1, profile.SemiAxis2
+        # Ramanujan's approximation
+        return math.pi * a * b, math.pi * (3 * (a + b) - math.sqrt((3 * a + b) * (a + 3 * b)))
+    if profile.is_a("IfcIShapeProfileDef"):
+        b, h = profile.OverallWidth, profile.OverallDepth
+        tw, tf, r = profile.WebThickness, profile.FlangeThickness, profile.FilletRadius or 0.0
+        return 2 * b * tf + (h - 2 * tf) * tw + (4 - math.pi) * r * r, 2 * h + 4 * b - 2 * tw
+    if profile.is_a("IfcLShapeProfileDef"):
+        d, t = profile.Depth, profile.Thickness
+        w = profile.Width or d
+        return t * (d + w - t), 2 * (d + w)
+    if profile.is_a("IfcTShapeProfileDef"):
+        d, b = profile.Depth, profile.FlangeWidth
+        tw, tf = profile.WebThickness, profile.FlangeThickness
+        return b * tf + (d - tf) * tw, 2 * (d + b)
+    if profile.is_a("IfcUShapeProfileDef"):
+        d, b = profile.Depth, profile.FlangeWidth
+        tw, tf = profile.WebThickness, profile.FlangeThickness
+        return 2 * b * tf + (d - 2 * tf) * tw, 2 * d + 4 * b - 2 * tw
+    if profile.is_a("IfcCShapeProfileDef"):
+        d, w, t, g = profile.Depth, profile.Width, profile.WallThickness, profile.Girth or 0.0
+        return t * (d + 2 * w + 2 * g - 4 * t), None
+    if profile.is_a("IfcDerivedProfileDef"):
+        parent = profile_area_perimeter(profile.ParentProfile)
+        scale = getattr(profile.Operator, "Scale", None) or 1.0
+        if parent is None:
+            return None
+        area, perimeter = parent
+        return area * scale * scale, perimeter * scale if perimeter is not None else None
+    if profile.is_a("IfcCompositeProfileDef"):
+        area = 0.0
+        for part in profile.Profiles:
+            measured = profile_area_perimeter(part)
+            if measured is None:
+                return None
+            area += measured[0]
+        return area, None
+    if profile.is_a("IfcArbitraryClosedProfileDef"):
+        outer = _polyline_area_perimeter(profile.OuterCurve)
+        if outer is None:
+            return None
+        area, perimeter = outer
+        # Void walls are surface too (welded box girders are drawn as I + void)
+        for inner_curve in getattr(profile, "InnerCurves", None) or ():
+            inner = _polyline_area_perimeter(inner_curve)
+            if inner is None:
+                return None
+            area -= inner[0]
+            perimeter += inner[1]
+        return area, perimeter
+    return None
+
+
+class QuantityTakeoff:
+    """Per-element quantities in SI units (see QUANTITY_COLUMNS)
+
+    Values come from the element's IfcElementQuantity sets (its type's sets fill
+    gaps), scaled from the quantity's own or the project unit. Columns still missing
+    are derived from the body geometry where it is made of extruded profiles:
+    length = extrusion depth, gross volume = profile area x depth, gross area =
+    perimeter x depth + both ends, net values the same when the solid is not
+    clipped, and weights = volume x MassDensity (kg/m3) of the element's (or its
+    type's) single IfcMaterial. Derived columns are reported separately, so callers
+    can tell measured from estimated values.
+
+    One instance per parse: quantity sets, profiles, shapes and densities are cached by id.
+    """
+
+    def __init__(self, ifc_file: ifcopenshell.file):
+        self._ifc_file = ifc_file
+        self._quantity_sets: Dict[int, List[ifcopenshell.entity_instance]] = {}
+        self._type_by_element: Dict[int, ifcopenshell.entity_instance] = {}
+        self._material_by_element: Dict[int, ifcopenshell.entity_instance] = {}
+        self._set_values: Dict[int, Dict[str, float]] = {}
+        self._type_values: Dict[int, Dict[str, float]] = {}
+        self._profiles: Dict[int, Optional[Tuple[float, Optional[float]]]] = {}
+        self._extrusions: Dict[int, Optional[ExtrusionQuantities]] = {}
+        self._densities: Dict[int, Optional[float]] = {}
+        self._unit_scales: Dict[str, float] = {}
+        self._length_scale = self._project_scale("LENGTHUNIT")
+        self._build()
+
+    def _build(self) -> None:
+        """Sweep the property, type and material relationships once"""
+        for rel in self._ifc_file.by_type("IfcRelDefinesByProperties"):
+            definition = getattr(rel, "RelatingPropertyDefinition", None)
+            if definition is None:
+                continue
+            if definition.is_a("IfcPropertySetDefinitionSet"):
+                definitions = [item for item in definition.wrappedValue if item.is_a("IfcElementQuantity")]
+            elif definition.is_a("IfcElementQuantity"):
+                definitions = [definition]
+            else:
+                continue
+            for obj in rel.RelatedObjects or []:
+                self._quantity_sets.setdefault(obj.id(), []).extend(definitions)
+
+        for rel in self._ifc_file.by_type("IfcRelDefinesByType"):
+            if rel.RelatingType is None:
+                continue
+            for obj in rel.RelatedObjects or []:
+                self._type_by_element[obj.id()] = rel.RelatingType
+
+        for rel in self._ifc_file.by_type("IfcRelAssociatesMaterial"):
+            material = rel.RelatingMaterial
+            if material is None or not material.is_a("IfcMaterial"):
+                continue
+            for obj in rel.RelatedObjects or []:
+                self._material_by_element[obj.id()] = material
+
+    def _project_scale(self, unit_type: str) -> float:
+        """SI scale of the project unit of a unit type (cached)"""
+        scale = self._unit_scales.get(unit_type)
+        if scale is None:
+            try:
+                scale = ifcopenshell.util.unit.calculate_unit_scale(self._ifc_file, unit_type)
+            except Exception:
+                scale = 1.0
+            if unit_type == "MASSUNIT":
+                scale *= _MASS_SCALE
+            self._unit_scales[unit_type] = scale
+        return scale
+
+    def _quantity_value(self, quantity) -> Optional[float]:
+        """Value of a physical simple quantity in SI units (kg for weights)"""
+        unit_type = _UNIT_TYPES.get(quantity.is_a())
+        if unit_type is None:
+            return None
+        value = quantity[3]  # LengthValue / AreaValue / VolumeValue / WeightValue
+        if value is None:
+            return None
+        unit = quantity.Unit
+        if unit is None:
+            return float(value) * self._project_scale(unit_type)
+        try:
+            scale = ifcopenshell.util.unit.get_named_unit_scale(unit)
+        except Exception:
+            return None
+        return float(value) * scale * (_MASS_SCALE if unit_type == "MASSUNIT" else 1.0)
+
+    def _quantity_set_values(self, quantity_set) -> Dict[str, float]:
+        """Column values of one IfcElementQuantity (cached by id)"""
+        values = self._set_values.get(quantity_set.id())
+        if values is None:
+            by_name = {}
+            for quantity in quantity_set.Quantities or ():
+                if quantity.is_a("IfcPhysicalSimpleQuantity") and quantity.Name not in by_name:
+                    value = self._quantity_value(quantity)
+                    if value is not None:
+                        by_name[quantity.Name] = value
+            values = {}
+            for column, names in QUANTITY_NAMES.items():
+                for name in names:
+                    if name in by_name:
+                        values[column] = by_name[name]
+                        break
+            self._set_values[quantity_set.id()] = values
+        return values
+
+    def _type_quantities(self, type_element) -> Dict[str, float]:
+        """Column values of the quantity sets of a type object (cached by id)"""
+        values = self._type_values.get(type_element.id())
+        if values is None:
+            values = {}
+            for definition in getattr(type_element, "HasPropertySets", None) or ():
+                if definition.is_a("IfcElementQuantity"):
+                    values.update(self._quantity_set_values(definition))
+            self._type_values[type_element.id()] = values
+        return values
+
+    def _item_extrusion(self, item, scale: float = 1.0) -> Optional[ExtrusionQuantities]:
+        """Extrusion quantities of one representation item (None if not made of extrusions)"""
+        if item.is_a("IfcExtrudedAreaSolid"):
+            profile = item.SweptArea
+            if profile.id() not in self._profiles:
+                self._profiles[profile.id()] = profile_area_perimeter(profile)
+            measured = self._profiles[profile.id()]
+            if measured is None or item.Depth is None:
+                return None
+            area, perimeter = measured
+            depth = item.Depth * scale
+            area *= scale * scale
+            surface = perimeter * scale * depth + 2 * area if perimeter is not None else None
+            return ExtrusionQuantities(area * depth, surface, depth)
+        if item.is_a("IfcBooleanResult"):
+            # Clipping / difference only removes material - the first operand is the gross solid
+            extrusion = self._item_extrusion(item.FirstOperand, scale)
+            if extrusion is not None:
+                extrusion.clipped = True
+            return extrusion
+        if item.is_a("IfcMappedItem"):
+            target_scale = getattr(item.MappingTarget, "Scale", None) or 1.0
+            return self._items_extrusion(item.MappingSource.MappedRepresentation.Items, scale * target_scale)
+        return None
+
+    def _items_extrusion(self, items, scale: float = 1.0) -> Optional[ExtrusionQuantities]:
+        total = None
+        for item in items or ():
+            if item.is_a("IfcStyledItem"):
+                continue
+            extrusion = self._item_extrusion(item, scale)
+            if extrusion is None:
+                return None
+            if total is None:
+                total = extrusion
+            else:
+                total.add(extrusion)
+        return total
+
+    def _extrusion(self, element) -> Optional[ExtrusionQuantities]:
+        """Extrusion quantities of the element's body (cached by product shape id)"""
+        shape = getattr(element, "Representation", None)
+        if shape is None:
+            return None
+        if shape.id() not in self._extrusions:
+            extrusion = None
+            for representation in shape.Representations or ():
+                if representation.RepresentationIdentifier in ("Body", None):
+                    extrusion = self._items_extrusion(representation.Items)
+                    break
+            self._extrusions[shape.id()] = extrusion
+        return self._extrusions[shape.id()]
+
+    def _density(self, element) -> Optional[float]:
+        """MassDensity (kg/m3) from the psets of the element's or its type's IfcMaterial (cached by material)"""
+        material = self._material_by_element.get(element.id())
+        if material is None:
+            type_element = self._type_by_element.get(element.id())
+            material = self._material_by_element.get(type_element.id()) if type_element is not None else None
+        if material is None:
+            return None
+        if material.id() not in self._densities:
+            density = None
+            try:
+                psets = ifcopenshell.util.element.get_psets(material)
+            except Exception:
+                psets = {}
+            for properties in psets.values():
+                value = properties.get("MassDensity")
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+                    density = float(value)
+                    break
+            self._densities[material.id()] = density
+        return self._densities[material.id()]
+
+    def quantities(self, element) -> Tuple[Dict[str, float], Tuple[str, ...]]:
+        """(column → SI value, columns derived from the profile) of one element"""
+        values: Dict[str, float] = {}
+        type_element = self._type_by_element.get(element.id())
+        if type_element is not None:
+            values.update(self._type_quantities(type_element))
+        for quantity_set in self._quantity_sets.get(element.id(), ()):
+            values.update(self._quantity_set_values(quantity_set))
+        if len(values) == len(QUANTITY_COLUMNS):
+            return values, ()
+
+        derived: Dict[str, float] = {}
+        extrusion = self._extrusion(element)
+        if extrusion is not None:
+            length_scale = self._length_scale
+            derived["length"] = extrusion.length * length_scale
+            derived["gross_volume"] = extrusion.volume * length_scale ** 3
+            if extrusion.surface is not None:
+                derived["gross_area"] = extrusion.surface * length_scale ** 2
+            if not extrusion.clipped:
+                derived["net_volume"] = derived["gross_volume"]
+                if "gross_area" in derived:
+                    derived["net_area"] = derived["gross_area"]
+        derived = {column: value for column, value in derived.items() if column not in values}
+
+        # Weights from volumes (measured or derived) and the material density
+        if "net_weight" not in values or "gross_weight" not in values:
+            volumes = {**derived, **values}
+            density = None
+            for weight_column, volume_column in (("net_weight", "net_volume"), ("gross_weight", "gross_volume")):
+                if weight_column in values or volume_column not in volumes:
+                    continue
+                if density is None:
+                    density = self._density(element) or 0.0
+                if density:
+                    derived[weight_column] = volumes[volume_column] * density
+
+        values.update(derived)
+        return values, tuple(column for column in QUANTITY_COLUMNS if column in derived)
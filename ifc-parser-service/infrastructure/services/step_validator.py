@@ -0,0 +1,412 @@
+"""Streaming structural validation of IFC STEP files"""
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+import re
+import time
+import numpy as np
+import ifcopenshell.ifcopenshell_wrapper
+
+
+# One statement up to its terminating ";" - strings ('' escaped) and /* comments */ may contain ";"
+_STATEMENT = re.compile(rb"(?>[^';/]++|/(?!\*)|'(?:[^']|'')*+'|/\*.*?\*/)*+;", re.S)
+_COMMENT = re.compile(rb"/\*.*?\*/", re.S)
+_STRING = re.compile(rb"'(?:[^']|'')*+'")
+# Canonical instance "#id=TYPE(...);" (no comments, nothing between ")" and ";") - the fast path
+_DATA_INSTANCE = re.compile(rb"\s*#(\d+)\s*=\s*([A-Za-z][A-Za-z0-9_]*)\s*\(((?>[^';/]++|/(?!\*)|'(?:[^']|'')*+')*+)(?<=\));")
+_INSTANCE = re.compile(rb"\s*#(\d+)\s*=\s*([A-Za-z][A-Za-z0-9_]*)\s*\((.*)\)\s*;\Z", re.S)
+_COMPLEX_INSTANCE = re.compile(rb"\s*#(\d+)\s*=\s*\((.*)\)\s*;\Z", re.S)
+_HEADER_ENTITY = re.compile(rb"\s*([A-Za-z][A-Za-z0-9_]*)\s*\((.*)\)\s*;\Z", re.S)
+_KEYWORD = re.compile(rb"\s*([A-Za-z0-9_\-]+)\s*(?:\((.*)\))?\s*;\Z", re.S)
+_REFERENCE = re.compile(rb"#(\d+)")
+_MAGIC = b"ISO-10303-21;"
+_COMPLEX_TYPE = b"(COMPLEX)"
+
+# Ids are tracked in bitmaps, so the memory bound is max_id / 4 bytes
+MAX_ENTITY_ID = 2 ** 32
+
+
+class StepValidationReport:
+    """Outcome of a validation"""
+
+    def __init__(self):
+        self.schema: Optional[str] = None
+        self.entity_count = 0
+        self.counts_by_type: Counter = Counter()
+        self.errors: List[Dict[str, Any]] = []
+        self.dangling_references = 0
+        self.dangling_examples: List[int] = []
+        self.bytes_read = 0
+        self.seconds = 0.0
+        self.truncated = False  # validation stopped early (max_errors, not a STEP file)
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "valid": self.valid,
+            "schema": self.schema,
+            "entity_count": self.entity_count,
+            "counts_by_type": dict(self.counts_by_type.most_common()),
+            "errors": self.errors,
+            "truncated": self.truncated,
+            "dangling_references": self.dangling_references,
+            "dangling_examples": self.dangling_examples,
+            "bytes_read": self.bytes_read,
+            "seconds": round(self.seconds, 3)
+        }
+
+
+class StepValidator:
+    """Checks an ISO 10303-21 file chunk by chunk, without building the model
+
+    - file structure: ISO-10303-21; HEADER; ... ENDSEC; DATA; ... ENDSEC; END-ISO-10303-21;
+    - header: FILE_DESCRIPTION, FILE_NAME and FILE_SCHEMA with a schema ifcopenshell knows
+    - entity syntax: "#id=TYPE(...);", balanced parentheses, terminated strings,
+      unique ids, TYPE an instantiable entity of the schema
+    - reference integrity: every #ref is defined somewhere in the file
+    - entity counts per type
+
+    Memory is bounded by twice the largest statement (`max_statement_size`) plus two id
+    bitmaps (max id / 4 bytes), independent of file size. Validation stops after
+    `max_errors` errors, so malformed files are rejected early.
+
+    Usage: feed() chunks in order, then finish(); or validate_file() / validate_bytes().
+    """
+
+    def __init__(self, max_errors: int = 20, max_statement_size: int = 16 * 1024 * 1024):
+        self.max_errors = max(max_errors, 1)
+        self.max_statement_size = max_statement_size
+        self.report = StepValidationReport()
+        self._pending: List[bytes] = []  # unprocessed input: incomplete statement + new chunks
+        self._pending_size = 0
+        self._rescan_size = 0
+        self._line = 1  # line number at the start of the buffer
+        self._state = "start"
+        self._header_entities: List[str] = []
+        self._schema = None
+        self._declarations: Dict[bytes, Optional[str]] = {}
+        self._defined = np.zeros(0, dtype=np.uint8)
+        self._referenced = np.zeros(0, dtype=np.uint8)
+        self._references: List[bytes] = []  # not yet in the bitmap
+        self._started = time.perf_counter()
+
+    @property
+    def stopped(self) -> bool:
+        """True once validation gave up (max_errors reached, not a STEP file); further input is ignored"""
+        return self.report.truncated
+
+    def _error(self, message: str, line: Optional[int] = None) -> None:
+        if self.stopped:
+            return
+        self.report.errors.append({"line": line, "message": message})
+        if len(self.report.errors) >= self.max_errors:
+            self.report.truncated = True
+
+    def feed(self, chunk: bytes) -> None:
+        """Validate the next chunk of the file"""
+        if self.stopped or not chunk:
+            return
+        self.report.bytes_read += len(chunk)
+        self._pending.append(chunk)
+        self._pending_size += len(chunk)
+        # A statement spanning several chunks is rescanned only when the buffered
+        # tail has doubled, so long statements cost linear, not quadratic, time
+        if self._pending_size >= self._rescan_size:
+            self._process()
+
+    def _process(self) -> None:
+        """Check every complete statement buffered so far"""
+        buffer = b"".join(self._pending) if len(self._pending) > 1 else self._pending[0]
+        self._pending = []
+        self._pending_size = 0
+        if self._state == "start" and not self._check_magic(buffer):
+            return
+        position = 0
+        while not self.stopped:
+            if self._state == "data":
+                position = self._data_batch(buffer, position)
+            match = _STATEMENT.match(buffer, position)
+            if match is None:
+                break
+            self._statement(match.group(), buffer, position)
+            position = match.end()
+        if self.stopped:
+            return
+        self._flush_references()
+        self._line += buffer.count(b"\n", 0, position)
+        tail = buffer[position:]
+        if len(tail) > self.max_statement_size:
+            # Cannot resynchronize after this, so stop here
+            self._error(f"Statement longer than {self.max_statement_size} bytes (unterminated string or missing ';')", self._line)
+            self.report.truncated = True
+            return
+        if tail:
+            self._pending.append(tail)
+            self._pending_size = len(tail)
+        self._rescan_size = 2 * len(tail)
+
+    def _check_magic(self, buffer: bytes) -> bool:
+        """Reject non-STEP input on the first bytes instead of buffering it"""
+        head = buffer.lstrip(b" \t\r\n\xef\xbb\xbf")[:len(_MAGIC)]
+        if _MAGIC.startswith(head.upper()):
+            return True
+        self._error("File does not start with ISO-10303-21;", 1)
+        self.report.truncated = True
+        return False
+
+    def finish(self) -> StepValidationReport:
+        """Check what can only be checked at the end and return the report"""
+        if self._pending and not self.stopped:
+            self._process()
+        if not self.stopped:
+            if any(part.strip() for part in self._pending):
+                self._error("Unterminated statement at end of file", self._line)
+            if self._state != "end":
+                expected = {
+                    "start": "ISO-10303-21;",
+                    "header": "ENDSEC; of HEADER",
+                    "between": "DATA; or END-ISO-10303-21;",
+                    "data": "ENDSEC; of DATA"
+                }.get(self._state, "END-ISO-10303-21;")
+                self._error(f"Unexpected end of file, expected {expected}", self._line)
+            self._check_references()
+        self.report.seconds = time.perf_counter() - self._started
+        return self.report
+
+    def _check_references(self) -> None:
+        """References to ids that are never defined"""
+        self._flush_references()
+        referenced = self._referenced
+        if not len(referenced):
+            return
+        defined = self._grow(self._defined, len(referenced))[:len(referenced)]
+        dangling_bits = np.unpackbits(referenced & ~defined, bitorder="little")
+        dangling = np.flatnonzero(dangling_bits)
+        self.report.dangling_references = int(len(dangling))
+        if len(dangling):
+            self.report.dangling_examples = [int(entity_id) for entity_id in dangling[:10]]
+            self._error(f"{len(dangling)} referenced entities are not defined (e.g. #{int(dangling[0])})")
+
+    def _line_at(self, buffer: bytes, offset: int) -> int:
+        return self._line + buffer.count(b"\n", 0, offset)
+
+    def _statement(self, statement: bytes, buffer: bytes, offset: int) -> None:
+        if self._state == "data":
+            self._data_statement(statement, buffer, offset)
+            return
+
+        if b"/*" in statement:
+            statement = _COMMENT.sub(b"", statement)
+        keyword = _KEYWORD.match(statement)
+        name = keyword.group(1).upper() if keyword else None
+
+        if self._state == "start":
+            if name != b"ISO-10303-21":
+                self._error("File does not start with ISO-10303-21;", self._line_at(buffer, offset))
+            self._state = "before_header"
+        elif self._state == "before_header":
+            if name != b"HEADER":
+                self._error("Missing HEADER section", self._line_at(buffer, offset))
+            self._state = "header"
+        elif self._state == "header":
+            if name == b"ENDSEC":
+                self._end_header(self._line_at(buffer, offset))
+                self._state = "between"
+            else:
+                self._header_statement(statement, buffer, offset)
+        elif self._state == "between":
+            if name == b"DATA":
+                self._state = "data"
+            elif name == b"END-ISO-10303-21":
+                self._state = "end"
+            else:
+                self._error("Expected DATA; or END-ISO-10303-21;", self._line_at(buffer, offset))
+        elif self._state == "end":
+            if statement.strip(b" \t\r\n;"):
+                self._error("Content after END-ISO-10303-21;", self._line_at(buffer, offset))
+
+    def _header_statement(self, statement: bytes, buffer: bytes, offset: int) -> None:
+        match = _HEADER_ENTITY.match(statement)
+        if match is None:
+            self._error("Malformed header entity", self._line_at(buffer, offset))
+            return
+        name = match.group(1).decode("ascii").upper()
+        self._header_entities.append(name)
+        if name == "FILE_SCHEMA":
+            schemas = _STRING.findall(match.group(2))
+            if not schemas:
+                self._error("FILE_SCHEMA names no schema", self._line_at(buffer, offset))
+                return
+            schema_name = schemas[0][1:-1].decode("ascii", errors="replace")
+            self.report.schema = schema_name
+            try:
+                self._schema = ifcopenshell.ifcopenshell_wrapper.schema_by_name(schema_name)
+            except RuntimeError:
+                self._error(f"Unsupported schema: {schema_name}", self._line_at(buffer, offset))
+
+    def _end_header(self, line: int) -> None:
+        for required in ("FILE_DESCRIPTION", "FILE_NAME", "FILE_SCHEMA"):
+            if required not in self._header_entities:
+                self._error(f"HEADER has no {required}", line)
+
+    def _declaration_error(self, type_name: bytes) -> Optional[str]:
+        """Why TYPE cannot be instantiated (None if it can), cached per type name"""
+        if type_name not in self._declarations:
+            error = None
+            # Parts of complex instances are not checked
+            if self._schema is not None and type_name != _COMPLEX_TYPE:
+                try:
+                    entity = self._schema.declaration_by_name(type_name.decode("ascii")).as_entity()
+                    if entity is None:
+                        error = "is not an entity"
+                    elif entity.is_abstract():
+                        error = "is abstract"
+                except RuntimeError:
+                    error = f"is not in schema {self.report.schema}"
+            self._declarations[type_name] = error
+        return self._declarations[type_name]
+
+    def _data_batch(self, buffer: bytes, position: int) -> int:
+        """Collect consecutive canonical instances ("#id=TYPE(...);") from `position` and check them together
+
+        Returns the position after the last one. Anything else (ENDSEC, comments,
+        complex instances, malformed statements) is left to _statement.
+        """
+        ids: List[bytes] = []
+        types: List[bytes] = []
+        arguments: List[bytes] = []
+        starts: List[int] = []
+        for match in _DATA_INSTANCE.finditer(buffer, position):
+            if match.start() != position:
+                # Something else in between
+                break
+            entity_id, type_name, args = match.groups()
+            ids.append(entity_id)
+            types.append(type_name)
+            arguments.append(args)
+            starts.append(position)
+            position = match.end()
+        if ids:
+            self._add_instances(ids, types, arguments, starts, buffer)
+        return position
+
+    def _data_statement(self, statement: bytes, buffer: bytes, offset: int) -> None:
+        """A DATA statement the batch path did not take"""
+        if b"/*" in statement:
+            statement = _COMMENT.sub(b"", statement)
+        match = _INSTANCE.match(statement)
+        if match is not None:
+            self._add_instances([match.group(1)], [match.group(2)], [match.group(3) + b")"], [offset], buffer)
+            return
+        complex_match = _COMPLEX_INSTANCE.match(statement)
+        if complex_match is not None:
+            # Complex instance: #id=(A(...)B(...));
+            self._add_instances([complex_match.group(1)], [_COMPLEX_TYPE], [complex_match.group(2) + b")"], [offset], buffer)
+            return
+        stripped = statement.strip()
+        if stripped.upper() == b"ENDSEC;":
+            self._state = "between"
+        elif stripped != b";":
+            self._error(f"Malformed entity instance: {stripped[:80].decode('utf-8', errors='replace')}", self._line_at(buffer, offset))
+
+    def _add_instances(self, ids: List[bytes], types: List[bytes], arguments: List[bytes], starts: List[int], buffer: bytes) -> None:
+        """Ids, counts, syntax and references of a batch of instances
+
+        arguments: everything between the opening parenthesis and the ";" (closing parenthesis included)
+        """
+        # More than 10 digits is always >= MAX_ENTITY_ID (and may not fit in int64)
+        entity_ids = np.array([int(entity_id) if len(entity_id) <= 10 else MAX_ENTITY_ID for entity_id in ids], dtype=np.int64)
+        too_large = entity_ids >= MAX_ENTITY_ID
+        if too_large.any():
+            for index in np.flatnonzero(too_large)[:self.max_errors]:
+                self._error(f"Entity id #{ids[index].decode('ascii')} is too large", self._line_at(buffer, starts[index]))
+            entity_ids = entity_ids[~too_large]
+
+        self._define(entity_ids, ids, starts, buffer)
+
+        self.report.entity_count += len(ids)
+        for raw_type_name, count in Counter(types).items():
+            type_name = raw_type_name.upper()
+            declaration_error = self._declaration_error(type_name)
+            if declaration_error:
+                index = types.index(raw_type_name)
+                self._error(f"#{ids[index].decode('ascii')}: {type_name.decode('ascii')} {declaration_error}", self._line_at(buffer, starts[index]))
+            self.report.counts_by_type[type_name.decode("ascii")] += count
+
+        # Strings may contain anything - drop them before looking at the structure
+        joined = b"\n".join(arguments)
+        if b"'" in joined:
+            joined = _STRING.sub(b"''", joined)
+        # Every instance's opening parenthesis is consumed by the regex
+        if joined.count(b"(") + len(arguments) != joined.count(b")"):
+            for index, args in enumerate(arguments):
+                args = _STRING.sub(b"''", args)
+                if args.count(b"(") + 1 != args.count(b")"):
+                    self._error(f"#{ids[index].decode('ascii')}: unbalanced parentheses", self._line_at(buffer, starts[index]))
+                    if self.stopped:
+                        break
+        self._references.extend(_REFERENCE.findall(joined))
+
+    def _define(self, entity_ids: np.ndarray, ids: List[bytes], starts: List[int], buffer: bytes) -> None:
+        """Mark entity ids as defined, reporting duplicates"""
+        if not len(entity_ids):
+            return
+        self._defined = self._grow(self._defined, int(entity_ids.max() >> 3) + 1)
+        byte_index = entity_ids >> 3
+        masks = (1 << (entity_ids & 7)).astype(np.uint8)
+        duplicate = (self._defined[byte_index] & masks) != 0
+        unique, first = np.unique(entity_ids, return_index=True)
+        if len(unique) != len(entity_ids):
+            repeated = np.ones(len(entity_ids), dtype=bool)
+            repeated[first] = False
+            duplicate |= repeated
+        if duplicate.any():
+            lookup = {int(entity_id): index for index, entity_id in enumerate(map(int, ids))}
+            for entity_id in entity_ids[duplicate][:self.max_errors]:
+                self._error(f"Duplicate entity id #{int(entity_id)}", self._line_at(buffer, starts[lookup[int(entity_id)]]))
+        np.bitwise_or.at(self._defined, byte_index, masks)
+
+    @staticmethod
+    def _grow(bitmap: np.ndarray, size: int) -> np.ndarray:
+        """Bitmap of at least `size` bytes (doubling, so growth is amortized)"""
+        if size <= len(bitmap):
+            return bitmap
+        grown = np.zeros(max(size, 2 * len(bitmap)), dtype=np.uint8)
+        grown[:len(bitmap)] = bitmap
+        return grown
+
+    def _flush_references(self) -> None:
+        """Mark the references collected since the last flush in the bitmap (vectorized)"""
+        references = self._references
+        if not references:
+            return
+        self._references = []
+        if max(map(len, references)) > 10:
+            self._error(f"Reference id is too large (ids must be < {MAX_ENTITY_ID})")
+            references = [reference for reference in references if len(reference) <= 10]
+        ids = np.array(list(map(int, references)), dtype=np.int64)
+        too_large = ids >= MAX_ENTITY_ID
+        if too_large.any():
+            self._error(f"Reference #{int(ids[too_large][0])} is too large (ids must be < {MAX_ENTITY_ID})")
+            ids = ids[~too_large]
+        if not len(ids):
+            return
+        self._referenced = self._grow(self._referenced, int(ids.max() >> 3) + 1)
+        np.bitwise_or.at(self._referenced, ids >> 3, (1 << (ids & 7)).astype(np.uint8))
+
+    def validate_chunks(self, chunks: Iterable[bytes]) -> StepValidationReport:
+        for chunk in chunks:
+            self.feed(chunk)
+            if self.stopped:
+                break
+        return self.finish()
+
+    def validate_file(self, path: str, chunk_size: int = 1024 * 1024) -> StepValidationReport:
+        with open(path, "rb") as f:
+            return self.validate_chunks(iter(lambda: f.read(chunk_size), b""))
+
+    def validate_bytes(self, data: bytes, chunk_size: int = 1024 * 1024) -> StepValidationReport:
+        view = memoryview(data)
+        return self.validate_chunks(bytes(view[start:start + chunk_size]) for start in range(0, len(data), chunk_size))
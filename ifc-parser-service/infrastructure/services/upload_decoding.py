@@ -0,0 +1,312 @@
+"""Streaming decompression of compressed IFC uploads (.ifczip, gzip, zstd)"""
+from typing import Iterator, Optional
+import struct
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd uploads are refused without it
+    zstandard = None
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+ZIP_MAGIC = b"PK\x03\x04"
+
+_ZIP_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_ZIP_DATA_DESCRIPTOR = b"PK\x07\x08"
+_ZIP_STORED = 0
+_ZIP_DEFLATED = 8
+
+
+class UploadDecodingError(ValueError):
+    """Upload is compressed in a way that cannot be decoded"""
+
+
+class UploadTooLargeError(UploadDecodingError):
+    """Decompressed upload is larger than allowed"""
+
+
+def detect_compression(head: bytes) -> Optional[str]:
+    """"gzip", "zstd", "zip" or None (plain STEP) from the first bytes of an upload"""
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(ZSTD_MAGIC):
+        return "zstd"
+    if head.startswith(ZIP_MAGIC):
+        return "zip"
+    return None
+
+
+class _ZipEntryReader:
+    """The first .ifc entry of a ZIP archive (.ifczip), read from local headers as bytes arrive
+
+    The central directory at the end of the archive is never needed: entries
+    before the .ifc one are skipped, everything after it is ignored.
+    """
+
+    def __init__(self, output_size: int):
+        self.output_size = output_size
+        self.entry_name: Optional[str] = None
+        self.done = False
+        self._buffer = b""
+        self._state = "header"
+        self._selected = False
+        self._inflater = None
+        self._remaining = 0  # stored data still to read
+        self._has_descriptor = False
+        self._zip64 = False
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        self._buffer += data
+        while not self.done:
+            if self._state == "header":
+                if not self._read_header():
+                    return
+            elif self._state == "deflated":
+                yield from self._inflate()
+                if self._state == "deflated":
+                    return
+            elif self._state == "stored":
+                if not self._buffer:
+                    return
+                piece = self._buffer[:self._remaining]
+                self._buffer = self._buffer[len(piece):]
+                self._remaining -= len(piece)
+                if self._selected:
+                    for start in range(0, len(piece), self.output_size):
+                        yield piece[start:start + self.output_size]
+                if self._remaining == 0:
+                    self._end_entry()
+            elif self._state == "descriptor":
+                if not self._skip_descriptor():
+                    return
+
+    def finish(self) -> None:
+        if not self.done:
+            if self.entry_name is None and self._state == "header":
+                raise UploadDecodingError("ZIP archive contains no .ifc file")
+            raise UploadDecodingError("ZIP archive is truncated")
+
+    def _read_header(self) -> bool:
+        if len(self._buffer) < 4:
+            return False
+        if self._buffer[:4] != ZIP_MAGIC:
+            # Central directory (or garbage) - no more entries
+            raise UploadDecodingError("ZIP archive contains no .ifc file")
+        if len(self._buffer) < _ZIP_LOCAL_HEADER.size:
+            return False
+        (_, _, flags, method, _, _, _, compressed_size, _, name_length, extra_length) = \
+            _ZIP_LOCAL_HEADER.unpack_from(self._buffer)
+        header_size = _ZIP_LOCAL_HEADER.size + name_length + extra_length
+        if len(self._buffer) < header_size:
+            return False
+        raw_name = self._buffer[_ZIP_LOCAL_HEADER.size:_ZIP_LOCAL_HEADER.size + name_length]
+        extra = self._buffer[_ZIP_LOCAL_HEADER.size + name_length:header_size]
+        self._buffer = self._buffer[header_size:]
+
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        if flags & 0x1:
+            raise UploadDecodingError(f"ZIP entry {name} is encrypted")
+        self._selected = name.lower().endswith(".ifc")
+        if self._selected:
+            self.entry_name = name
+        self._has_descriptor = bool(flags & 0x8)
+        zip64_sizes = self._zip64_sizes(extra)
+        # ZIP64 entries have 8 byte sizes in the data descriptor too
+        self._zip64 = zip64_sizes is not None
+        if compressed_size == 0xFFFFFFFF:
+            if zip64_sizes is None:
+                raise UploadDecodingError(f"ZIP64 entry {name} without sizes")
+            compressed_size = zip64_sizes
+
+        if method == _ZIP_DEFLATED:
+            self._inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+            self._state = "deflated"
+        elif method == _ZIP_STORED:
+            if self._has_descriptor:
+                raise UploadDecodingError(f"ZIP entry {name} is stored without a size, re-zip it with deflate")
+            self._remaining = compressed_size
+            self._state = "stored"
+            if compressed_size == 0:
+                self._end_entry()
+        else:
+            raise UploadDecodingError(f"ZIP entry {name} uses unsupported compression method {method}")
+        return True
+
+    @staticmethod
+    def _zip64_sizes(extra: bytes) -> Optional[int]:
+        """Compressed size from the ZIP64 extra field (0 if it has none, None without the field)"""
+        position = 0
+        while position + 4 <= len(extra):
+            header_id, size = struct.unpack_from("<HH", extra, position)
+            if header_id == 0x0001:
+                # Uncompressed size first, then compressed size
+                return struct.unpack_from("<Q", extra, position + 12)[0] if size >= 16 else 0
+            position += 4 + size
+        return None
+
+    def _inflate(self) -> Iterator[bytes]:
+        inflater = self._inflater
+        data, self._buffer = self._buffer, b""
+        while True:
+            piece = inflater.decompress(data, self.output_size)
+            data = inflater.unconsumed_tail
+            if piece and self._selected:
+                yield piece
+            if inflater.eof:
+                self._buffer = inflater.unused_data
+                self._end_entry()
+                return
+            # A full piece may leave output inside zlib even with no input left
+            if not data and len(piece) < self.output_size:
+                return
+
+    def _end_entry(self) -> None:
+        self._inflater = None
+        if self._has_descriptor:
+            self._state = "descriptor"
+        elif self._selected:
+            self.done = True
+        else:
+            self._state = "header"
+
+    def _skip_descriptor(self) -> bool:
+        # Optional signature + crc + compressed size + uncompressed size (8 byte sizes with ZIP64)
+        size = 4 + (16 if self._zip64 else 8)
+        if len(self._buffer) < 4:
+            return False
+        if self._buffer[:4] == _ZIP_DATA_DESCRIPTOR:
+            size += 4
+        if len(self._buffer) < size:
+            return False
+        self._buffer = self._buffer[size:]
+        if self._selected:
+            self.done = True
+        else:
+            self._state = "header"
+        return True
+
+
+class UploadDecoder:
+    """Decompresses an upload chunk by chunk, detecting the format from its first bytes
+
+    Plain STEP passes through untouched; gzip (.ifc.gz, several members allowed),
+    zstd (.ifc.zst, needs the zstandard package) and ZIP (.ifczip - the first .ifc
+    entry) are decompressed on the fly. Output comes in pieces of at most
+    `output_size` bytes, and decompressing more than `max_size` bytes raises
+    UploadTooLargeError, so compression bombs are cut off.
+
+    Usage: for piece in decoder.feed(chunk): ...; then for piece in decoder.finish(): ...
+    """
+
+    def __init__(self, output_size: int = 1024 * 1024, max_size: Optional[int] = None):
+        self.output_size = output_size
+        self.max_size = max_size
+        self.compression: Optional[str] = None
+        self.compressed_size = 0
+        self.size = 0
+        self._head = b""
+        self._detected = False
+        self._decompressor = None
+        self._zip: Optional[_ZipEntryReader] = None
+
+    @property
+    def entry_name(self) -> Optional[str]:
+        """Name of the decompressed ZIP entry"""
+        return self._zip.entry_name if self._zip is not None else None
+
+    @property
+    def passthrough(self) -> bool:
+        """True once the upload is known to be plain STEP (feed() returns chunks as they are)"""
+        return self._detected and self.compression is None
+
+    def feed(self, chunk: bytes) -> Iterator[bytes]:
+        """Decompressed pieces of the next chunk (decompression happens while iterating)"""
+        self.compressed_size += len(chunk)
+        if not self._detected:
+            self._head += chunk
+            if len(self._head) < len(ZSTD_MAGIC):
+                return iter(())
+            chunk, self._head = self._head, b""
+            self._start(chunk)
+        return self._counted(self._decode(chunk))
+
+    def finish(self) -> Iterator[bytes]:
+        """Remaining output; raises UploadDecodingError for truncated archives"""
+        head = b""
+        if not self._detected:
+            head, self._head = self._head, b""
+            self._start(head)
+        return self._finish(head)
+
+    def _finish(self, head: bytes) -> Iterator[bytes]:
+        yield from self._counted(self._decode(head))
+        if self.compression == "gzip":
+            if not self._decompressor.eof:
+                raise UploadDecodingError("gzip stream is truncated")
+        elif self.compression == "zstd":
+            if not self._decompressor.eof:
+                raise UploadDecodingError("zstd stream is truncated")
+        elif self.compression == "zip":
+            self._zip.finish()
+
+    def _start(self, head: bytes) -> None:
+        self._detected = True
+        self.compression = detect_compression(head)
+        if self.compression == "gzip":
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.compression == "zstd":
+            if zstandard is None:
+                raise UploadDecodingError("zstd uploads need the zstandard package")
+            self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+        elif self.compression == "zip":
+            self._zip = _ZipEntryReader(self.output_size)
+
+    def _counted(self, pieces: Iterator[bytes]) -> Iterator[bytes]:
+        for piece in pieces:
+            self.size += len(piece)
+            if self.max_size is not None and self.size > self.max_size:
+                raise UploadTooLargeError(f"Decompressed upload is larger than {self.max_size} bytes")
+            yield piece
+
+    def _decode(self, chunk: bytes) -> Iterator[bytes]:
+        if self.compression is None:
+            if chunk:
+                yield chunk
+        elif self.compression == "gzip":
+            yield from self._gunzip(chunk)
+        elif self.compression == "zstd":
+            yield from self._unzstd(chunk)
+        elif not self._zip.done:
+            yield from self._zip.feed(chunk)
+
+    def _unzstd(self, data: bytes) -> Iterator[bytes]:
+        """zstd output cannot be limited per call, so the input goes in in slices so
+        small that even the largest expansion (a 4 byte RLE block makes 128 KB, about
+        32768x) keeps one call's output within 4 x output_size"""
+        decompressor = self._decompressor
+        step = max(64, self.output_size // 8192)
+        view = memoryview(data)
+        for start in range(0, len(view), step):
+            if decompressor.eof:
+                return
+            piece = decompressor.decompress(view[start:start + step])
+            for offset in range(0, len(piece), self.output_size):
+                yield piece[offset:offset + self.output_size]
+
+    def _gunzip(self, data: bytes) -> Iterator[bytes]:
+        decompressor = self._decompressor
+        while data or not decompressor.eof:
+            piece = decompressor.decompress(data, self.output_size)
+            data = decompressor.unconsumed_tail
+            if piece:
+                yield piece
+            if decompressor.eof:
+                # Concatenated members (e.g. appended with cat)
+                data = decompressor.unused_data.lstrip(b"\x00")
+                if not data:
+                    return
+                decompressor = self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            elif not data and len(piece) < self.output_size:
+                return
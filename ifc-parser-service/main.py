@@ -27,6 +27,12 @@ container = Container()
 app.include_router(ifc.router)
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop background parse jobs"""
+    ifc.get_container().parse_job_manager().shutdown()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
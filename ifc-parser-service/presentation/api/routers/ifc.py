@@ -1,7 +1,25 @@
 """IFC parser router"""
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+import hashlib
+import json
+import os
+import tempfile
+import time
+import ifcopenshell
+import numpy as np
 from application.container import Container
+from domain.entities.parse_options import ParseOptions
+from domain.entities.quantities import QUANTITY_COLUMNS, QUANTITY_UNITS
+from infrastructure.config.settings import Settings
+from infrastructure.services.model_sessions import ModelSession
+from infrastructure.services.model_snapshot import SNAPSHOT_FORMATS, SnapshotError, read_snapshot, write_snapshot
+from infrastructure.services.parse_metrics import ParseMetrics, ParseProfile
+from infrastructure.services.step_validator import StepValidationReport, StepValidator
+from infrastructure.services.upload_decoding import UploadDecoder, UploadDecodingError, UploadTooLargeError
 from ifc_common import Result
 
 # Singleton container instance
@@ -18,71 +36,891 @@ def get_container() -> Container:
 router = APIRouter(prefix="/api/ifc", tags=["IFC"])
 
 
+def _split_values(values: Optional[List[str]]) -> Optional[Tuple[str, ...]]:
+    """Repeated and/or comma separated query values, sorted (None if not given)"""
+    if values is None:
+        return None
+    return tuple(sorted({item.strip() for value in values for item in value.split(",") if item.strip()}))
+
+
+def get_parse_options(
+    types: Optional[List[str]] = Query(None, description="Only these IFC classes (and subtypes), e.g. IfcBeam,IfcColumn"),
+    exclude_types: Optional[List[str]] = Query(None, description="Skip these IFC classes (and subtypes)"),
+    properties: Optional[List[str]] = Query(None, description="Only these property keys (empty = no properties)"),
+    property_prefixes: Optional[List[str]] = Query(None, description="Only property keys with these prefixes, e.g. Type.,BaseQuantities."),
+    include_placement: bool = True,
+    include_quantities: bool = True,  # Quantity takeoff in SI units ("quantities")
+    include_geometry: bool = False  # Bounding boxes from tessellated geometry (slow)
+) -> ParseOptions:
+    """Projection / filtering query parameters of the parse endpoints"""
+    return ParseOptions(
+        include_types=_split_values(types),
+        exclude_types=_split_values(exclude_types) or (),
+        property_keys=_split_values(properties),
+        property_prefixes=_split_values(property_prefixes),
+        include_placement=include_placement,
+        include_quantities=include_quantities,
+        include_geometry=include_geometry
+    )
+
+
+def _element_to_dict(element, string_values: bool = False) -> Dict[str, Any]:
+    """Convert domain entity to dictionary for JSON response
+    
+    Property values keep their native JSON types and quantities carry their units
+    in "units". With string_values every value is a string (legacy format).
+    """
+    properties = element.properties
+    if string_values:
+        properties = {k: str(v) if v is not None else "" for k, v in properties.items()}
+    
+    element_dict = {
+        "global_id": element.global_id,
+        "type_name": element.type_name,
+        "name": element.name,
+        "properties": properties,
+        "placement_matrix": element.placement_matrix if element.placement_matrix else None
+    }
+    if not string_values:
+        element_dict["units"] = element.units or {}
+    
+    # Takeoff in SI units (kg, m3, m2, m); "derived_quantities" were computed from the profile
+    element_dict["quantities"] = element.quantities or {}
+    if element.derived_quantities:
+        element_dict["derived_quantities"] = list(element.derived_quantities)
+    
+    # Extract position from placement_matrix for easier access
+    if element.placement_matrix and len(element.placement_matrix) >= 12:
+        element_dict["position"] = [
+            element.placement_matrix[3],
+            element.placement_matrix[7],
+            element.placement_matrix[11]
+        ]
+    else:
+        element_dict["position"] = [0.0, 0.0, 0.0]
+    
+    return element_dict
+
+
+def _encode_element(element, string_values: bool = False) -> bytes:
+    """Serialize domain entity to one compact JSON line (without newline)"""
+    return json.dumps(_element_to_dict(element, string_values), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _elements_document(lines: List[bytes]) -> Response:
+    """{"elements": [...]} response assembled from already serialized elements
+    
+    X-Element-Count lets proxies (the gateway) relay the document without parsing it.
+    """
+    return Response(
+        content=b'{"elements":[' + b",".join(lines) + b"]}",
+        media_type="application/json",
+        headers={"X-Element-Count": str(len(lines))}
+    )
+
+
+def _remove_file(path: Optional[str]) -> None:
+    """Remove a temp file if there is one"""
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+async def _iter_upload(file: UploadFile, settings: Settings) -> AsyncIterator[bytes]:
+    """Upload content chunk by chunk, decompressed if it is .ifczip / gzip / zstd
+    
+    Decompression runs in the thread pool one output piece at a time, so neither
+    the compressed nor the decompressed upload is ever held in memory as a whole.
+    """
+    decoder = UploadDecoder(settings.upload_chunk_size, settings.upload_max_decompressed_size)
+    try:
+        while True:
+            chunk = await file.read(settings.upload_chunk_size)
+            pieces = decoder.feed(chunk) if chunk else decoder.finish()
+            if decoder.passthrough:
+                # Plain STEP - nothing to decompress
+                for piece in pieces:
+                    yield piece
+            else:
+                while True:
+                    piece = await run_in_threadpool(next, pieces, None)
+                    if piece is None:
+                        break
+                    yield piece
+            if not chunk:
+                break
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadDecodingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _read_upload(
+    file: UploadFile,
+    settings: Settings,
+    validator: Optional[StepValidator] = None
+) -> Tuple[Union[str, bytes], str, Optional[str]]:
+    """Read upload for parsing: (source, sha256, temp file path)
+    
+    Compressed uploads (.ifczip, gzip, zstd) are decompressed while they are read;
+    the hash is of the decompressed content, so a model hits the caches however it
+    was uploaded. Content up to `in_memory_parse_max_size` stays in memory and is
+    parsed without touching the disk. Anything larger is copied to a temp file
+    chunk by chunk, so it is never materialised in memory.
+    
+    With a validator the upload is validated while it is read; an invalid upload
+    raises 422 with the validation report as soon as the validator gives up.
+    """
+    digest = hashlib.sha256()
+    parts: List[bytes] = []
+    size = 0
+    tmp_file = None
+    try:
+        async for chunk in _iter_upload(file, settings):
+            if validator is not None:
+                await run_in_threadpool(validator.feed, chunk)
+                if validator.stopped:
+                    _check_valid(validator.finish())
+            digest.update(chunk)
+            size += len(chunk)
+            if tmp_file is None and size <= settings.in_memory_parse_max_size:
+                parts.append(chunk)
+                continue
+            if tmp_file is None:
+                tmp_file = await run_in_threadpool(tempfile.NamedTemporaryFile, delete=False, suffix=".ifc")
+                for part in parts:
+                    await run_in_threadpool(tmp_file.write, part)
+                parts = []
+            await run_in_threadpool(tmp_file.write, chunk)
+        if validator is not None:
+            _check_valid(await run_in_threadpool(validator.finish))
+    except Exception:
+        if tmp_file is not None:
+            tmp_file.close()
+            _remove_file(tmp_file.name)
+        raise
+    if tmp_file is None:
+        return b"".join(parts), digest.hexdigest(), None
+    tmp_file.close()
+    return tmp_file.name, digest.hexdigest(), tmp_file.name
+
+
+def _check_valid(report: StepValidationReport) -> None:
+    """422 with the validation report if the upload is not a valid STEP file"""
+    if not report.valid:
+        raise HTTPException(status_code=422, detail=report.to_dict())
+
+
+async def _stream_ndjson(
+    parser_service,
+    source: Union[str, bytes],
+    content_hash: str,
+    tmp_path: Optional[str],
+    options: ParseOptions,
+    string_values: bool,
+    cache_writer,
+    metrics: ParseMetrics
+) -> AsyncIterator[bytes]:
+    """One JSON element per line; a failure ends the stream with an {"error": ...} line"""
+    completed = False
+    serialize_seconds = 0.0
+    try:
+        async for element in parser_service.stream_file(source, options=options, content_hash=content_hash):
+            started = time.perf_counter()
+            line = _encode_element(element, string_values)
+            serialize_seconds += time.perf_counter() - started
+            cache_writer.write(line)
+            yield line + b"\n"
+        completed = True
+    except Exception as e:
+        yield (json.dumps({"error": f"Error parsing IFC file: {str(e)}"}) + "\n").encode("utf-8")
+    finally:
+        metrics.observe_stage("serialize", serialize_seconds)
+        # Only complete results are cached
+        if completed:
+            cache_writer.commit()
+        else:
+            cache_writer.abort()
+        # Clean up temp file once the stream is done
+        _remove_file(tmp_path)
+
+
+async def _read_cached(parse_cache, cache_key: str, stream: bool):
+    """Cached result - NDJSON chunks when streaming, else element lines (None on a miss)"""
+    cached_path = parse_cache.get_path(cache_key)
+    if cached_path is None:
+        return None
+    if stream:
+        return parse_cache.iter_chunks(cached_path)
+    return await run_in_threadpool(parse_cache.read_lines, cached_path)
+
+
 @router.post("/parse")
 async def parse_ifc_file(
     file: UploadFile = File(...),
+    options: ParseOptions = Depends(get_parse_options),
+    stream: bool = False,  # NDJSON - one element per line, sent while parsing
+    string_values: bool = False,  # Legacy format - all property values as strings
+    validate: bool = False,  # Reject invalid STEP files (422 + report) before parsing
     container: Container = Depends(get_container)
 ):
-    """Parse IFC file"""
-    import tempfile
-    import os
+    """Parse IFC file
     
+    Args:
+        file: IFC file to parse
+        options: projection / filtering - `types`, `exclude_types`, `properties`,
+            `property_prefixes`, `include_placement`, `include_quantities` (SI
+            takeoff in "quantities") and `include_geometry` (fills
+            `_geometry_bounds` / `_geometry_size`). Skipped products, property sets
+            and placements are never extracted, so narrow requests are faster.
+        stream: If True, respond with application/x-ndjson (one element per line)
+            instead of a single {"elements": [...]} document
+        string_values: If True, all property values are strings and "units" is
+            omitted (format used before typed values)
+        validate: If True, the upload is validated while it is read (see
+            /validate) and rejected with 422 before any parsing
+    
+    Identical uploads (same content and options) arriving while one is parsed
+    wait for it and are answered from the parse cache.
+    
+    Non-streamed responses carry a Server-Timing header with the parse stages.
+    X-Content-Hash references the result for /results/{content_hash}/projection.
+    """
     parser_service = container.ifc_parser_service()
+    parse_cache = container.parse_result_cache()
+    metrics = container.parse_metrics()
+    settings = container.settings()
+    started = time.perf_counter()
     
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".ifc") as tmp_file:
-        content = await file.read()
-        tmp_file.write(content)
-        tmp_path = tmp_file.name
+    source, content_hash, tmp_path = await _read_upload(
+        file, settings,
+        validator=parser_service.create_validator() if validate else None
+    )
+    
+    # Same bytes + same options = same result, so repeat uploads are served from the cache
+    cache_key = parse_cache.make_key(
+        content_hash,
+        placement_mode=settings.placement_mode,
+        string_values=string_values,
+        **options.to_dict()
+    )
+    cached = await _read_cached(parse_cache, cache_key, stream)
+    claimed = False
+    if cached is None:
+        # An identical upload being parsed right now is waited for, then served from the cache
+        pending = parse_cache.claim(cache_key)
+        if pending is None:
+            claimed = True
+        else:
+            await pending.wait()
+            cached = await _read_cached(parse_cache, cache_key, stream)
+    if cached is not None:
+        _remove_file(tmp_path)
+        if stream:
+            return StreamingResponse(
+                cached,
+                media_type="application/x-ndjson",
+                headers={"X-Content-Hash": content_hash}
+            )
+        response = _elements_document(cached)
+        response.headers["Server-Timing"] = f'cache;desc="hit";dur={(time.perf_counter() - started) * 1000:.1f}'
+        response.headers["X-Content-Hash"] = content_hash
+        return response
+    
+    if stream:
+        # Temp file (if any) is removed when the stream ends
+        return StreamingResponse(
+            _stream_ndjson(
+                parser_service, source, content_hash, tmp_path, options, string_values,
+                parse_cache.writer(cache_key), metrics
+            ),
+            media_type="application/x-ndjson",
+            headers={"X-Content-Hash": content_hash},
+            background=BackgroundTask(parse_cache.release, cache_key) if claimed else None
+        )
     
     try:
         # Parse file
-        result = await parser_service.parse_file(tmp_path)
+        profile = ParseProfile()
+        result = await parser_service.parse_file(source, options=options, content_hash=content_hash, profile=profile)
         
         if result.is_failure:
             raise HTTPException(status_code=400, detail=result.error)
         
-        # Convert domain entities to dictionaries for JSON response
-        elements = result.value
-        elements_dict = []
-        
-        for element in elements:
-            element_dict = {
-                "global_id": element.global_id,
-                "type_name": element.type_name,
-                "name": element.name,
-                "properties": element.properties,
-                "placement_matrix": element.placement_matrix if element.placement_matrix else None
-            }
-            
-            # Extract position from placement_matrix for easier access
-            if element.placement_matrix and len(element.placement_matrix) >= 12:
-                element_dict["position"] = [
-                    element.placement_matrix[3],
-                    element.placement_matrix[7],
-                    element.placement_matrix[11]
-                ]
-            else:
-                element_dict["position"] = [0.0, 0.0, 0.0]
-            
-            elements_dict.append(element_dict)
+        # Convert domain entities to JSON once - for the response and for the cache
+        with profile.stage("serialize"):
+            lines = [_encode_element(element, string_values) for element in result.value]
+        metrics.observe_stage("serialize", profile.stages["serialize"])
+        await run_in_threadpool(parse_cache.put_lines, cache_key, lines)
         
-        return {"elements": elements_dict}
+        response = _elements_document(lines)
+        response.headers["Server-Timing"] = profile.server_timing()
+        response.headers["X-Content-Hash"] = content_hash
+        return response
     finally:
         # Clean up temp file
-        if os.path.exists(tmp_path):
-            os.remove(tmp_path)
+        _remove_file(tmp_path)
+        if claimed:
+            parse_cache.release(cache_key)
 
 
-@router.get("/elements")
-async def get_elements():
-    """Get parsed elements"""
+@router.post("/validate")
+async def validate_ifc_file(file: UploadFile = File(...), container: Container = Depends(get_container)):
+    """Validate a STEP file without parsing it
+    
+    Checks file structure, header (FILE_SCHEMA must be a schema the parser knows),
+    entity syntax, duplicate ids, entity types and that every #reference is
+    defined; returns the report with entity counts per type. The upload is
+    validated chunk by chunk as it is read (nothing is written to disk; compressed
+    uploads are decompressed on the way) and validation stops after `validation_max_errors` errors.
+    """
+    validator = container.ifc_parser_service().create_validator()
+    async for chunk in _iter_upload(file, container.settings()):
+        await run_in_threadpool(validator.feed, chunk)
+        if validator.stopped:
+            break
+    report = await run_in_threadpool(validator.finish)
+    return report.to_dict()
+
+
+@router.post("/diff")
+async def diff_ifc_files(
+    old_file: UploadFile = File(...),
+    new_file: UploadFile = File(...),
+    options: ParseOptions = Depends(get_parse_options),
+    details: bool = False,  # List changed property keys of modified elements
+    container: Container = Depends(get_container)
+):
+    """Compare two revisions of a model by GlobalId
+    
+    Elements are matched by GlobalId and compared by content hashes of their
+    properties and placement (STEP ids are ignored), so downstream services can
+    recompute only the added and modified elements.
+    """
+    parser_service = container.ifc_parser_service()
+    settings = container.settings()
+    
+    old_source, old_hash, old_tmp_path = await _read_upload(old_file, settings)
+    try:
+        new_source, new_hash, new_tmp_path = await _read_upload(new_file, settings)
+        try:
+            result = await parser_service.diff_files(
+                old_source, new_source, options=options, details=details,
+                old_content_hash=old_hash, new_content_hash=new_hash
+            )
+        finally:
+            _remove_file(new_tmp_path)
+    finally:
+        _remove_file(old_tmp_path)
+    
+    if result.is_failure:
+        raise HTTPException(status_code=400, detail=result.error)
+    return {"old_content_hash": old_hash, "new_content_hash": new_hash, **result.value.to_dict()}
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(container: Container = Depends(get_container)):
+    """Parse result cache and snapshot store counters"""
+    return {**container.parse_result_cache().stats(), "snapshots": container.model_snapshot_store().stats()}
+
+
+def _projection_line(global_id: str, type_name: str, name: str, properties: Dict[str, Any], quantities: Optional[Dict[str, float]]) -> bytes:
+    return json.dumps(
+        {"global_id": global_id, "type_name": type_name, "name": name, "properties": properties, "quantities": quantities or {}},
+        ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _model_projection(model, keys: Optional[Tuple[str, ...]]) -> List[bytes]:
+    """Projection of a compact model, properties limited to `keys` (None = all)"""
+    key_table = model.key_table
+    wanted = None if keys is None else {key_id for key_id, key in enumerate(key_table) if key in set(keys)}
+    lines = []
+    for index in range(len(model)):
+        key_ids, values = model.property_items(index)
+        properties = {
+            key_table[key_id]: value
+            for key_id, value in zip(key_ids, values)
+            if wanted is None or key_id in wanted
+        }
+        lines.append(_projection_line(
+            model.global_ids[index], model.type_names[index], model.names[index],
+            properties, model.quantities(index)
+        ))
+    return lines
+
+
+def _cached_projection(lines: List[bytes], keys: Optional[Tuple[str, ...]]) -> List[bytes]:
+    """Projection of a cached /parse result (serialized elements)"""
+    projected = []
+    for line in lines:
+        element = json.loads(line)
+        properties = element.get("properties") or {}
+        if keys is not None:
+            properties = {key: properties[key] for key in keys if key in properties}
+        projected.append(_projection_line(
+            element["global_id"], element["type_name"], element["name"],
+            properties, element.get("quantities")
+        ))
+    return projected
+
+
+@router.get("/results/{content_hash}/projection")
+async def get_result_projection(
+    content_hash: str,
+    options: ParseOptions = Depends(get_parse_options),
+    keys: Optional[List[str]] = Query(None, description="Property keys to keep (repeated or comma separated; default all)"),
+    container: Container = Depends(get_container)
+):
+    """Compact projection of an earlier /parse result, referenced by its X-Content-Hash
+    
+    The projection options must be the ones the file was parsed with - together
+    with the hash they select the stored result (snapshot, else parse cache).
+    Elements carry only global_id, type_name, name, properties (limited to `keys`)
+    and quantities, so services like the cost calculator can pull what they need
+    directly instead of having whole elements relayed to them. 404 when the
+    result is no longer stored - parse the file again.
+    """
+    keys = _split_values(keys)
+    model = await container.ifc_parser_service().load_parsed(content_hash, options)
+    if model is not None:
+        return _elements_document(await run_in_threadpool(_model_projection, model, keys))
+    
+    parse_cache = container.parse_result_cache()
+    cached_path = parse_cache.get_path(parse_cache.make_key(
+        content_hash,
+        placement_mode=container.settings().placement_mode,
+        string_values=False,
+        **options.to_dict()
+    ))
+    lines = await run_in_threadpool(parse_cache.read_lines, cached_path) if cached_path is not None else None
+    if lines is not None:
+        return _elements_document(await run_in_threadpool(_cached_projection, lines, keys))
+    raise HTTPException(status_code=404, detail=f"No stored parse result for {content_hash} with these options")
+
+
+async def _snapshot_response(model, file_format: str, name: str, metadata: Dict[str, Any]) -> FileResponse:
+    """Model written to a temp snapshot file, removed once the response is sent"""
+    if file_format not in SNAPSHOT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown snapshot format: {file_format} (arrow or parquet)")
+    extension = SNAPSHOT_FORMATS[file_format]
+    with tempfile.NamedTemporaryFile(delete=False, suffix=extension) as tmp_file:
+        tmp_path = tmp_file.name
+    try:
+        await run_in_threadpool(write_snapshot, model, tmp_path, file_format, metadata)
+    except SnapshotError as e:
+        _remove_file(tmp_path)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception:
+        _remove_file(tmp_path)
+        raise
+    media_type = "application/vnd.apache.arrow.file" if file_format == "arrow" else "application/vnd.apache.parquet"
+    return FileResponse(
+        tmp_path,
+        media_type=media_type,
+        filename=f"{name}{extension}",
+        background=BackgroundTask(_remove_file, tmp_path)
+    )
+
+
+@router.post("/snapshots")
+async def import_snapshot(file: UploadFile = File(...), container: Container = Depends(get_container)):
+    """Import a model snapshot (from GET /models/{id}/snapshot or /jobs/{id}/snapshot)
+    
+    The snapshot goes into the snapshot store under the content hash and options
+    it was made from, so parsing that file with those options loads it instead.
+    """
+    snapshot_store = container.model_snapshot_store()
+    if not snapshot_store.enabled:
+        raise HTTPException(status_code=503, detail="Model snapshots are disabled")
+    
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".snapshot") as tmp_file:
+        tmp_path = tmp_file.name
+        while chunk := await file.read(container.settings().upload_chunk_size):
+            await run_in_threadpool(tmp_file.write, chunk)
+    try:
+        try:
+            model, metadata = await run_in_threadpool(read_snapshot, tmp_path)
+            key = snapshot_store.make_key(
+                metadata["content_hash"],
+                placement_mode=metadata["placement_mode"],
+                **metadata["options"]
+            )
+        except (SnapshotError, KeyError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid model snapshot: {e}")
+        # Parquet archives are stored as Arrow, which is memory-mapped on load
+        await run_in_threadpool(snapshot_store.save, key, model, metadata)
+    finally:
+        _remove_file(tmp_path)
     return {
-        "elements": [],
-        "message": "No elements parsed yet. Upload an IFC file first."
+        "snapshot_key": key,
+        "content_hash": metadata["content_hash"],
+        "options": metadata["options"],
+        "placement_mode": metadata["placement_mode"],
+        "elements": len(model)
     }
 
 
+@router.post("/jobs", status_code=202)
+async def submit_parse_job(
+    file: UploadFile = File(...),
+    options: ParseOptions = Depends(get_parse_options),
+    container: Container = Depends(get_container)
+):
+    """Queue an IFC file for parsing in the background
+    
+    Returns the job immediately; poll GET /jobs/{job_id} for progress and fetch
+    GET /jobs/{job_id}/result once it is completed. Answers 429 when the queue is full.
+    """
+    job_manager = container.parse_job_manager()
+    settings = container.settings()
+    
+    # Refuse before reading the upload
+    if job_manager.is_full():
+        raise HTTPException(status_code=429, detail="Parse queue is full, retry later", headers={"Retry-After": "5"})
+    
+    source, content_hash, tmp_path = await _read_upload(file, settings)
+    result = job_manager.submit(source, content_hash, tmp_path=tmp_path, options=options)
+    if result.is_failure:
+        _remove_file(tmp_path)
+        raise HTTPException(status_code=429, detail=result.error, headers={"Retry-After": "5"})
+    
+    return result.value.to_dict()
+
+
+@router.get("/jobs")
+async def list_parse_jobs(container: Container = Depends(get_container)):
+    """Known jobs (newest last) and queue counters"""
+    job_manager = container.parse_job_manager()
+    return {
+        "jobs": [job.to_dict() for job in job_manager.list_jobs()],
+        "stats": job_manager.stats()
+    }
+
+
+def _get_job(container: Container, job_id: str):
+    job = container.parse_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Parse job not found: {job_id}")
+    return job
+
+
+async def _get_job_model(container: Container, job_id: str):
+    """Model of a completed job - kept by the job, else reloaded from its snapshot (410 if gone)"""
+    job = _get_job(container, job_id)
+    if job.status == job.FAILED:
+        raise HTTPException(status_code=400, detail=job.error)
+    if job.status != job.COMPLETED:
+        raise HTTPException(status_code=409, detail=f"Parse job is {job.status}")
+    model = job.result
+    if model is None:
+        model = await container.ifc_parser_service().load_parsed(job.content_hash, job.options)
+    if model is None:
+        raise HTTPException(status_code=410, detail=f"Result of parse job {job_id} was released, submit the file again")
+    return job, model
+
+
+@router.get("/jobs/{job_id}")
+async def get_parse_job(job_id: str, container: Container = Depends(get_container)):
+    """Job status and progress (elements processed / total products)"""
+    return _get_job(container, job_id).to_dict()
+
+
+@router.get("/jobs/{job_id}/result")
+async def get_parse_job_result(
+    job_id: str,
+    stream: bool = False,
+    string_values: bool = False,
+    container: Container = Depends(get_container)
+):
+    """Parsed elements of a completed job (same formats as /parse)"""
+    _, model = await _get_job_model(container, job_id)
+    if stream:
+        return StreamingResponse(
+            (_encode_element(element, string_values) + b"\n" for element in model),
+            media_type="application/x-ndjson"
+        )
+    lines = await run_in_threadpool(lambda: [_encode_element(element, string_values) for element in model])
+    return _elements_document(lines)
+
+
+@router.get("/jobs/{job_id}/snapshot")
+async def get_parse_job_snapshot(
+    job_id: str,
+    format: str = "arrow",  # arrow (IPC file, memory-mappable) or parquet (compressed, archival)
+    container: Container = Depends(get_container)
+):
+    """Parsed model of a completed job as a columnar snapshot file"""
+    job, model = await _get_job_model(container, job_id)
+    metadata = container.ifc_parser_service().snapshot_metadata(job.content_hash, job.options)
+    return await _snapshot_response(model, format, job.content_hash, metadata)
+
+
+@router.delete("/jobs/{job_id}")
+async def cancel_parse_job(job_id: str, container: Container = Depends(get_container)):
+    """Cancel a queued or running job"""
+    _get_job(container, job_id)
+    return container.parse_job_manager().cancel(job_id).to_dict()
+
+
+@router.post("/models")
+async def open_model(
+    file: UploadFile = File(...),
+    options: ParseOptions = Depends(get_parse_options),
+    container: Container = Depends(get_container)
+):
+    """Parse IFC file and keep it resident for follow-up queries
+    
+    The model id depends only on the file content and the options, so uploading the
+    same file again returns the resident session without parsing.
+    """
+    parser_service = container.ifc_parser_service()
+    session_store = container.model_session_store()
+    settings = container.settings()
+    
+    source, content_hash, tmp_path = await _read_upload(file, settings)
+    try:
+        model_id = session_store.make_model_id(content_hash, options)
+        session = session_store.get(model_id)
+        if session is not None:
+            return {**session.to_dict(), "resident": True}
+        
+        source_size = len(source) if isinstance(source, bytes) else os.path.getsize(source)
+        result = await parser_service.open_model(source, options=options, content_hash=content_hash)
+        if result.is_failure:
+            raise HTTPException(status_code=400, detail=result.error)
+        
+        ifc_file, model = result.value
+        session = ModelSession(model_id, ifc_file, model, content_hash, options, source_size)
+        session_store.add(session)
+        return {**session.to_dict(), "resident": False}
+    finally:
+        _remove_file(tmp_path)
+
+
+@router.get("/models")
+async def list_models(container: Container = Depends(get_container)):
+    """Resident models (least recently used first) and store counters"""
+    session_store = container.model_session_store()
+    return {
+        "models": [session.to_dict() for session in session_store.list_sessions()],
+        "stats": session_store.stats()
+    }
+
+
+def _get_session(container: Container, model_id: str) -> ModelSession:
+    session = container.model_session_store().get(model_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Model not found (not parsed or evicted): {model_id}")
+    return session
+
+
+@router.get("/models/{model_id}")
+async def get_model(model_id: str, container: Container = Depends(get_container)):
+    """Resident model summary (element counts by type, size estimate)"""
+    return _get_session(container, model_id).to_dict()
+
+
+@router.get("/models/{model_id}/snapshot")
+async def get_model_snapshot(
+    model_id: str,
+    format: str = "arrow",  # arrow (IPC file, memory-mappable) or parquet (compressed, archival)
+    container: Container = Depends(get_container)
+):
+    """Resident model as a columnar snapshot file (import with POST /snapshots)"""
+    session = _get_session(container, model_id)
+    metadata = {
+        **container.ifc_parser_service().snapshot_metadata(session.content_hash, session.options),
+        "model_id": model_id
+    }
+    return await _snapshot_response(session.model, format, model_id, metadata)
+
+
+@router.delete("/models/{model_id}")
+async def close_model(model_id: str, container: Container = Depends(get_container)):
+    """Drop a resident model"""
+    if not container.model_session_store().remove(model_id):
+        raise HTTPException(status_code=404, detail=f"Model not found: {model_id}")
+    return {"model_id": model_id, "removed": True}
+
+
+def _element_page(
+    session: ModelSession,
+    type_name: Optional[str],
+    offset: int,
+    limit: int,
+    string_values: bool
+) -> Dict[str, Any]:
+    """One page of elements of a resident model, optionally of one IFC class (and subtypes)"""
+    model = session.model
+    indices = session.indices_of_type(type_name) if type_name else range(len(model))
+    page = indices[offset:offset + limit]
+    return {
+        "model_id": session.model_id,
+        "total": len(indices),
+        "offset": offset,
+        "limit": limit,
+        "elements": [_element_to_dict(model[index], string_values) for index in page]
+    }
+
+
+@router.get("/models/{model_id}/elements")
+async def list_model_elements(
+    model_id: str,
+    type: Optional[str] = None,  # IFC class, subtypes included (e.g. IfcBeam)
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    string_values: bool = False,
+    container: Container = Depends(get_container)
+):
+    """Paginated elements of a resident model, in parse order"""
+    return _element_page(_get_session(container, model_id), type, offset, limit, string_values)
+
+
+def _attribute_value(value: Any) -> Any:
+    """JSON-friendly IFC attribute value (references become {"id", "type"})"""
+    if isinstance(value, ifcopenshell.entity_instance):
+        return {"id": value.id(), "type": value.is_a()}
+    if isinstance(value, (list, tuple)):
+        return [_attribute_value(item) for item in value]
+    return value
+
+
+@router.get("/models/{model_id}/elements/{global_id}")
+async def get_model_element(
+    model_id: str,
+    global_id: str,
+    attributes: bool = False,  # Also return the raw IFC attributes of the entity
+    string_values: bool = False,
+    container: Container = Depends(get_container)
+):
+    """Single element of a resident model by GlobalId"""
+    session = _get_session(container, model_id)
+    index = session.model.index_of(global_id)
+    if index is None:
+        raise HTTPException(status_code=404, detail=f"Element not found: {global_id}")
+    
+    element_dict = _element_to_dict(session.model[index], string_values)
+    if attributes:
+        entity = session.entity(global_id)
+        if entity is not None:
+            element_dict["attributes"] = {
+                name: _attribute_value(value) for name, value in entity.get_info(recursive=False).items()
+            }
+    return element_dict
+
+
+def _quantity_table(model, type_name: Optional[str], indices: Optional[List[int]]) -> Dict[str, Any]:
+    """Quantity columns of a model (or of some positions) as JSON arrays, null = no value"""
+    matrix = model.quantity_matrix
+    derived = model.derived_quantity_mask
+    if indices is not None:
+        matrix = matrix[indices]
+        derived = derived[indices]
+    rows = range(len(model)) if indices is None else indices
+    present = ~np.isnan(matrix)
+    return {
+        "type": type_name,
+        "columns": list(QUANTITY_COLUMNS),
+        "units": QUANTITY_UNITS,
+        "global_ids": [model.global_ids[index] for index in rows],
+        "values": {
+            column: [value if flag else None for value, flag in zip(matrix[:, position].tolist(), present[:, position].tolist())]
+            for position, column in enumerate(QUANTITY_COLUMNS)
+        },
+        "derived": {
+            column: derived[:, position].tolist() for position, column in enumerate(QUANTITY_COLUMNS)
+        },
+        "totals": dict(zip(QUANTITY_COLUMNS, np.nansum(matrix, axis=0).tolist()))
+    }
+
+
+@router.get("/models/{model_id}/quantities")
+async def get_model_quantities(
+    model_id: str,
+    type: Optional[str] = None,  # IFC class, subtypes included (e.g. IfcBeam)
+    by_type: bool = False,  # Only totals per IFC class
+    container: Container = Depends(get_container)
+):
+    """Quantity takeoff of a resident model in SI units (kg, m3, m2, m)
+    
+    Columnar: one array per quantity, aligned with "global_ids"; "derived" marks
+    values computed from the profile instead of read from IfcElementQuantity.
+    """
+    session = _get_session(container, model_id)
+    model = session.model
+    if by_type:
+        return {
+            "model_id": model_id,
+            "units": QUANTITY_UNITS,
+            "totals_by_type": await run_in_threadpool(model.quantity_totals_by_type)
+        }
+    indices = session.indices_of_type(type) if type else None
+    return {"model_id": model_id, **(await run_in_threadpool(_quantity_table, model, type, indices))}
+
+
+@router.get("/models/{model_id}/diff/{other_model_id}")
+async def diff_resident_models(
+    model_id: str,
+    other_model_id: str,
+    details: bool = False,  # List changed property keys of modified elements
+    container: Container = Depends(get_container)
+):
+    """Changes from a resident model to another one (added / removed / modified by GlobalId)"""
+    old_session = _get_session(container, model_id)
+    new_session = _get_session(container, other_model_id)
+    result = await container.ifc_parser_service().diff_models(old_session.model, new_session.model, details)
+    if result.is_failure:
+        raise HTTPException(status_code=500, detail=result.error)
+    return {"old_model_id": model_id, "new_model_id": other_model_id, **result.value.to_dict()}
+
+
+@router.get("/metrics")
+async def get_metrics(container: Container = Depends(get_container)):
+    """Parse metrics in Prometheus text format"""
+    cache_stats = container.parse_result_cache().stats()
+    job_stats = container.parse_job_manager().stats()
+    session_stats = container.model_session_store().stats()
+    snapshot_stats = container.model_snapshot_store().stats()
+    extra = {
+        "ifc_parser_cache_hits_total": ("counter", "Parse cache hits", cache_stats["hits"]),
+        "ifc_parser_cache_misses_total": ("counter", "Parse cache misses", cache_stats["misses"]),
+        "ifc_parser_cache_size_bytes": ("gauge", "Parse cache size on disk", cache_stats["size_bytes"]),
+        "ifc_parser_jobs_queued": ("gauge", "Parse jobs waiting for a worker", job_stats["jobs"]["queued"]),
+        "ifc_parser_jobs_running": ("gauge", "Parse jobs being parsed", job_stats["jobs"]["running"]),
+        "ifc_parser_resident_models": ("gauge", "Resident model sessions", session_stats["models"]),
+        "ifc_parser_resident_models_size_bytes": ("gauge", "Estimated memory of resident models", session_stats["estimated_size_bytes"]),
+        "ifc_parser_snapshot_hits_total": ("counter", "Parses answered from a model snapshot", snapshot_stats["hits"]),
+        "ifc_parser_snapshot_misses_total": ("counter", "Snapshot lookups without a snapshot", snapshot_stats["misses"]),
+        "ifc_parser_snapshot_size_bytes": ("gauge", "Model snapshot store size on disk", snapshot_stats["size_bytes"])
+    }
+    return PlainTextResponse(
+        container.parse_metrics().render(extra),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
+@router.get("/elements")
+async def get_elements(
+    model_id: Optional[str] = None,  # Defaults to the most recently used model
+    type: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    string_values: bool = False,
+    container: Container = Depends(get_container)
+):
+    """Get parsed elements (of a resident model, see POST /models)"""
+    session_store = container.model_session_store()
+    session = session_store.get(model_id) if model_id else session_store.latest()
+    if session is None:
+        if model_id:
+            raise HTTPException(status_code=404, detail=f"Model not found (not parsed or evicted): {model_id}")
+        return {
+            "elements": [],
+            "message": "No elements parsed yet. Upload an IFC file first."
+        }
+    return _element_page(session, type, offset, limit, string_values)
+
+
 @router.get("/health")
 async def health_check():
     """Health check"""